@@ -1,9 +1,16 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 import backend
+import writer
+import consolidated
+import recurring
+import forecast
+import charts
+import calendar_view
+import importer
 import lang_pack as lang
-import calendar
+import perf
+import os
 from datetime import date, timedelta
 
 # === 1. 页面配置 ===
@@ -16,6 +23,9 @@ st.set_page_config(
 
 CURRENCY = "RM"
 COLOR_MAP = {"收入": "#00CC96", "Income": "#00CC96", "支出": "#EF553B", "Expense": "#EF553B"}
+RECORDS_PAGE_SIZE = 50
+# 概览/日历默认走 SQL 聚合；LEDGER_AGGREGATES=pandas 时退回旧的全量 DataFrame 计算，便于对比
+USE_SQL_AGGREGATES = os.environ.get("LEDGER_AGGREGATES", "sql") != "pandas"
 
 # === 2. 核心 UI 样式 (强制 7 等分 + 无边框 + 响应式) ===
 st.markdown("""
@@ -144,10 +154,42 @@ st.markdown("""
         .cal-val { font-size: 0.6rem; align-self: center; margin-top: -2px; }
 
         .cal-card:hover { transform: none; }
+        .heatmap-container .heatmap { grid-auto-columns: 8px; gap: 1px; }
     }
+
+    /* --- 年度热力图 (周日在第一行，每列一周) --- */
+    .heatmap-container { width: 100%; overflow-x: auto; padding: 4px 0; }
+    .heatmap {
+        display: grid;
+        grid-template-rows: repeat(7, 1fr);
+        grid-auto-flow: column;
+        grid-auto-columns: 14px;
+        gap: 3px;
+    }
+    .hm-cell { width: 100%; aspect-ratio: 1 / 1; border-radius: 3px; background-color: rgba(128, 128, 128, 0.12); }
+    .hm-cell.hm-blank { background: transparent; }
+    .hm-cell.today { box-shadow: inset 0 0 0 2px #FFD700; }
+    .hm-pos-1 { background-color: rgba(0, 204, 150, 0.25); }
+    .hm-pos-2 { background-color: rgba(0, 204, 150, 0.5); }
+    .hm-pos-3 { background-color: rgba(0, 204, 150, 0.75); }
+    .hm-pos-4 { background-color: rgba(0, 204, 150, 1); }
+    .hm-neg-1 { background-color: rgba(239, 85, 59, 0.25); }
+    .hm-neg-2 { background-color: rgba(239, 85, 59, 0.5); }
+    .hm-neg-3 { background-color: rgba(239, 85, 59, 0.75); }
+    .hm-neg-4 { background-color: rgba(239, 85, 59, 1); }
     </style>
     """, unsafe_allow_html=True)
 
+def notify(msg, icon=None):
+    # 片段里的回调不能直接显示元素，提示先排队，等 rerun 时再弹出
+    st.session_state.setdefault('pending_toasts', []).append((msg, icon))
+
+
+def flush_toasts():
+    for msg, icon in st.session_state.pop('pending_toasts', []):
+        st.toast(msg, icon=icon)
+
+
 def save_callback():
     lang_code = st.session_state.get('language_code', 'CN')
     amt = st.session_state.get('input_amount', 0.0)
@@ -159,8 +201,21 @@ def save_callback():
 
     if active_id and amt > 0 and cat:
         db_type = "Expense" if any(x in typ for x in ["支出", "Expense"]) else "Income"
-        backend.save_record(active_id, dt, db_type, cat, amt, note)
-        st.toast("✅ " + ("已保存!" if lang_code == 'CN' else "Saved!"))
+        # 交给后台写线程，等它的组提交确认后再提示 (通常几毫秒)
+        try:
+            writer.save_record(active_id, dt, db_type, cat, amt, note).result(timeout=writer.WRITE_TIMEOUT)
+        except Exception as e:
+            notify(f"❌ {e}")
+            return
+        notify("✅ " + ("已保存!" if lang_code == 'CN' else "Saved!"))
+        st.session_state['data_changed'] = True
+        if db_type == "Expense":
+            # 预算检查只读当月汇总行，不重新求和；只在这一笔刚好超出上限时提醒一次
+            status = backend.budget_status(active_id, cat, str(dt)[:7])
+            if backend.budget_crossed(status, amt):
+                notify(lang.T("budget_alert").format(cat=lang.get_cat_display(cat),
+                                                     spent=backend.from_cents(status[0]),
+                                                     limit=backend.from_cents(status[1])), icon="⚠️")
 
         st.session_state['input_amount'] = 0.0
         st.session_state['input_note'] = ""
@@ -169,11 +224,21 @@ def save_callback():
         pass
 
 
+def next_page_callback(cursor):
+    st.session_state['rec_cursors'].append(cursor)
+
+
+def prev_page_callback():
+    if len(st.session_state['rec_cursors']) > 1:
+        st.session_state['rec_cursors'].pop()
+
+
 def add_cat_callback():
     new_c = st.session_state.get('new_cat_input')
     active_id = st.session_state.get('active_ledger_id')
     if active_id and new_c and backend.add_category(active_id, new_c):
-        st.toast(f"Tag added: {new_c}")
+        notify(f"Tag added: {new_c}")
+        st.session_state['data_changed'] = True
         st.session_state['new_cat_input'] = ""
 
 
@@ -182,73 +247,187 @@ def del_cat_callback():
     active_id = st.session_state.get('active_ledger_id')
     if active_id and del_c:
         backend.delete_category(active_id, del_c)
-        st.toast(f"Tag removed: {del_c}")
+        notify(f"Tag removed: {del_c}")
+        st.session_state['data_changed'] = True
 
 
-# === 4. 日历函数 ===
-def render_calendar_html(year, month, df_data, mode='Month', selected_date=None):
-    daily_net = {}
-    if not df_data.empty:
-        df_calc = df_data.copy()
-        inc_keys = ['收入', 'Income']
-        df_calc['calc_amount'] = df_calc.apply(
-            lambda x: x['amount'] if x['type'] in inc_keys else -x['amount'], axis=1
-        )
-        daily_net = df_calc.groupby('date')['calc_amount'].sum().to_dict()
-
-    cal = calendar.Calendar(firstweekday=6)
-    month_days = cal.monthdayscalendar(year, month)
-
-    if mode == 'Week':
-        sel_dt = pd.to_datetime(selected_date).date()
-        target_week = []
-        for week in month_days:
-            if sel_dt.day in week and week[week.index(sel_dt.day)] != 0:
-                target_week = week
-                break
-        if not target_week:
-            month_days = cal.monthdayscalendar(year, month)
-        else:
-            month_days = [target_week]
-
-    week_days = ["Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat"]
-    html = '<div class="calendar-container"><table class="cal-table"><thead><tr>'
-    for w in week_days: html += f'<th class="cal-th">{w}</th>'
-    html += '</tr></thead><tbody class="week-view" >' if mode == 'Week' else '<tbody>'
-    today_str = str(date.today())
-
-    for week in month_days:
-        html += '<tr>'
-        for day in week:
-            if day == 0:
-                html += '<td class="cal-td"></td>'
-            else:
-                current_date_str = f"{year}-{month:02d}-{day:02d}"
-                val = daily_net.get(current_date_str, 0)
-                card_class = "cal-card"
-                if val > 0:
-                    card_class += " pos"
-                elif val < 0:
-                    card_class += " neg"
-                if current_date_str == today_str: card_class += " today"
-
-                val_display = ""
-                if val != 0:
-                    prefix = "+" if val > 0 else ""
-                    val_display = f'<span class="cal-val">{prefix}{val:,.0f}</span>'
-                html += f'<td class="cal-td"><div class="{card_class}"><span class="cal-day-num">{day}</span>{val_display}</div></td>'
-        html += '</tr>'
-    html += '</tbody></table></div>'
-    return html
-
-
-# === 5. Sidebar & Main ===
-backend.init_db()
+def rename_cat_callback():
+    old_c = st.session_state.get('rename_cat_select')
+    new_c = st.session_state.get('rename_cat_input')
+    active_id = st.session_state.get('active_ledger_id')
+    if active_id and old_c and backend.rename_category(active_id, old_c, new_c):
+        notify(f"Tag renamed: {old_c} → {new_c.strip()}")
+        st.session_state['data_changed'] = True
+        st.session_state['rename_cat_input'] = ""
+
+
+def set_budget_callback():
+    cat = st.session_state.get('budget_cat_select')
+    active_id = st.session_state.get('active_ledger_id')
+    if active_id and cat:
+        backend.set_budget(active_id, cat, st.session_state.get('budget_limit_input', 0.0))
+        notify(f"Budget set: {cat}")
+        st.session_state['data_changed'] = True
+
+
+def add_rule_callback():
+    active_id = st.session_state.get('active_ledger_id')
+    lang_code = st.session_state.get('language_code', 'CN')
+    cat = st.session_state.get(f'rule_category_{lang_code}')
+    amt = st.session_state.get('rule_amount', 0.0)
+    if not (active_id and cat and amt > 0):
+        return
+    typ = st.session_state.get('rule_type', "")
+    db_type = "Expense" if any(x in typ for x in ["支出", "Expense"]) else "Income"
+    freq = st.session_state.get(f'rule_freq_{lang_code}')
+    end = st.session_state.get('rule_end') if st.session_state.get('rule_has_end') else None
+    backend.add_recurring_rule(active_id, db_type, cat, amt, st.session_state.get('rule_note', ""),
+                               recurring_freqs()[freq], st.session_state.get('rule_start', date.today()), end)
+    # 起始日期在过去的规则马上补记
+    posted = recurring.post_due().get(active_id, 0)
+    notify(lang.T("rule_added").format(n=posted))
+    st.session_state['rule_amount'] = 0.0
+    st.session_state['rule_note'] = ""
+    st.session_state['data_changed'] = True
+
+
+def del_rule_callback():
+    active_id = st.session_state.get('active_ledger_id')
+    rule_id = st.session_state.get('del_rule_select')
+    if active_id and rule_id is not None:
+        backend.delete_recurring_rule(active_id, int(rule_id))
+        st.session_state['data_changed'] = True
+
+
+def recurring_freqs():
+    return {lang.T(f"freq_{f}"): f for f in backend.RECURRING_FREQS}
+
+
+def refresh_if_changed():
+    # 片段内的回调真的写了数据 (保存记录 / 改分类) 才整页刷新；否则只重跑片段本身
+    if st.session_state.pop('data_changed', False):
+        st.rerun(scope="app")
+    flush_toasts()
+
+
+@st.fragment
+def entry_form(ledger_id):
+    refresh_if_changed()
+    with perf.span("entry"), st.expander(lang.T("header_entry"), expanded=True):
+        c1, c2, c3, c4 = st.columns([1.2, 1, 1.2, 1])
+        with c1: st.date_input(lang.T("date"), date.today(), key='input_date')
+        with c2:
+            type_opts = ["支出", "收入"] if st.session_state.get('language_code') == 'CN' else ["Expense", "Income"]
+            st.selectbox(lang.T("category"), type_opts, key='input_type', label_visibility="visible")
+        with c3:
+            current_cats = backend.get_categories(ledger_id)
+            st.selectbox(lang.T("category"), current_cats, format_func=lang.get_cat_display,
+                         key=f'input_category_{st.session_state.get("language_code")}')
+        with c4:
+            st.number_input(lang.T("amount"), min_value=0.0, step=1.0, format="%.2f",
+                            key='input_amount', on_change=save_callback)
+
+        st.text_input(lang.T("note"), key='input_note', placeholder="Note...", on_change=save_callback)
+        st.button(lang.T("btn_save"), on_click=save_callback, type="primary", use_container_width=True)
+
+
+@st.fragment
+def category_manager(ledger_id):
+    refresh_if_changed()
+    with st.expander(lang.T("manage_cats")):
+        current_categories = backend.get_categories(ledger_id)
+        c1, c2, c3, c4 = st.tabs([lang.T("tab_add_cat"), lang.T("tab_del_cat"), lang.T("tab_rename_cat"),
+                                  lang.T("tab_budget")])
+        with c1:
+            st.text_input("New", key='new_cat_input', label_visibility="collapsed")
+            st.button("Add", on_click=add_cat_callback, use_container_width=True)
+        with c2:
+            st.selectbox("Del", current_categories, key='del_cat_select', label_visibility="collapsed")
+            st.button("Remove", on_click=del_cat_callback, type="primary", use_container_width=True)
+        with c3:
+            st.selectbox("Rename", current_categories, key='rename_cat_select', label_visibility="collapsed")
+            st.text_input("To", key='rename_cat_input', label_visibility="collapsed")
+            st.button("Rename", on_click=rename_cat_callback, use_container_width=True)
+        with c4:
+            st.selectbox("Budget", current_categories, key='budget_cat_select', label_visibility="collapsed")
+            st.number_input(lang.T("budget_limit"), min_value=0.0, step=100.0, format="%.2f", key='budget_limit_input')
+            st.button("Set", on_click=set_budget_callback, use_container_width=True)
+
+
+@st.fragment
+def recurring_manager(ledger_id):
+    refresh_if_changed()
+    with st.expander(lang.T("recurring_title")):
+        lang_code = st.session_state.get('language_code', 'CN')
+        r1, r2, r3, r4 = st.columns([1, 1.2, 1, 1])
+        type_opts = ["支出", "收入"] if lang_code == 'CN' else ["Expense", "Income"]
+        r1.selectbox(lang.T("type"), type_opts, key='rule_type')
+        r2.selectbox(lang.T("category"), backend.get_categories(ledger_id), format_func=lang.get_cat_display,
+                     key=f'rule_category_{lang_code}')
+        r3.number_input(lang.T("amount"), min_value=0.0, step=1.0, format="%.2f", key='rule_amount')
+        r4.selectbox(lang.T("rule_freq"), list(recurring_freqs()), index=2, key=f'rule_freq_{lang_code}')
+        s1, s2, s3 = st.columns([1, 1, 1])
+        s1.date_input(lang.T("rule_start"), date.today(), key='rule_start')
+        has_end = s2.checkbox(lang.T("rule_end"), key='rule_has_end')
+        s3.date_input(lang.T("rule_end"), date.today() + timedelta(days=365), key='rule_end', disabled=not has_end,
+                      label_visibility="hidden")
+        st.text_input(lang.T("note"), key='rule_note', placeholder="Note...")
+        st.button(lang.T("rule_add"), on_click=add_rule_callback, type="primary", use_container_width=True)
+
+        rules = backend.get_recurring_rules(ledger_id)
+        if not rules.empty:
+            freq_names = {f: label for label, f in recurring_freqs().items()}
+            rules['type'] = rules['type'].map(lang.get_type_display)
+            rules['category'] = rules['category'].map(lang.get_cat_display)
+            rules['freq'] = rules['freq'].map(freq_names)
+            st.dataframe(
+                rules,
+                use_container_width=True,
+                hide_index=True,
+                column_order=("freq", "type", "category", "amount", "note", "start_date", "end_date", "last_posted"),
+                column_config={
+                    "freq": st.column_config.TextColumn(lang.T("rule_freq")),
+                    "type": st.column_config.TextColumn(lang.T("type")),
+                    "category": st.column_config.TextColumn(lang.T("category")),
+                    "amount": st.column_config.NumberColumn(lang.T("amount"), format=f"{CURRENCY} %.2f"),
+                    "note": st.column_config.TextColumn(lang.T("note")),
+                    "start_date": st.column_config.TextColumn(lang.T("rule_start")),
+                    "end_date": st.column_config.TextColumn(lang.T("rule_end")),
+                    "last_posted": st.column_config.TextColumn(lang.T("rule_last_posted")),
+                }
+            )
+            rule_labels = {r.id: f"{r.freq} · {r.category} · {r.amount:,.2f} {r.note or ''}"
+                           for r in rules.itertuples()}
+            d1, d2 = st.columns([3, 1])
+            d1.selectbox("Delete rule", list(rule_labels), format_func=rule_labels.get, key='del_rule_select',
+                         label_visibility="collapsed")
+            d2.button("🗑️", key="del_rule_btn", on_click=del_rule_callback, use_container_width=True)
+
+
+@st.cache_resource
+def startup(db_file):
+    # 建表 / 迁移每个进程只做一次，不再每次 rerun 都执行；顺带补记停机期间到期的周期记录
+    backend.init_db()
+    recurring.post_due()
+    recurring.start_scheduler()
+    return True
+
+
+# === 4. Sidebar & Main ===
+# 性能埋点：上一次 rerun 的编号留给性能面板展示 (本次的还没跑完)
+prev_rerun = st.session_state.get('perf_rerun')
+st.session_state['perf_rerun'] = perf.begin_rerun()
+show_perf = st.query_params.get("admin") == "1" or bool(os.environ.get("LEDGER_ADMIN"))
+# 整页 rerun 本身就会刷新所有视图，片段里不必再触发一次
+st.session_state.pop('data_changed', None)
+flush_toasts()
+
+startup(os.path.abspath(backend.DB_FILE))
 all_ledgers = backend.get_ledgers()
 ledger_names = [L[1] for L in all_ledgers]
 ledger_map = {L[1]: L[0] for L in all_ledgers}
 
-with st.sidebar:
+with st.sidebar, perf.span("sidebar"):
     st.image("https://cdn-icons-png.flaticon.com/512/2920/2920349.png", width=50)
     st.markdown("### " + lang.T("sidebar_title"))
     st.radio("Language", ["CN", "EN"], horizontal=True, label_visibility="collapsed", key="language_code")
@@ -274,17 +453,27 @@ with st.sidebar:
             if st.button("🗑️", type="primary", use_container_width=True):
                 backend.delete_ledger(ledger_map[ledger_to_del])
                 st.rerun()
+        w_stats = writer.stats(backend.ledger_path(current_ledger_id))
+        st.caption(lang.T("writer_stats").format(depth=w_stats['queue_depth'], batches=w_stats['batches'],
+                                                 mean=w_stats['commit_ms_mean'], max=w_stats['commit_ms_max']))
 
     if selected_ledger_name:
-        with st.expander(lang.T("manage_cats")):
-            current_categories = backend.get_categories(current_ledger_id)
-            c1, c2 = st.tabs([lang.T("tab_add_cat"), lang.T("tab_del_cat")])
-            with c1:
-                st.text_input("New", key='new_cat_input', label_visibility="collapsed")
-                st.button("Add", on_click=add_cat_callback, use_container_width=True)
-            with c2:
-                st.selectbox("Del", current_categories, key='del_cat_select', label_visibility="collapsed")
-                st.button("Remove", on_click=del_cat_callback, type="primary", use_container_width=True)
+        category_manager(current_ledger_id)
+
+    # 隐藏的管理面板：?admin=1 或设置 LEDGER_ADMIN 时显示
+    if show_perf:
+        with st.expander(lang.T("perf_title")):
+            st.caption(lang.T("perf_last_rerun").format(rerun=prev_rerun))
+            st.dataframe(perf.rerun_breakdown(prev_rerun), hide_index=True, use_container_width=True,
+                         column_config={"ms": st.column_config.NumberColumn(format="%.1f")})
+            st.caption(lang.T("perf_summary"))
+            st.dataframe(perf.summary(), hide_index=True, use_container_width=True,
+                         column_config={c: st.column_config.NumberColumn(format="%.1f")
+                                        for c in ("p50_ms", "p95_ms", "max_ms")})
+            if perf.PROFILE_DIR:
+                st.caption(f"cProfile → {perf.PROFILE_DIR}/")
+            if st.button(lang.T("perf_clear"), use_container_width=True):
+                perf.clear()
 
     st.markdown("---")
     st.markdown(
@@ -302,68 +491,90 @@ if selected_ledger_name:
     st.title(f"{selected_ledger_name}")
 else:
     st.title(lang.T("app_title"))
+    perf.end_rerun()
     st.stop()
 
-# 记账区
-with st.expander(lang.T("header_entry"), expanded=True):
-    c1, c2, c3, c4 = st.columns([1.2, 1, 1.2, 1])
-    with c1: st.date_input(lang.T("date"), date.today(), key='input_date')
-    with c2:
-        type_opts = ["支出", "收入"] if st.session_state.get('language_code') == 'CN' else ["Expense", "Income"]
-        st.selectbox(lang.T("category"), type_opts, key='input_type', label_visibility="visible")
-    with c3:
-        current_cats = backend.get_categories(current_ledger_id)
-        st.selectbox(lang.T("category"), current_cats, format_func=lang.get_cat_display,
-                     key=f'input_category_{st.session_state.get("language_code")}')
-    with c4:
-        st.number_input(lang.T("amount"), min_value=0.0, step=1.0, format="%.2f",
-                        key='input_amount', on_change=save_callback)
-
-    st.text_input(lang.T("note"), key='input_note', placeholder="Note...", on_change=save_callback)
-    st.button(lang.T("btn_save"), on_click=save_callback, type="primary", use_container_width=True)
+# 记账区 (片段：输入、保存只重跑这一块)
+entry_form(current_ledger_id)
+
+# 周期记账规则
+recurring_manager(current_ledger_id)
+
+# 批量导入银行流水
+with perf.span("import"), st.expander(lang.T("import_title")):
+    up_file = st.file_uploader(lang.T("import_title"), type=["csv", "xlsx"], label_visibility="collapsed")
+    if up_file is not None:
+        src_cols = importer.read_header(up_file, up_file.name)
+        guessed = importer.guess_mapping(src_cols)
+        st.caption(lang.T("import_map"))
+        map_cols = st.columns(len(importer.FIELDS))
+        col_mapping = {}
+        for mc, field in zip(map_cols, importer.FIELDS):
+            opts = [None] + src_cols
+            col_mapping[field] = mc.selectbox(
+                lang.T(field), opts, index=opts.index(guessed[field]) if field in guessed else 0,
+                format_func=lambda c: lang.T("import_none") if c is None else c, key=f"import_map_{field}")
+
+        can_import = bool(col_mapping['date'] and col_mapping['amount'])
+        if st.button(lang.T("import_btn"), type="primary", disabled=not can_import, use_container_width=True):
+            bar = st.progress(0.0)
+            file_size = max(up_file.size, 1)
+            stats = None
+            for stats in importer.import_statement(current_ledger_id, up_file, up_file.name, col_mapping):
+                done = up_file.tell() / file_size if not up_file.name.lower().endswith(".xlsx") else 1.0
+                bar.progress(min(done, 1.0), text=f"{stats['imported']:,} rows · {stats['rows_per_sec']:,.0f} rows/s")
+            bar.progress(1.0)
+            if stats:
+                st.success(f"✅ {stats['imported']:,} rows in {stats['elapsed']:.1f}s "
+                           f"({stats['rows_per_sec']:,.0f} rows/s), skipped {stats['skipped']:,}")
 
 
-raw_df = backend.get_all_records(current_ledger_id)
-
 current_lang = st.session_state.get('language_code', 'CN')
 
-if not raw_df.empty:
-
-    # 0. 清洗数据
-    raw_df['category'] = raw_df['category'].astype(str).str.strip()
-
-    if current_lang == 'EN':
-        # 1. Type 翻译 (使用 Mapping 更稳健)
-        type_map_en = {'收入': 'Income', '支出': 'Expense', 'Income': 'Income', 'Expense': 'Expense'}
-        raw_df['type'] = raw_df['type'].map(type_map_en).fillna(raw_df['type'])
+# SQL 聚合模式下不再加载全量明细；pandas 对比模式才加载紧凑类型的 DataFrame
+with perf.span("load"):
+    ledger_totals = backend.get_totals_cents(current_ledger_id)
+data_ver = backend.data_version(current_ledger_id)
+agg_mode = 'sql' if USE_SQL_AGGREGATES else 'pandas'
+shared = {}
 
-        # 2. Category 翻译
-        raw_df['category'] = raw_df['category'].replace(lang.CAT_TRANS)
-
-    else:
 
-        type_map_cn = {'Income': '收入', 'Expense': '支出', '收入': '收入', '支出': '支出'}
-        raw_df['type'] = raw_df['type'].map(type_map_cn).fillna(raw_df['type'])
+def raw_records():
+    # pandas 对比模式的全量明细：只有用到它的视图才加载，一次 rerun 内只加载一次
+    if 'raw_df' not in shared:
+        with perf.span("load"):
+            shared['raw_df'] = lang.localize_typed_records(backend.get_records_typed(current_ledger_id),
+                                                           current_lang)
+    return shared['raw_df']
 
-        raw_df['category'] = raw_df['category'].replace(lang.CAT_TRANS_REV)
-        raw_df['category'] = raw_df['category'].replace(lang.CAT_CN_EMOJI)
 
-# 选项卡
-tab_overview, tab_stats, tab_data, tab_report = st.tabs(
-    [lang.T("tab_overview"), lang.T("tab_stats"), lang.T("tab_data"), lang.T("tab_report")])
+# 视图切换：st.tabs 每次 rerun 都会执行全部四个选项卡，这里改成导航状态，只渲染当前视图
+VIEWS = ['overview', 'stats', 'data', 'report']
+view_labels = {lang.T(f"tab_{v}"): v for v in VIEWS}
+view_sel = st.radio("View", list(view_labels), index=VIEWS.index(st.session_state.get('active_view', 'overview')),
+                    horizontal=True, key=f"main_view_{current_lang}", label_visibility="collapsed")
+active_view = st.session_state['active_view'] = view_labels[view_sel]
 
-if raw_df.empty:
+if ledger_totals['count'] == 0:
     st.info(lang.T("empty"))
+    perf.end_rerun()
     st.stop()
 
+
 # === Tab 1: 概览 ===
-with tab_overview:
+def view_overview():
     inc_key = '收入' if current_lang == 'CN' else 'Income'
     exp_key = '支出' if current_lang == 'CN' else 'Expense'
 
-    inc = raw_df[raw_df['type'] == inc_key]['amount'].sum()
-    exp = raw_df[raw_df['type'] == exp_key]['amount'].sum()
-    bal = inc - exp
+    if USE_SQL_AGGREGATES:
+        # 整数分相减后再换算成元，余额不会有浮点尾差
+        inc_c, exp_c = ledger_totals['Income'], ledger_totals['Expense']
+        inc, exp, bal = backend.from_cents(inc_c), backend.from_cents(exp_c), backend.from_cents(inc_c - exp_c)
+    else:
+        raw_df = raw_records()
+        inc = raw_df[raw_df['type'] == inc_key]['amount'].sum()
+        exp = raw_df[raw_df['type'] == exp_key]['amount'].sum()
+        bal = inc - exp
 
     col1, col2, col3 = st.columns(3)
     col1.metric(lang.T("total_income"), f"{CURRENCY} {inc:,.2f}", delta="Income", delta_color="normal")
@@ -371,64 +582,164 @@ with tab_overview:
     col3.metric(lang.T("balance"), f"{CURRENCY} {bal:,.2f}", delta=f"{bal:,.2f}", delta_color="normal")
 
     st.divider()
+
+    # 图表按数据版本缓存，load_* 只在版本变化 (或切换语言) 后才会执行
+    def load_pie():
+        if USE_SQL_AGGREGATES:
+            chart_data = backend.get_sum_by_category(current_ledger_id)
+            chart_data['category'] = chart_data['category'].map(lang.get_cat_display)
+            return chart_data.groupby('category')['amount'].sum().reset_index()
+        return raw_records().groupby('category', observed=True)['amount'].sum().reset_index()
+
+    def load_balance():
+        if USE_SQL_AGGREGATES:
+            return backend.get_balance_series(current_ledger_id)
+        raw_df = raw_records()
+        signed = raw_df['amount'].where(raw_df['type'] == inc_key, -raw_df['amount'])
+        balance = signed.groupby(raw_df['date']).sum().cumsum()
+        return balance.rename('balance').reset_index()
+
     c_chart1, c_chart2 = st.columns(2)
     with c_chart1:
         st.subheader("📊 " + ("收支构成" if current_lang == 'CN' else "Composition"))
-
-        # 🔥 再次确保饼图数据是翻译过的
-        df_pie = raw_df.copy()
-        chart_data = df_pie.groupby('category')['amount'].sum().reset_index()
-
-        fig_pie = px.pie(chart_data, values='amount', names='category', hole=0.5)
+        fig_pie = charts.cached_figure('pie', current_ledger_id, data_ver, current_lang, (agg_mode,),
+                                       lambda: charts.category_pie(load_pie()))
         st.plotly_chart(fig_pie, use_container_width=True)
 
     with c_chart2:
-        st.subheader("📅 " + ("近期趋势" if current_lang == 'CN' else "Trend"))
-        daily_trend = raw_df.groupby('date')['amount'].sum().reset_index()
-        fig_line = px.area(daily_trend, x='date', y='amount')
+        st.subheader("📈 " + ("余额走势" if current_lang == 'CN' else "Balance"))
+        fig_line = charts.cached_figure('balance', current_ledger_id, data_ver, current_lang,
+                                        (agg_mode, charts.TREND_MAX_POINTS),
+                                        lambda: charts.balance_line(load_balance()))
         st.plotly_chart(fig_line, use_container_width=True)
 
+    # 本月预算 vs 实际
+    this_month = date.today().strftime('%Y-%m')
+    budgets = backend.get_budgets(current_ledger_id, this_month)
+    if not budgets.empty:
+        st.subheader("🎯 " + lang.T("budget_title").format(month=this_month))
+        budgets['category'] = budgets['category'].map(lang.get_cat_display)
+        budgets['status'] = budgets['used'].map(lambda u: "⚠️" if u > 1 else "")
+        budgets['used'] = budgets['used'] * 100
+        st.dataframe(
+            budgets,
+            use_container_width=True,
+            hide_index=True,
+            column_order=("status", "category", "used", "spent", "budget", "remaining"),
+            column_config={
+                "status": st.column_config.TextColumn("", width="small"),
+                "category": st.column_config.TextColumn(lang.T("category")),
+                "used": st.column_config.ProgressColumn(lang.T("col_used"), format="%.0f%%", min_value=0,
+                                                        max_value=100),
+                "spent": st.column_config.NumberColumn(lang.T("col_spent"), format=f"{CURRENCY} %.2f"),
+                "budget": st.column_config.NumberColumn(lang.T("col_budget"), format=f"{CURRENCY} %.2f"),
+                "remaining": st.column_config.NumberColumn(lang.T("col_remaining"), format=f"{CURRENCY} %.2f"),
+            }
+        )
+
+    # 本月月末预测 (按数据版本缓存)
+    projection, outlook = forecast.month_end_forecast(current_ledger_id, date.today())
+    spending = projection[projection['type'] == 'Expense']
+    if not spending.empty:
+        st.subheader("🔮 " + lang.T("forecast_title").format(month=outlook['month']))
+        f1, f2 = st.columns(2)
+        f1.metric(lang.T("forecast_balance"), f"{CURRENCY} {outlook['projected_balance']:,.2f}",
+                  delta=f"{outlook['projected_balance'] - outlook['balance']:,.2f}", delta_color="normal")
+        f2.metric(lang.T("forecast_expense"), f"{CURRENCY} {spending['projected'].sum():,.2f}",
+                  delta=f"{spending['spent'].sum():,.2f}", delta_color="off")
+        spending = spending.assign(category=spending['category'].map(lang.get_cat_display),
+                                   model=spending['model'].map(lambda m: lang.T(f"model_{m}")))
+        st.dataframe(
+            spending,
+            use_container_width=True,
+            hide_index=True,
+            column_order=("category", "spent", "projected", "forecast", "model"),
+            column_config={
+                "category": st.column_config.TextColumn(lang.T("category")),
+                "spent": st.column_config.NumberColumn(lang.T("col_spent"), format=f"{CURRENCY} %.2f"),
+                "projected": st.column_config.NumberColumn(lang.T("col_projected"), format=f"{CURRENCY} %.2f"),
+                "forecast": st.column_config.NumberColumn(lang.T("col_forecast"), format=f"{CURRENCY} %.2f"),
+                "model": st.column_config.TextColumn(lang.T("col_model")),
+            }
+        )
+
+
 # === Tab 2: 统计日历 ===
-with tab_stats:
+def view_stats():
     cc1, cc2 = st.columns([1, 2])
     with cc1:
-        v_mode_sel = st.radio(lang.T("cal_view"), [lang.T("view_month"), lang.T("view_week")], horizontal=True)
-        mode_code = 'Month' if v_mode_sel == lang.T("view_month") else 'Week'
+        view_modes = {lang.T("view_month"): 'Month', lang.T("view_week"): 'Week', lang.T("view_year"): 'Year'}
+        v_mode_sel = st.radio(lang.T("cal_view"), list(view_modes), horizontal=True)
+        mode_code = view_modes[v_mode_sel]
     with cc2: pick_date = st.date_input(lang.T("cal_date"), date.today())
 
     st.divider()
-    cal_html = render_calendar_html(pick_date.year, pick_date.month, raw_df, mode=mode_code, selected_date=pick_date)
+    if USE_SQL_AGGREGATES:
+        # 只查当前显示的月/年；数据版本不变时直接复用缓存的 HTML
+        def load_daily(start, end):
+            return backend.get_daily_net(current_ledger_id, start, end)
+
+        if mode_code == 'Year':
+            cal_html = calendar_view.year_heatmap_html(current_ledger_id, data_ver, pick_date.year, load_daily)
+        else:
+            cal_html = calendar_view.month_html(current_ledger_id, data_ver, pick_date.year, pick_date.month,
+                                                load_daily, mode=mode_code, selected_date=pick_date)
+    else:
+        daily_net = calendar_view.daily_net_from_records(raw_records())
+        if mode_code == 'Year':
+            cal_html = calendar_view.render_year_heatmap_html(pick_date.year, daily_net)
+        else:
+            cal_html = calendar_view.render_month_html(pick_date.year, pick_date.month, daily_net, mode=mode_code,
+                                                       selected_date=pick_date)
     st.markdown(cal_html, unsafe_allow_html=True)
 
     st.divider()
-    df_viz = raw_df.copy()
-    df_viz['month'] = pd.to_datetime(df_viz['date']).dt.to_period('M').astype(str)
-    monthly_stats = df_viz.groupby(['month', 'type'])['amount'].sum().reset_index()
-    fig_bar = px.bar(monthly_stats, x='month', y='amount', color='type', barmode='group', color_discrete_map=COLOR_MAP)
-    fig_bar.update_layout(
-        paper_bgcolor="rgba(0,0,0,0)",  # 画布背景透明
-        plot_bgcolor="rgba(0,0,0,0)",  # 图表区域背景透明
-        font=dict(color="gray"),  # 字体颜色微调（可选）
-        margin=dict(t=10, l=10, r=10, b=10)  # 减少留白
-    )
+
+    def load_monthly():
+        if USE_SQL_AGGREGATES:
+            monthly_stats = backend.get_monthly_by_type(current_ledger_id)
+            monthly_stats['type'] = monthly_stats['type'].map(lang.get_type_display)
+            return monthly_stats
+        raw_df = raw_records()
+        month_key = raw_df['date'].dt.to_period('M').astype(str).rename('month')
+        return raw_df.groupby([month_key, 'type'], observed=True)['amount'].sum().reset_index()
+
+    fig_bar = charts.cached_figure('monthly', current_ledger_id, data_ver, current_lang, (agg_mode,),
+                                   lambda: charts.monthly_bar(load_monthly(), COLOR_MAP))
     st.plotly_chart(fig_bar, use_container_width=True)
 
-# === Tab 3: 明细 ===
-with tab_data:
+
+# === Tab 3: 明细 (分页：每次只取一页) ===
+def view_data():
+    search_text = st.text_input("🔍", key="rec_search", placeholder=lang.T("search_hint"),
+                                label_visibility="collapsed").strip()
     with st.expander(lang.T("filter_label"), expanded=False):
         f1, f2 = st.columns(2)
-        available_cats = raw_df['category'].unique().tolist()
-        sel_cats = f1.multiselect(lang.T("filter_cat"), available_cats)
-
-        type_opts = [lang.T("all")] + (
-            [lang.T("Expense"), lang.T("Income")] if current_lang == 'EN' else ["支出", "收入"])
-        sel_type = f2.selectbox(lang.T("filter_type"), type_opts)
-
-    df_show = raw_df.copy()
-    if sel_cats: df_show = df_show[df_show['category'].isin(sel_cats)]
-    if sel_type != lang.T("all"):
-        target_type = sel_type
-        df_show = df_show[df_show['type'] == target_type]
+        sel_cats = f1.multiselect(lang.T("filter_cat"), backend.get_categories(current_ledger_id),
+                                  format_func=lang.get_cat_display)
+        sel_type = f2.selectbox(lang.T("filter_type"), [None, "Expense", "Income"],
+                                format_func=lambda t: lang.T("all") if t is None else lang.get_type_display(t))
+
+    # 筛选条件变化时回到第一页
+    filter_sig = (current_ledger_id, tuple(sel_cats), sel_type, search_text)
+    if st.session_state.get('rec_filter_sig') != filter_sig:
+        st.session_state['rec_filter_sig'] = filter_sig
+        st.session_state['rec_cursors'] = [None]
+    cursors = st.session_state['rec_cursors']
+
+    if search_text:
+        # 搜索结果按相关度排序，用 offset 翻页；游标栈里存的是 offset
+        offset = cursors[-1] or 0
+        df_show = backend.search_records(current_ledger_id, search_text, limit=RECORDS_PAGE_SIZE + 1,
+                                         offset=offset, categories=sel_cats, type=sel_type)
+        next_cursor = offset + RECORDS_PAGE_SIZE if len(df_show) > RECORDS_PAGE_SIZE else None
+        df_show = df_show.iloc[:RECORDS_PAGE_SIZE]
+    else:
+        df_show, next_cursor = backend.get_records_page(current_ledger_id, cursor=cursors[-1],
+                                                        page_size=RECORDS_PAGE_SIZE, categories=sel_cats,
+                                                        type=sel_type)
+    df_show['type'] = df_show['type'].map(lang.get_type_display)
+    df_show['category'] = df_show['category'].astype(str).str.strip().map(lang.get_cat_display)
 
     st.dataframe(
         df_show,
@@ -444,21 +755,36 @@ with tab_data:
         }
     )
 
+    p1, p2, p3 = st.columns([1, 2, 1])
+    p1.button("◀", on_click=prev_page_callback, disabled=len(cursors) <= 1, use_container_width=True)
+    p2.markdown(f"<div style='text-align: center;'>{len(cursors)}</div>", unsafe_allow_html=True)
+    p3.button("▶", on_click=next_page_callback, args=(next_cursor,), disabled=next_cursor is None,
+              use_container_width=True)
+
     c_del1, c_del2 = st.columns([3, 1])
     with c_del1:
-        del_opts = {f"{r['date']} - {r['category']} - {r['amount']}": r['id'] for i, r in df_show.iterrows()}
-        sel_rec_label = st.selectbox("Delete Record", options=list(del_opts.keys()), label_visibility="collapsed")
+        del_labels = dict(zip(df_show['id'], df_show['date'] + " - " + df_show['category'] + " - " +
+                              df_show['amount'].astype(str)))
+        sel_rec_id = st.selectbox("Delete Record", options=list(del_labels), format_func=del_labels.get,
+                                  label_visibility="collapsed")
     with c_del2:
         if st.button("🗑️ " + lang.T("tab_del"), type="secondary", use_container_width=True):
-            if sel_rec_label:
-                backend.delete_record(del_opts[sel_rec_label])
-                st.rerun()
+            if sel_rec_id is not None:
+                # 和保存一样：库被锁、写线程超时等只提示，不把异常抛到页面上
+                try:
+                    writer.delete_record(int(sel_rec_id), current_ledger_id).result(timeout=writer.WRITE_TIMEOUT)
+                except Exception as e:
+                    st.error(f"❌ {e}")
+                else:
+                    st.rerun()
+
 
 # === Tab 4: 财务报告 (专业版：去 Emoji + 收支分列) ===
-with tab_report:
+def view_report():
     st.subheader(lang.T("report_type"))
     report_mode = st.radio("Mode", [lang.T("rep_weekly"), lang.T("rep_monthly"), lang.T("rep_yearly")], horizontal=True,
                            label_visibility="collapsed")
+    rep_all_ledgers = st.toggle(lang.T("rep_all_ledgers"), key="rep_all_ledgers")
 
     start_date, end_date = None, None
     filter_desc = ""
@@ -482,10 +808,82 @@ with tab_report:
             end_date = date(sel_year, 12, 31)
             filter_desc = f"Year: {sel_year}"
 
-    if start_date and end_date:
-        mask = (pd.to_datetime(raw_df['date']).dt.date >= start_date) & (
-                pd.to_datetime(raw_df['date']).dt.date <= end_date)
-        rep_df = raw_df[mask].copy()
+    def export_category_label(cat_name):
+        # 去掉 Emoji 前缀，报表里只保留文字
+        label = lang.get_cat_display(cat_name)
+        if label in lang.CAT_TRANS.values() or label in lang.CAT_CN_EMOJI.values():
+            return label.split(" ", 1)[1]
+        return label
+
+    export_headers = [lang.T('col_date'), lang.T('col_cat'), lang.T('col_inc'), lang.T('col_exp'),
+                      lang.T('col_note')]
+
+    if start_date and end_date and rep_all_ledgers:
+        # === 多账本合并报表 ===
+        cons = consolidated.consolidated_report(start_date, end_date)
+        st.divider()
+        st.markdown(f"### 📚 {lang.T('rep_all_ledgers')} · {filter_desc}")
+        c_tot = cons['totals']
+        rc1, rc2, rc3 = st.columns(3)
+        rc1.metric(lang.T("total_income"), f"{CURRENCY} {backend.from_cents(c_tot['Income']):,.2f}")
+        rc2.metric(lang.T("total_expense"), f"{CURRENCY} {backend.from_cents(c_tot['Expense']):,.2f}")
+        rc3.metric(lang.T("balance"), f"{CURRENCY} {backend.from_cents(c_tot['Income'] - c_tot['Expense']):,.2f}")
+
+        ledger_table = cons['ledgers'].assign(**{col: cons['ledgers'][col] / 100.0
+                                                 for col in ('income', 'expense', 'balance')})
+        st.dataframe(
+            ledger_table,
+            use_container_width=True,
+            hide_index=True,
+            column_order=("ledger", "income", "expense", "balance", "count"),
+            column_config={
+                "ledger": st.column_config.TextColumn(lang.T("col_ledger")),
+                "income": st.column_config.NumberColumn(lang.T("total_income"), format=f"{CURRENCY} %.2f"),
+                "expense": st.column_config.NumberColumn(lang.T("total_expense"), format=f"{CURRENCY} %.2f"),
+                "balance": st.column_config.NumberColumn(lang.T("balance"), format=f"{CURRENCY} %.2f"),
+                "count": st.column_config.NumberColumn(lang.T("col_count")),
+            }
+        )
+
+        st.subheader(lang.T("cat_breakdown"))
+        cons_cats = cons['categories'].assign(category=cons['categories']['category'].map(lang.get_cat_display),
+                                              type=cons['categories']['type'].map(lang.get_type_display),
+                                              amount=cons['categories']['amount_cents'] / 100.0)
+        st.dataframe(
+            cons_cats,
+            use_container_width=True,
+            hide_index=True,
+            column_order=("category", "type", "amount"),
+            column_config={
+                "category": st.column_config.TextColumn(lang.T("category")),
+                "type": st.column_config.TextColumn(lang.T("type")),
+                "amount": st.column_config.NumberColumn(lang.T("amount"), format=f"{CURRENCY} %.2f")
+            }
+        )
+
+        if st.button(lang.T('download_excel'), key="cons_export", use_container_width=True):
+            with st.spinner("..."):
+                cons_data = consolidated.export_consolidated_xlsx(
+                    cons, export_headers,
+                    [lang.T('col_ledger'), lang.T('total_income'), lang.T('total_expense'), lang.T('balance'),
+                     lang.T('col_count')],
+                    category_label=export_category_label)
+            st.download_button(
+                label=f"⬇️ Consolidated_Report_{start_date}_{end_date}.xlsx",
+                data=cons_data,
+                file_name=f'Consolidated_Report_{start_date}_{end_date}.xlsx',
+                mime=backend.EXPORT_MIME['xlsx'],
+                type='primary',
+                use_container_width=True
+            )
+
+    elif start_date and end_date:
+        if USE_SQL_AGGREGATES:
+            rep_df = lang.localize_typed_records(
+                backend.get_records_typed(current_ledger_id, start_date, end_date), current_lang)
+        else:
+            raw_df = raw_records()
+            rep_df = raw_df[raw_df['date'].between(pd.Timestamp(start_date), pd.Timestamp(end_date))]
 
         st.divider()
         st.markdown(f"### 📄 {filter_desc}")
@@ -494,9 +892,14 @@ with tab_report:
             inc_k = '收入' if current_lang == 'CN' else 'Income'
             exp_k = '支出' if current_lang == 'CN' else 'Expense'
 
-            r_inc = rep_df[rep_df['type'] == inc_k]['amount'].sum()
-            r_exp = rep_df[rep_df['type'] == exp_k]['amount'].sum()
-            r_bal = r_inc - r_exp
+            if USE_SQL_AGGREGATES:
+                rep_totals = backend.get_totals_cents(current_ledger_id, start_date, end_date)
+                r_inc, r_exp = backend.from_cents(rep_totals['Income']), backend.from_cents(rep_totals['Expense'])
+                r_bal = backend.from_cents(rep_totals['Income'] - rep_totals['Expense'])
+            else:
+                r_inc = rep_df[rep_df['type'] == inc_k]['amount'].sum()
+                r_exp = rep_df[rep_df['type'] == exp_k]['amount'].sum()
+                r_bal = r_inc - r_exp
 
             rc1, rc2, rc3 = st.columns(3)
             rc1.metric(lang.T("total_income"), f"{CURRENCY} {r_inc:,.2f}")
@@ -505,8 +908,14 @@ with tab_report:
 
             # === 页面展示：分类汇总 ===
             st.subheader(lang.T("cat_breakdown"))
-            cat_summary = rep_df.groupby(['category', 'type'])['amount'].sum().reset_index().sort_values('amount',
-                                                                                                         ascending=False)
+            if USE_SQL_AGGREGATES:
+                cat_summary = backend.get_sum_by_category(current_ledger_id, start_date, end_date, by_type=True)
+                cat_summary['category'] = cat_summary['category'].map(lang.get_cat_display)
+                cat_summary['type'] = cat_summary['type'].map(lang.get_type_display)
+                cat_summary = cat_summary.groupby(['category', 'type'])['amount'].sum().reset_index()
+            else:
+                cat_summary = rep_df.groupby(['category', 'type'], observed=True)['amount'].sum().reset_index()
+            cat_summary = cat_summary.sort_values('amount', ascending=False)
             st.dataframe(
                 cat_summary,
                 use_container_width=True,
@@ -534,103 +943,25 @@ with tab_report:
                 }
             )
 
-            export_df = rep_df.copy()
-
-            # 1. 清洗 Emoji (保持不变)
-            def clean_emoji(val):
-                if isinstance(val, str) and " " in val:
-                    parts = val.split(" ", 1)
-                    if len(parts) > 1:
-                        return parts[1]
-                return val
-
-
-            export_df['category'] = export_df['category'].apply(clean_emoji)
-
-            # 2. 收支分列 (保持单币种 amount, 空值设为 None)
-            export_df[lang.T('col_inc')] = export_df.apply(lambda x: x['amount'] if x['type'] == inc_k else None,
-                                                           axis=1)
-            export_df[lang.T('col_exp')] = export_df.apply(lambda x: x['amount'] if x['type'] == exp_k else None,
-                                                           axis=1)
-
-            # 3. 整理列
-            final_cols = ['date', 'category', lang.T('col_inc'), lang.T('col_exp'), 'note']
-            export_df = export_df[final_cols]
-
-            # 4. 重命名列头 (方便后续操作)
-            col_date = lang.T('col_date')
-            col_cat = lang.T('col_cat')
-            col_inc = lang.T('col_inc')
-            col_exp = lang.T('col_exp')
-            col_note = lang.T('col_note')
-
-            export_df.columns = [col_date, col_cat, col_inc, col_exp, col_note]
-
-
-            # 第一步：计算原始总和
-            sum_inc = export_df[col_inc].sum()
-            sum_exp = export_df[col_exp].sum()
-
-            diff = 0
-            balancing_row = pd.DataFrame()
-            final_total = 0
-
-            # 第二步：判断哪边少，就在哪边补
-            if sum_inc > sum_exp:
-                # 收入 > 支出 (盈利)：需要在【支出列】补平
-                diff = sum_inc - sum_exp
-                final_total = sum_inc  # 最终平衡总额以大者为准
-
-                balancing_row = pd.DataFrame([{
-                    col_date: None,
-                    col_cat: "c.c",  # 用户要求的名称
-                    col_inc: None,
-                    col_exp: diff,  # 补在支出
-                    col_note: "Balancing Figure"
-                }])
-
-            elif sum_exp > sum_inc:
-                # 支出 > 收入 (亏损)：需要在【收入列】补平
-                diff = sum_exp - sum_inc
-                final_total = sum_exp  # 最终平衡总额以大者为准
-
-                balancing_row = pd.DataFrame([{
-                    col_date: None,
-                    col_cat: "c.c",
-                    col_inc: diff,  # 补在收入
-                    col_exp: None,
-                    col_note: "Balancing Figure"
-                }])
-
-            else:
-                # 刚好相等
-                final_total = sum_inc
-
-            # 第三步：如果有差额，插入平衡行
-            if diff > 0 and not balancing_row.empty:
-                export_df = pd.concat([export_df, balancing_row], ignore_index=True)
-
-            # 第四步：添加最终的 TOTAL 行 (两边金额现在一定相等)
-            total_row = pd.DataFrame([{
-                col_date: "TOTAL",
-                col_cat: "",
-                col_inc: final_total,
-                col_exp: final_total,
-                col_note: "Balanced"
-            }])
-
-            export_df = pd.concat([export_df, total_row], ignore_index=True)
-
-            # ==========================================
-            # 🔴 结束修改
-            # ==========================================
-
-            excel_data = backend.to_excel(export_df)
-
-            st.download_button(
-                label=f"{lang.T('download_excel')}",
-                data=excel_data,
-                file_name=f'Financial_Report_{start_date}_{end_date}.xlsx',
-                mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                type='primary'
-            )
\ No newline at end of file
+            # === 导出：只有点击后才生成文件 ===
+            ex1, ex2 = st.columns([1, 2])
+            export_fmt = ex1.selectbox("Format", backend.EXPORT_FORMATS, format_func=str.upper,
+                                       label_visibility="collapsed")
+            if ex2.button(lang.T('download_excel'), use_container_width=True):
+                with st.spinner("..."):
+                    export_data = backend.export_report(current_ledger_id, start_date, end_date, export_headers,
+                                                        fmt=export_fmt, category_label=export_category_label)
+                st.download_button(
+                    label=f"⬇️ Financial_Report_{start_date}_{end_date}.{export_fmt}",
+                    data=export_data,
+                    file_name=f'Financial_Report_{start_date}_{end_date}.{export_fmt}',
+                    mime=backend.EXPORT_MIME[export_fmt],
+                    type='primary',
+                    use_container_width=True
+                )
+
+
+with perf.span(f"view.{active_view}"):
+    {'overview': view_overview, 'stats': view_stats, 'data': view_data, 'report': view_report}[active_view]()
+
+perf.end_rerun()
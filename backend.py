@@ -1,160 +1,1406 @@
 import sqlite3
+import threading
 import pandas as pd
 import io
+import csv
+import functools
+import importlib.util
+import os
+import sys
+from collections import OrderedDict
+from contextlib import contextmanager
+from decimal import Decimal, ROUND_HALF_UP
+from pathlib import Path
+
+import perf
 
 DB_FILE = 'account.db'
 
+# 每个连接只在打开时配置一次，之后在 rerun 之间复用
+CONN_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA temp_store=MEMORY",
+)
+POOL_MAX_IDLE = 8
+BUSY_TIMEOUT = 5.0
+
+
+class ConnectionPool:
+    def __init__(self, path, max_idle=POOL_MAX_IDLE, readonly=False):
+        self.path = path
+        self.max_idle = max_idle
+        self.readonly = readonly
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _open(self):
+        if self.readonly:
+            # 只读连接：WAL 下与写线程互不阻塞；journal_mode 由读写连接设置，这里跳过
+            uri = Path(self.path).resolve().as_uri() + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT, check_same_thread=False)
+            for pragma in CONN_PRAGMAS[1:]:
+                conn.execute(pragma)
+            conn.execute("PRAGMA query_only=ON")
+        else:
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+            for pragma in CONN_PRAGMAS:
+                conn.execute(pragma)
+        conn.set_trace_callback(perf.trace_sql)
+        return conn
+
+    def acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._open()
+
+    def release(self, conn):
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path=None, readonly=False):
+    path = path or DB_FILE
+    with _pools_lock:
+        pool = _pools.get((path, readonly))
+        if pool is None:
+            pool = _pools[(path, readonly)] = ConnectionPool(path, readonly=readonly)
+    return pool
+
+
+def close_pools(path=None):
+    with _pools_lock:
+        keys = [k for k in _pools if path is None or k[0] == path]
+        pools = [_pools.pop(k) for k in keys]
+    for pool in pools:
+        pool.close()
+    _close_watchers(path)
+
+
+@contextmanager
+def get_conn(path=None, readonly=False):
+    pool = get_pool(path, readonly)
+    conn = pool.acquire()
+    try:
+        yield conn
+        conn.commit()
+    except:
+        conn.rollback()
+        raise
+    finally:
+        pool.release(conn)
+
+
+# === 查询结果缓存 (进程内共享，按账本版本号失效) ===
+# 写操作提交后调用 invalidate(ledger_id) 递增版本号；版本号是缓存 key 的一部分，
+# 所以写之前发起、写之后才存入的旧结果永远不会被命中
+CACHE_MAX_ENTRIES = 256
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+GLOBAL_SCOPE = None
+
+_cache = OrderedDict()
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+_versions = {}
+_cache_counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+
+def data_version(ledger_id=GLOBAL_SCOPE):
+    refresh_if_changed(ledger_id)
+    return _versions.setdefault((DB_FILE, ledger_id), 0)
+
+
+def _sizeof(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=False).sum())
+    if isinstance(value, tuple):
+        return sum(_sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def _detach(value):
+    # 调用方可能会给返回的 DataFrame 赋新列，浅拷贝一份，避免改到缓存里的对象
+    if isinstance(value, pd.DataFrame):
+        return value.copy(deep=False)
+    if isinstance(value, list):
+        return list(value)
+    if isinstance(value, dict):
+        return dict(value)
+    if isinstance(value, tuple):
+        return tuple(_detach(v) for v in value)
+    return value
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _cache_evict(key):
+    global _cache_bytes
+    _, size = _cache.pop(key)
+    _cache_bytes -= size
+
 
-def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+def invalidate(ledger_id=GLOBAL_SCOPE):
+    with _cache_lock:
+        scope = (DB_FILE, ledger_id)
+        _versions[scope] = _versions.get(scope, 0) + 1
+        _cache_counters['invalidations'] += 1
+        for key in [k for k in _cache if k[0] == scope]:
+            _cache_evict(key)
 
+
+def clear_cache():
+    global _cache_bytes
+    with _cache_lock:
+        _cache.clear()
+        _cache_bytes = 0
+
+
+def cache_stats():
+    with _cache_lock:
+        return dict(_cache_counters, entries=len(_cache), bytes=_cache_bytes)
+
+
+# 其他进程 (cron 的 post-recurring、manage.py 等) 的提交不会经过本进程的 invalidate；
+# 每个库文件留一条专用连接看 PRAGMA data_version，其他连接提交过就整体失效
+_watchers = {}
+_watchers_lock = threading.Lock()
+
+
+def _file_changed(path):
+    with _watchers_lock:
+        watcher = _watchers.get(path)
+        if watcher is None:
+            conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+            _watchers[path] = [conn, conn.execute("PRAGMA data_version").fetchone()[0]]
+            return False
+        version = watcher[0].execute("PRAGMA data_version").fetchone()[0]
+        if version == watcher[1]:
+            return False
+        watcher[1] = version
+        return True
+
+
+def _close_watchers(path=None):
+    with _watchers_lock:
+        paths = [p for p in _watchers if path is None or p == path]
+        conns = [_watchers.pop(p)[0] for p in paths]
+    for conn in conns:
+        conn.close()
+
+
+def _invalidate_file():
+    # 目录库 (单文件模式下也是所有账本的数据) 变了：DB_FILE 下所有作用域的版本号都加一
+    with _cache_lock:
+        for scope in {k[0] for k in _cache} | set(_versions):
+            if scope[0] == DB_FILE:
+                _versions[scope] = _versions.get(scope, 0) + 1
+        _cache_counters['invalidations'] += 1
+        for key in [k for k in _cache if k[0][0] == DB_FILE]:
+            _cache_evict(key)
+
+
+def refresh_if_changed(ledger_id=GLOBAL_SCOPE):
+    # 本进程自己的提交也会让 data_version 变化，多失效一次只是少命中一次缓存
+    if _file_changed(DB_FILE):
+        # 目录库变了：存储模式可能被另一个进程的 split-ledgers 改过，下次重新读
+        _storage_modes.pop(DB_FILE, None)
+        _invalidate_file()
+    path = ledger_path(ledger_id)
+    if path != DB_FILE and _file_changed(path):
+        invalidate(ledger_id)
+
+
+def cached_query(fn):
+    # 第一个参数是 ledger_id；没有参数的查询 (如账本列表) 归到全局作用域
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        global _cache_bytes
+        ledger_id = args[0] if args else kwargs.get('ledger_id', GLOBAL_SCOPE)
+        refresh_if_changed(ledger_id)
+        scope = (DB_FILE, ledger_id)
+        key = (scope, _versions.setdefault(scope, 0), fn.__name__, _freeze(args[1:]),
+               tuple(sorted((k, _freeze(v)) for k, v in kwargs.items())))
+        with _cache_lock:
+            hit = _cache.get(key)
+            if hit is not None:
+                _cache.move_to_end(key)
+                _cache_counters['hits'] += 1
+                return _detach(hit[0])
+            _cache_counters['misses'] += 1
+
+        value = fn(*args, **kwargs)
+        size = _sizeof(value)
+        with _cache_lock:
+            if key[1] == _versions.get(scope, 0) and size <= CACHE_MAX_BYTES and key not in _cache:
+                _cache[key] = (value, size)
+                _cache_bytes += size
+                while len(_cache) > CACHE_MAX_ENTRIES or _cache_bytes > CACHE_MAX_BYTES:
+                    _cache_evict(next(iter(_cache)))
+                    _cache_counters['evictions'] += 1
+        return _detach(value)
+
+    return wrapper
+
+
+def init_db(path=None):
+    # path 为空时初始化目录库 DB_FILE (单文件模式下账本数据也在里面)；分库文件只建表，不写默认账本
+    with get_conn(path) as conn:
+        c = conn.cursor()
+
+        c.execute('''
+                  CREATE TABLE IF NOT EXISTS ledgers
+                  (
+                      id   INTEGER PRIMARY KEY AUTOINCREMENT,
+                      name TEXT UNIQUE
+                  )
+                  ''')
+
+        c.execute('''
+                  CREATE TABLE IF NOT EXISTS records
+                  (
+                      id        INTEGER PRIMARY KEY AUTOINCREMENT,
+                      ledger_id INTEGER,
+                      date      TEXT,
+                      type      TEXT,
+                      category  TEXT,
+                      amount    REAL,
+                      note      TEXT,
+                      FOREIGN KEY (ledger_id) REFERENCES ledgers (id)
+                  )
+                  ''')
+
+        c.execute('''
+                  CREATE TABLE IF NOT EXISTS categories
+                  (
+                      id        INTEGER PRIMARY KEY AUTOINCREMENT,
+                      ledger_id INTEGER,
+                      name      TEXT,
+                      UNIQUE (ledger_id, name)
+                  )
+                  ''')
+
+        c.execute('''
+                  CREATE TABLE IF NOT EXISTS schema_meta
+                  (
+                      key   TEXT PRIMARY KEY,
+                      value TEXT
+                  )
+                  ''')
+
+        migrate(conn)
+        ensure_derived(conn)
+
+        seed = False
+        if path is None:
+            # 存储模式只在新建库时由 LEDGER_STORAGE 决定；已有的库沿用单文件，改用 manage.py split-ledgers 转换
+            empty = conn.execute("SELECT count(*) FROM ledgers").fetchone()[0] == 0
+            if _get_meta(conn, 'storage') is None:
+                _set_meta(conn, 'storage', STORAGE_MODE if empty else 'single')
+            _storage_modes[DB_FILE] = _get_meta(conn, 'storage')
+            seed = empty
+    if seed:
+        add_ledger("My Ledger", ["餐饮", "交通", "购物", "居住", "工资", "娱乐"])
+
+
+# === Schema 迁移 ===
+# MIGRATIONS[i] 把库从 user_version i 升级到 i + 1；只追加，不修改已发布的步骤
+def _migration_record_indexes(c):
+    c.execute("CREATE INDEX IF NOT EXISTS idx_records_ledger_date ON records (ledger_id, date DESC, id DESC)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_records_ledger_category ON records (ledger_id, category, type, amount)")
+
+
+def _migration_superseded(c):
+    # v2 / v3 原先在这里建汇总表和触发器；现在由下面的 DERIVED_OBJECTS 统一管理
+    pass
+
+
+def _migration_amount_cents(c):
+    # 金额改为整数分 (amount_cents)，SQLite 不能改列类型，只能重建表
+    seq = c.execute("SELECT seq FROM sqlite_sequence WHERE name = 'records'").fetchone()
     c.execute('''
-              CREATE TABLE IF NOT EXISTS ledgers
+              CREATE TABLE records_new
               (
-                  id   INTEGER PRIMARY KEY AUTOINCREMENT,
-                  name TEXT UNIQUE
+                  id           INTEGER PRIMARY KEY AUTOINCREMENT,
+                  ledger_id    INTEGER,
+                  date         TEXT,
+                  type         TEXT,
+                  category     TEXT,
+                  amount_cents INTEGER NOT NULL DEFAULT 0,
+                  note         TEXT,
+                  FOREIGN KEY (ledger_id) REFERENCES ledgers (id)
               )
               ''')
+    # 用和 to_cents 同一套十进制四舍五入：SQLite 的 ROUND(1.005 * 100) 会得到 100 而不是 101
+    c.connection.create_function('to_cents', 1, to_cents, deterministic=True)
+    c.execute("""INSERT INTO records_new (id, ledger_id, date, type, category, amount_cents, note)
+                 SELECT id, ledger_id, date, type, category, to_cents(amount), note
+                 FROM records""")
+    c.execute("DROP TABLE records")
+    c.execute("ALTER TABLE records_new RENAME TO records")
+    if seq:
+        c.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'records'", (seq[0],))
+    c.execute("CREATE INDEX IF NOT EXISTS idx_records_ledger_date ON records (ledger_id, date DESC, id DESC)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_records_ledger_category ON records (ledger_id, category)")
 
+
+def _migration_dimension_keys(c):
+    # type 改为整数 type_code，category 改为指向 categories.id 的 category_id
+    c.execute("ALTER TABLE categories ADD COLUMN deleted INTEGER NOT NULL DEFAULT 0")
+    # 记录里用到、但分类表里已经删掉的名字补回来，标记为已删除，保持分类列表不变
+    c.execute("""INSERT OR IGNORE INTO categories (ledger_id, name, deleted)
+                 SELECT DISTINCT ledger_id, TRIM(category), 1 FROM records
+                 WHERE TRIM(category) != ''""")
+    seq = c.execute("SELECT seq FROM sqlite_sequence WHERE name = 'records'").fetchone()
     c.execute('''
-              CREATE TABLE IF NOT EXISTS records
+              CREATE TABLE records_new
               (
-                  id        INTEGER PRIMARY KEY AUTOINCREMENT,
-                  ledger_id INTEGER,
-                  date      TEXT,
-                  type      TEXT,
-                  category  TEXT,
-                  amount    REAL,
-                  note      TEXT,
-                  FOREIGN KEY (ledger_id) REFERENCES ledgers (id)
+                  id           INTEGER PRIMARY KEY AUTOINCREMENT,
+                  ledger_id    INTEGER,
+                  date         TEXT,
+                  type_code    INTEGER NOT NULL CHECK (type_code IN (1, 2)),
+                  category_id  INTEGER,
+                  amount_cents INTEGER NOT NULL DEFAULT 0,
+                  note         TEXT,
+                  FOREIGN KEY (ledger_id) REFERENCES ledgers (id),
+                  FOREIGN KEY (category_id) REFERENCES categories (id)
               )
               ''')
+    c.execute("""INSERT INTO records_new (id, ledger_id, date, type_code, category_id, amount_cents, note)
+                 SELECT r.id, r.ledger_id, r.date,
+                        CASE WHEN r.type IN ('收入', 'Income') THEN 1 ELSE 2 END,
+                        (SELECT k.id FROM categories k WHERE k.ledger_id = r.ledger_id AND k.name = TRIM(r.category)),
+                        r.amount_cents, r.note
+                 FROM records r""")
+    c.execute("DROP TABLE records")
+    c.execute("ALTER TABLE records_new RENAME TO records")
+    if seq:
+        c.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'records'", (seq[0],))
+    c.execute("CREATE INDEX IF NOT EXISTS idx_records_ledger_date ON records (ledger_id, date DESC, id DESC)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_records_ledger_category ON records (ledger_id, category_id)")
+
 
+def _migration_budgets(c):
+    # 每个分类一个月度支出上限 (整数分)
     c.execute('''
-              CREATE TABLE IF NOT EXISTS categories
+              CREATE TABLE IF NOT EXISTS budgets
               (
-                  id        INTEGER PRIMARY KEY AUTOINCREMENT,
-                  ledger_id INTEGER,
-                  name      TEXT,
-                  UNIQUE (ledger_id, name)
+                  ledger_id   INTEGER NOT NULL,
+                  category_id INTEGER NOT NULL,
+                  limit_cents INTEGER NOT NULL CHECK (limit_cents > 0),
+                  PRIMARY KEY (ledger_id, category_id),
+                  FOREIGN KEY (category_id) REFERENCES categories (id)
+              ) WITHOUT ROWID
+              ''')
+
+
+def _migration_recurring(c):
+    # 周期记账规则；生成的记录带 rule_id，(rule_id, date) 唯一，重复补记会被忽略
+    c.execute('''
+              CREATE TABLE IF NOT EXISTS recurring_rules
+              (
+                  id           INTEGER PRIMARY KEY AUTOINCREMENT,
+                  ledger_id    INTEGER NOT NULL,
+                  type_code    INTEGER NOT NULL CHECK (type_code IN (1, 2)),
+                  category_id  INTEGER,
+                  amount_cents INTEGER NOT NULL,
+                  note         TEXT,
+                  freq         TEXT    NOT NULL CHECK (freq IN ('daily', 'weekly', 'monthly', 'yearly')),
+                  interval     INTEGER NOT NULL DEFAULT 1 CHECK (interval > 0),
+                  start_date   TEXT    NOT NULL,
+                  end_date     TEXT,
+                  last_posted  TEXT,
+                  FOREIGN KEY (category_id) REFERENCES categories (id)
               )
               ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_recurring_ledger ON recurring_rules (ledger_id)")
+    c.execute("ALTER TABLE records ADD COLUMN rule_id INTEGER")
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_records_rule_date ON records (rule_id, date) "
+              "WHERE rule_id IS NOT NULL")
+
 
-    c.execute("SELECT count(*) FROM ledgers")
-    if c.fetchone()[0] == 0:
-        c.execute("INSERT INTO ledgers (name) VALUES (?)", ("My Ledger",))
+MIGRATIONS = [
+    _migration_record_indexes,
+    _migration_superseded,
+    _migration_superseded,
+    _migration_amount_cents,
+    _migration_dimension_keys,
+    _migration_budgets,
+    _migration_recurring,
+]
 
-        default_ledger_id = c.lastrowid
 
-        default_cats = ["餐饮", "交通", "购物", "居住", "工资", "娱乐"]
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
 
-        for cat in default_cats:
-            c.execute("INSERT INTO categories (ledger_id, name) VALUES (?, ?)", (default_ledger_id, cat))
 
+def migrate(conn):
     conn.commit()
-    conn.close()
+    if get_schema_version(conn) >= len(MIGRATIONS):
+        return False
+
+    applied = False
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = get_schema_version(conn)
+            if version >= len(MIGRATIONS):
+                conn.rollback()
+                break
+            MIGRATIONS[version](conn.cursor())
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+            conn.commit()
+            applied = True
+        except:
+            conn.rollback()
+            raise
+
+    if applied:
+        conn.execute("ANALYZE")
+        conn.commit()
+    return applied
 
-def get_ledgers():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT id, name FROM ledgers")
-    res = c.fetchall()
-    conn.close()
-    return res
 
+# === 派生对象 (汇总表、触发器等) ===
+# 这些对象都能从 records 重新算出来，不走上面的线性迁移：定义变了就把版本号加一，
+# 启动时发现库里记录的版本不同，就整体删掉重建
+def _get_meta(conn, key):
+    row = conn.execute("SELECT value FROM schema_meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
 
-def add_ledger(name):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+
+def _set_meta(conn, key, value):
+    conn.execute("INSERT INTO schema_meta (key, value) VALUES (?, ?) "
+                 "ON CONFLICT (key) DO UPDATE SET value = excluded.value", (key, str(value)))
+
+
+def ensure_derived(conn):
+    conn.commit()
+    stale = [obj for obj in DERIVED_OBJECTS if _get_meta(conn, f"derived:{obj[0]}") != str(obj[1])]
+    if not stale:
+        return False
+
+    conn.execute("BEGIN IMMEDIATE")
     try:
-        c.execute("INSERT INTO ledgers (name) VALUES (?)", (name,))
-        new_id = c.lastrowid
-        default_cats = ["餐饮", "交通", "工资"]
-        for cat in default_cats:
-            c.execute("INSERT INTO categories (ledger_id, name) VALUES (?, ?)", (new_id, cat))
+        for name, version, install in stale:
+            if _get_meta(conn, f"derived:{name}") != str(version):
+                install(conn.cursor())
+                _set_meta(conn, f"derived:{name}", version)
         conn.commit()
-        success = True
     except:
-        success = False
-    conn.close()
-    return success
+        conn.rollback()
+        raise
+    conn.execute("ANALYZE")
+    conn.commit()
+    return True
+
+# === 存储模式：单文件 / 每个账本一个库文件 ===
+# sharded 模式下 DB_FILE 只是目录库 (ledgers 表)，账本数据在 <库名>.ledgers/ledger-<id>.db 里：
+# 不同账本的写入互不加锁，删账本就是删文件。表结构与单文件完全相同 (仍带 ledger_id 列)，查询不用改
+STORAGE_MODE = os.environ.get("LEDGER_STORAGE", "single")
+_storage_modes = {}
+_shards_ready = set()
+_shards_lock = threading.Lock()
+
+
+def storage_mode(catalog=None):
+    catalog = catalog or DB_FILE
+    mode = _storage_modes.get(catalog)
+    if mode is None:
+        with get_conn(catalog) as conn:
+            mode = _storage_modes[catalog] = _get_meta(conn, 'storage') or 'single'
+    return mode
+
+
+def shard_file(ledger_id, catalog=None):
+    catalog = Path(catalog or DB_FILE)
+    return str(catalog.with_name(catalog.stem + ".ledgers") / f"ledger-{ledger_id}.db")
+
+
+def ledger_path(ledger_id, catalog=None):
+    # 账本数据所在的库文件；分库文件第一次用到时建表 (每个进程一次)
+    catalog = catalog or DB_FILE
+    if ledger_id is None or storage_mode(catalog) != 'sharded':
+        return catalog
+    path = shard_file(ledger_id, catalog)
+    if path not in _shards_ready:
+        with _shards_lock:
+            if path not in _shards_ready:
+                Path(path).parent.mkdir(parents=True, exist_ok=True)
+                init_db(path)
+                _shards_ready.add(path)
+    return path
+
+
+def ledger_paths(ledger_id=None, catalog=None):
+    if ledger_id is not None:
+        return [ledger_path(ledger_id, catalog)]
+    if storage_mode(catalog) != 'sharded':
+        return [catalog or DB_FILE]
+    with get_conn(catalog) as conn:
+        ids = [row[0] for row in conn.execute("SELECT id FROM ledgers")]
+    return [ledger_path(lid, catalog) for lid in ids]
+
+
+def _drop_shard(ledger_id):
+    path = shard_file(ledger_id)
+    close_pools(path)
+    with _shards_lock:
+        _shards_ready.discard(path)
+    for suffix in ("", "-wal", "-shm"):
+        Path(path + suffix).unlink(missing_ok=True)
+
+
+# 分库后目录库里这些表不再接收新行；还按单文件模式运行的旧进程写进来会直接报错，而不是悄悄写丢
+SHARDED_TABLES = ('records', 'categories', 'budgets', 'recurring_rules')
+
+
+def split_ledgers(prune=False):
+    # 单文件 -> 分库：逐个账本把分类和记录 (保留 id) 拷进自己的库文件，校验笔数和金额后再切换模式。
+    # 整个过程持有目录库的写锁：应用正在写时拿不到锁直接失败，拆分期间应用的写入只能等待，
+    # 切换模式、装写入保护和 prune 都在同一个事务里提交。prune=True 时最后再 VACUUM
+    init_db()
+    if storage_mode() == 'sharded':
+        return []
+    source = str(Path(DB_FILE).resolve())
+    moved = []
+    with get_conn() as catalog:
+        catalog.execute("BEGIN EXCLUSIVE")
+        ledgers = catalog.execute("SELECT id, name FROM ledgers ORDER BY id").fetchall()
+        for ledger_id, name in ledgers:
+            moved.append((ledger_id, name) + _copy_ledger(ledger_id, source))
+
+        _set_meta(catalog, 'storage', 'sharded')
+        for table in SHARDED_TABLES:
+            catalog.execute(f"""CREATE TRIGGER IF NOT EXISTS sharded_guard_{table} BEFORE INSERT ON {table}
+                                BEGIN SELECT RAISE(ABORT, 'storage is sharded: ledger data lives in per-ledger files');
+                                END""")
+        if prune:
+            for table in ('daily_totals', 'monthly_totals', 'records', 'budgets', 'recurring_rules', 'categories'):
+                catalog.execute(f"DELETE FROM {table}")
+            if _has_fts(catalog):
+                # 删除只在全文索引里留墓碑，重建一次才真正释放空间
+                catalog.execute("INSERT INTO records_fts(records_fts) VALUES ('rebuild')")
+    _storage_modes[DB_FILE] = 'sharded'
+    if prune:
+        with get_conn() as conn:
+            conn.execute("VACUUM")
+    clear_cache()
+    return moved
+
+
+def _copy_ledger(ledger_id, source):
+    # 返回 (笔数, 分库文件)；笔数或金额对不上时抛错
+    path = shard_file(ledger_id)
+    _drop_shard(ledger_id)
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    init_db(path)
+    with get_conn(path) as conn:
+        conn.execute("ATTACH DATABASE ? AS src", (source,))
+        try:
+            conn.execute("UPDATE rollup_state SET deferred = 1")
+            conn.execute("INSERT INTO categories (id, ledger_id, name, deleted) "
+                         "SELECT id, ledger_id, name, deleted FROM src.categories WHERE ledger_id = ?",
+                         (ledger_id,))
+            conn.execute("INSERT INTO budgets (ledger_id, category_id, limit_cents) "
+                         "SELECT ledger_id, category_id, limit_cents FROM src.budgets WHERE ledger_id = ?",
+                         (ledger_id,))
+            conn.execute("INSERT INTO recurring_rules SELECT * FROM src.recurring_rules WHERE ledger_id = ?",
+                         (ledger_id,))
+            conn.execute("INSERT INTO records (id, ledger_id, date, type_code, category_id, amount_cents, note, "
+                         "rule_id) SELECT id, ledger_id, date, type_code, category_id, amount_cents, note, rule_id "
+                         "FROM src.records WHERE ledger_id = ?", (ledger_id,))
+            _add_to_rollups(conn.cursor())
+            conn.execute("UPDATE rollup_state SET deferred = 0")
+            conn.commit()
+            check = "SELECT count(*), COALESCE(SUM(amount_cents), 0) FROM {}records WHERE ledger_id = ?"
+            copied = conn.execute(check.format(""), (ledger_id,)).fetchone()
+            expected = conn.execute(check.format("src."), (ledger_id,)).fetchone()
+        except BaseException:
+            # 事务没结束时 DETACH 会报 database is locked，把原来的异常盖掉；先回滚
+            conn.rollback()
+            raise
+        finally:
+            conn.execute("DETACH DATABASE src")
+    if copied != expected:
+        raise RuntimeError(f"ledger {ledger_id}: copied {copied} != source {expected}")
+    return copied[0], path
+
+
+@cached_query
+def get_ledgers():
+    with get_conn() as conn:
+        return conn.execute("SELECT id, name FROM ledgers").fetchall()
+
+
+def add_ledger(name, categories=("餐饮", "交通", "工资")):
+    try:
+        with get_conn() as conn:
+            new_id = conn.execute("INSERT INTO ledgers (name) VALUES (?)", (name,)).lastrowid
+        with get_conn(ledger_path(new_id)) as conn:
+            conn.executemany("INSERT INTO categories (ledger_id, name) VALUES (?, ?)",
+                             [(new_id, cat) for cat in categories])
+    except sqlite3.Error:
+        return False
+    invalidate()
+    return True
+
+# 金额在库里存整数分，只在显示/导出时换算成元
+def to_cents(amount):
+    if amount is None:
+        return 0
+    return int(Decimal(str(amount)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP) * 100)
+
+
+def from_cents(cents):
+    return (cents or 0) / 100.0
+
+
+# 收支类型只有两种，库里存整数码；显示文字仍由 lang_pack 按英文名翻译
+INCOME_TYPES = ('收入', 'Income')
+EXPENSE_TYPES = ('支出', 'Expense')
+TYPE_INCOME, TYPE_EXPENSE = 1, 2
+TYPE_NAMES = {TYPE_INCOME: 'Income', TYPE_EXPENSE: 'Expense'}
+
+
+def type_code(type):
+    return TYPE_INCOME if type in INCOME_TYPES else TYPE_EXPENSE
+
+
+def _category_ids(conn, ledger_id, names):
+    # 名字 -> id；不存在的 (或已软删除的) 分类自动建好/恢复
+    names = {(n or '').strip() for n in names} - {''}
+    if not names:
+        return {}
+    conn.executemany("INSERT INTO categories (ledger_id, name) VALUES (?, ?) "
+                     "ON CONFLICT (ledger_id, name) DO UPDATE SET deleted = 0 WHERE deleted = 1",
+                     [(ledger_id, n) for n in names])
+    rows = conn.execute("SELECT name, id FROM categories WHERE ledger_id = ?", (ledger_id,)).fetchall()
+    return {name: cid for name, cid in rows if name in names}
+
+
+@cached_query
+def get_category_names(ledger_id):
+    # id -> 名字，包括已软删除的分类 (旧记录仍引用它们)
+    with get_conn(ledger_path(ledger_id)) as conn:
+        return dict(conn.execute("SELECT id, name FROM categories WHERE ledger_id = ?", (ledger_id,)).fetchall())
+
+
+# *_conn 版本在调用方的事务里执行、不提交也不失效缓存 (writer.py 的批量提交用)
+def insert_record_conn(conn, ledger_id, date, type, category, amount, note):
+    category_id = _category_ids(conn, ledger_id, [category]).get((category or '').strip())
+    return conn.execute("INSERT INTO records (ledger_id, date, type_code, category_id, amount_cents, note) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (ledger_id, date, type_code(type), category_id, to_cents(amount), note)).lastrowid
+
 
 def save_record(ledger_id, date, type, category, amount, note):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("INSERT INTO records (ledger_id, date, type, category, amount, note) VALUES (?, ?, ?, ?, ?, ?)",
-              (ledger_id, date, type, category, amount, note))
-    conn.commit()
-    conn.close()
+    with get_conn(ledger_path(ledger_id)) as conn:
+        record_id = insert_record_conn(conn, ledger_id, date, type, category, amount, note)
+    invalidate(ledger_id)
+    return record_id
 
 
+@contextmanager
+def deferred_rollups(conn):
+    # 整批插入期间暂停逐行的汇总触发器 (和 SQL 跟踪)，结束后把新行一次聚合进汇总表；只用于纯插入
+    first_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM records").fetchone()[0]
+    conn.execute("UPDATE rollup_state SET deferred = 1")
+    with perf.untraced(conn):
+        yield conn
+    _add_to_rollups(conn.cursor(), "records.id > ?", (first_id,))
+    conn.execute("UPDATE rollup_state SET deferred = 0")
+
+
+def bulk_insert_records(ledger_id, rows):
+    # rows: [(date, type, category, amount_cents, note), ...]，金额已是整数分，整批一个事务
+    rows = list(rows)
+    if not rows:
+        return 0
+    with get_conn(ledger_path(ledger_id)) as conn:
+        cat_ids = _category_ids(conn, ledger_id, {r[2] for r in rows})
+        with deferred_rollups(conn):
+            conn.executemany("INSERT INTO records (ledger_id, date, type_code, category_id, amount_cents, note) "
+                             "VALUES (?, ?, ?, ?, ?, ?)",
+                             [(ledger_id, d, type_code(t), cat_ids.get((cat or '').strip()), cents, note)
+                              for d, t, cat, cents, note in rows])
+    invalidate(ledger_id)
+    return len(rows)
+
+
+# 明细查询的列：type_code / category_id 在 SQL 里换回名字 (分类名按主键查)，列顺序与旧版 records 表一致
+RECORD_COLUMNS = f"""id, ledger_id, date,
+                     CASE type_code WHEN {TYPE_INCOME} THEN 'Income' ELSE 'Expense' END AS type,
+                     COALESCE((SELECT name FROM categories WHERE categories.id = records.category_id), '') AS category,
+                     amount_cents / 100.0 AS amount, note"""
+
+
+@cached_query
 def get_all_records(ledger_id):
-    conn = sqlite3.connect(DB_FILE)
-    try:
-        df = pd.read_sql_query("SELECT * FROM records WHERE ledger_id = ? ORDER BY date DESC",
-                               conn, params=(ledger_id,))
-    except:
-        df = pd.DataFrame(columns=['id', 'ledger_id', 'date', 'type', 'category', 'amount', 'note'])
-    conn.close()
+    with get_conn(ledger_path(ledger_id)) as conn:
+        try:
+            df = pd.read_sql_query(f"SELECT {RECORD_COLUMNS} FROM records WHERE ledger_id = ? ORDER BY date DESC",
+                                   conn, params=(ledger_id,))
+        except Exception:
+            return pd.DataFrame(columns=['id', 'ledger_id', 'date', 'type', 'category', 'amount', 'note'])
     return df
 
 
-def delete_record(record_id):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("DELETE FROM records WHERE id=?", (record_id,))
-    rows = c.rowcount
-    conn.commit()
-    conn.close()
-    return rows > 0
+def delete_record_conn(conn, record_id):
+    row = conn.execute("SELECT ledger_id FROM records WHERE id=?", (record_id,)).fetchone()
+    rows = conn.execute("DELETE FROM records WHERE id=?", (record_id,)).rowcount
+    return (row[0] if row else None), rows > 0
+
+
+def delete_record(record_id, ledger_id=None):
+    # 分库模式下记录 id 只在各自的库里唯一，必须带上 ledger_id
+    with get_conn(ledger_path(ledger_id)) as conn:
+        ledger_id, deleted = delete_record_conn(conn, record_id)
+    if ledger_id is not None:
+        invalidate(ledger_id)
+    return deleted
 
 
 def get_summary(df):
     if df.empty:
         return 0.0, 0.0, 0.0
-    inc = df[df['type'] == '收入']['amount'].sum()
-    exp = df[df['type'] == '支出']['amount'].sum()
+    inc = df[df['type'].isin(INCOME_TYPES)]['amount'].sum()
+    exp = df[df['type'].isin(EXPENSE_TYPES)]['amount'].sum()
     bal = inc - exp
     return inc, exp, bal
 
+@cached_query
 def get_categories(ledger_id):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT name FROM categories WHERE ledger_id = ?", (ledger_id,))
-    cats = [row[0] for row in c.fetchall()]
-    conn.close()
-    return cats
+    with get_conn(ledger_path(ledger_id)) as conn:
+        rows = conn.execute("SELECT name FROM categories WHERE ledger_id = ? AND deleted = 0 ORDER BY id",
+                            (ledger_id,)).fetchall()
+    return [row[0] for row in rows]
 
 
 def add_category(ledger_id, name):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+    # 已软删除的同名分类直接恢复
     try:
-        c.execute("INSERT INTO categories (ledger_id, name) VALUES (?, ?)", (ledger_id, name))
-        conn.commit()
-        success = True
-    except:
-        success = False
-    conn.close()
-    return success
+        with get_conn(ledger_path(ledger_id)) as conn:
+            added = conn.execute("INSERT INTO categories (ledger_id, name) VALUES (?, ?) "
+                                 "ON CONFLICT (ledger_id, name) DO UPDATE SET deleted = 0 WHERE deleted = 1",
+                                 (ledger_id, name)).rowcount > 0
+    except sqlite3.Error:
+        return False
+    if added:
+        invalidate(ledger_id)
+    return added
 
 
 def delete_category(ledger_id, name):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("DELETE FROM categories WHERE ledger_id=? AND name=?", (ledger_id, name))
-    conn.commit()
-    conn.close()
+    # 软删除：旧记录还引用这个 id，只从可选列表里隐藏
+    with get_conn(ledger_path(ledger_id)) as conn:
+        conn.execute("UPDATE categories SET deleted = 1 WHERE ledger_id=? AND name=?", (ledger_id, name))
+    invalidate(ledger_id)
+
+
+def rename_category(ledger_id, old_name, new_name):
+    new_name = (new_name or '').strip()
+    if not new_name or new_name == old_name:
+        return False
+    with get_conn(ledger_path(ledger_id)) as conn:
+        old = conn.execute("SELECT id FROM categories WHERE ledger_id = ? AND name = ?",
+                           (ledger_id, old_name)).fetchone()
+        if old is None:
+            return False
+        target = conn.execute("SELECT id FROM categories WHERE ledger_id = ? AND name = ?",
+                              (ledger_id, new_name)).fetchone()
+        if target is None:
+            # 记录只存 id，改名就是一条 UPDATE
+            conn.execute("UPDATE categories SET name = ? WHERE id = ?", (new_name, old[0]))
+        else:
+            # 改成已有的名字：记录并入目标分类，原分类软删除
+            conn.execute("UPDATE records SET category_id = ? WHERE category_id = ?", (target[0], old[0]))
+            # 目标分类没有预算时沿用原分类的预算
+            conn.execute("UPDATE OR IGNORE budgets SET category_id = ? WHERE category_id = ?", (target[0], old[0]))
+            conn.execute("DELETE FROM budgets WHERE category_id = ?", (old[0],))
+            # 周期规则跟着并过去，之后补记的记录也落在目标分类
+            conn.execute("UPDATE recurring_rules SET category_id = ? WHERE category_id = ?", (target[0], old[0]))
+            conn.execute("UPDATE categories SET deleted = 0 WHERE id = ?", (target[0],))
+            conn.execute("UPDATE categories SET deleted = 1 WHERE id = ?", (old[0],))
+    invalidate(ledger_id)
+    return True
+
+
+# === 预算 (每个分类每月一个支出上限) ===
+# 本月已花费就是 monthly_totals 里的一行，触发器在每次写入/删除时已经累加好，查预算不用重新求和
+def set_budget(ledger_id, category, amount):
+    # amount 为空或 0 表示取消这个分类的预算
+    cents = to_cents(amount)
+    with get_conn(ledger_path(ledger_id)) as conn:
+        category_id = _category_ids(conn, ledger_id, {category}).get((category or '').strip())
+        if cents > 0:
+            conn.execute("INSERT INTO budgets (ledger_id, category_id, limit_cents) VALUES (?, ?, ?) "
+                         "ON CONFLICT (ledger_id, category_id) DO UPDATE SET limit_cents = excluded.limit_cents",
+                         (ledger_id, category_id, cents))
+        else:
+            conn.execute("DELETE FROM budgets WHERE ledger_id = ? AND category_id = ?", (ledger_id, category_id))
+    invalidate(ledger_id)
+
+
+@cached_query
+def get_budgets(ledger_id, month):
+    # month: 'YYYY-MM'；按使用比例从高到低
+    query = f"""SELECT c.name AS category, b.limit_cents / 100.0 AS budget,
+                       COALESCE(m.amount_cents, 0) / 100.0 AS spent,
+                       (b.limit_cents - COALESCE(m.amount_cents, 0)) / 100.0 AS remaining,
+                       COALESCE(m.amount_cents, 0) * 1.0 / b.limit_cents AS used
+                FROM budgets b
+                JOIN categories c ON c.id = b.category_id AND c.deleted = 0
+                LEFT JOIN monthly_totals m ON m.ledger_id = b.ledger_id AND m.month = ?
+                     AND m.type_code = {TYPE_EXPENSE} AND m.category_id = b.category_id
+                WHERE b.ledger_id = ?
+                ORDER BY used DESC, c.id"""
+    with get_conn(ledger_path(ledger_id), readonly=True) as conn:
+        return pd.read_sql_query(query, conn, params=(str(month), ledger_id))
+
+
+def budget_status(ledger_id, category, month):
+    # 三次主键查找：分类名 -> 预算 -> 当月汇总行；没有预算时返回 None，否则 (已花费, 上限) 两个整数分
+    with get_conn(ledger_path(ledger_id), readonly=True) as conn:
+        row = conn.execute(f"""SELECT COALESCE(m.amount_cents, 0), b.limit_cents
+                               FROM categories c
+                               JOIN budgets b ON b.ledger_id = c.ledger_id AND b.category_id = c.id
+                               LEFT JOIN monthly_totals m ON m.ledger_id = c.ledger_id AND m.month = ?
+                                    AND m.type_code = {TYPE_EXPENSE} AND m.category_id = c.id
+                               WHERE c.ledger_id = ? AND c.name = ?""",
+                           (str(month), ledger_id, (category or '').strip())).fetchone()
+    return tuple(row) if row else None
+
+
+def budget_crossed(status, amount):
+    # status 为 budget_status 的结果；只有这一笔把分类从预算内推到超支时为 True，已经超支的不再重复提醒
+    if not status:
+        return False
+    spent, limit = status
+    return spent - to_cents(amount) <= limit < spent
+
 
+# === 周期记账规则 (到期的记录由 recurring.py 生成) ===
+RECURRING_FREQS = ('daily', 'weekly', 'monthly', 'yearly')
+
+
+def add_recurring_rule(ledger_id, type, category, amount, note, freq, start_date, end_date=None, interval=1):
+    with get_conn(ledger_path(ledger_id)) as conn:
+        category_id = _category_ids(conn, ledger_id, {category}).get((category or '').strip())
+        rule_id = conn.execute("""INSERT INTO recurring_rules (ledger_id, type_code, category_id, amount_cents, note,
+                                                               freq, interval, start_date, end_date)
+                                  VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                               (ledger_id, type_code(type), category_id, to_cents(amount), note, freq,
+                                int(interval), str(start_date), str(end_date) if end_date else None)).lastrowid
+    invalidate(ledger_id)
+    return rule_id
+
+
+def delete_recurring_rule(ledger_id, rule_id):
+    # 只删规则，已经生成的记录保留
+    with get_conn(ledger_path(ledger_id)) as conn:
+        conn.execute("DELETE FROM recurring_rules WHERE ledger_id = ? AND id = ?", (ledger_id, rule_id))
+    invalidate(ledger_id)
+
+
+@cached_query
+def get_recurring_rules(ledger_id):
+    query = """SELECT id, type_code, category_id, amount_cents / 100.0 AS amount, note, freq, interval,
+                      start_date, end_date, last_posted
+               FROM recurring_rules WHERE ledger_id = ? ORDER BY id"""
+    with get_conn(ledger_path(ledger_id), readonly=True) as conn:
+        df = pd.read_sql_query(query, conn, params=(ledger_id,))
+    names = get_category_names(ledger_id)
+    df.insert(1, 'type', df.pop('type_code').map(TYPE_NAMES))
+    df.insert(2, 'category', df.pop('category_id').map(names).fillna(''))
+    return df
+
+
+@cached_query
 def get_records_by_date_range(ledger_id, start_date, end_date):
-    conn = sqlite3.connect(DB_FILE)
-    query = "SELECT * FROM records WHERE ledger_id = ? AND date BETWEEN ? AND ? ORDER BY date DESC"
-    df = pd.read_sql_query(query, conn, params=(ledger_id, start_date, end_date))
-    conn.close()
+    query = f"SELECT {RECORD_COLUMNS} FROM records WHERE ledger_id = ? AND date BETWEEN ? AND ? ORDER BY date DESC"
+    with get_conn(ledger_path(ledger_id)) as conn:
+        df = pd.read_sql_query(query, conn, params=(ledger_id, start_date, end_date))
+    return df
+
+
+# === 紧凑类型的明细加载 (type/category 为 Categorical，date 为 datetime64) ===
+TYPED_COLUMNS = ('date', 'type', 'category', 'amount', 'note')
+TYPE_DTYPE = pd.CategoricalDtype(['Income', 'Expense'])
+TYPED_CHUNK_ROWS = 100000
+_TYPED_SELECT = {
+    'date': "date",
+    'type': "type_code AS type",
+    'category': "COALESCE(category_id, 0) AS category",
+    'amount': "amount_cents / 100.0 AS amount",
+    'note': "note",
+}
+
+
+def _typed_chunk(chunk, cat_dtype, cat_codes):
+    # type_code / category_id 直接映射成 Categorical 的 codes，不经过字符串
+    if 'date' in chunk:
+        chunk['date'] = pd.to_datetime(chunk['date'], format='ISO8601', errors='coerce')
+    if 'type' in chunk:
+        chunk['type'] = pd.Categorical.from_codes(chunk['type'].to_numpy(dtype='int64') - TYPE_INCOME,
+                                                  dtype=TYPE_DTYPE)
+    if 'category' in chunk:
+        codes = chunk['category'].map(cat_codes).fillna(-1).to_numpy(dtype='int64')
+        chunk['category'] = pd.Categorical.from_codes(codes, dtype=cat_dtype)
+    if 'amount' in chunk:
+        chunk['amount'] = chunk['amount'].astype('float64')
+    return chunk
+
+
+@cached_query
+def get_records_typed(ledger_id, start_date=None, end_date=None, columns=TYPED_COLUMNS):
+    where, params = _ledger_filter(ledger_id, start_date, end_date)
+    select = ", ".join(['id'] + [_TYPED_SELECT[c] for c in columns])
+    query = f"SELECT {select} FROM records WHERE {where} ORDER BY date DESC, id DESC"
+    with get_conn(ledger_path(ledger_id), readonly=True) as conn:
+        # 分类全集从月汇总表取 (行数很少)，每块按同一个 dtype 转换，拼接后仍是 Categorical。
+        # 汇总表、分类名和明细在同一个读事务 (同一快照) 里读，中间插入的新分类不会变成 NaN
+        conn.execute("BEGIN")
+        cat_ids = [r[0] for r in conn.execute("SELECT DISTINCT category_id FROM monthly_totals WHERE ledger_id = ?",
+                                              (ledger_id,))]
+        names = dict(conn.execute("SELECT id, name FROM categories WHERE ledger_id = ?", (ledger_id,)).fetchall())
+        labels = sorted({names.get(cid, '') for cid in cat_ids})
+        cat_dtype = pd.CategoricalDtype(labels)
+        cat_codes = {cid: labels.index(names.get(cid, '')) for cid in cat_ids}
+        chunks = [_typed_chunk(chunk, cat_dtype, cat_codes) for chunk in
+                  pd.read_sql_query(query, conn, params=params, chunksize=TYPED_CHUNK_ROWS)]
+    if not chunks:
+        empty = pd.DataFrame({c: [] for c in ('id',) + tuple(columns)}).astype({'id': 'int64'})
+        if 'type' in empty:
+            empty['type'] = empty['type'].astype('int64')
+        return _typed_chunk(empty, cat_dtype, cat_codes)
+    return pd.concat(chunks, ignore_index=True)
+
+
+# === 聚合查询 (读汇总表，页面只取需要渲染的结果) ===
+# 汇总表按 (type_code, category_id) 分组，结果里再换回名字
+def _label_rollup(df, ledger_id):
+    if 'type_code' in df:
+        df['type'] = df.pop('type_code').map(TYPE_NAMES)
+    if 'category_id' in df:
+        df['category'] = df.pop('category_id').map(get_category_names(ledger_id)).fillna('')
     return df
 
 
+def _ledger_filter(ledger_id, start_date=None, end_date=None):
+    where = "ledger_id = ?"
+    params = [ledger_id]
+    if start_date is not None:
+        where += " AND date >= ?"
+        params.append(str(start_date))
+    if end_date is not None:
+        where += " AND date <= ?"
+        params.append(str(end_date))
+    return where, params
+
+
+def _rollup_filter(ledger_id, start_date=None, end_date=None):
+    # 不限日期时读月汇总，行数最少；有日期范围时读日汇总
+    if start_date is None and end_date is None:
+        return 'monthly_totals', "ledger_id = ?", [ledger_id]
+    where, params = _ledger_filter(ledger_id, start_date, end_date)
+    return 'daily_totals', where, params
+
+
+@cached_query
+def get_totals_cents(ledger_id, start_date=None, end_date=None):
+    table, where, params = _rollup_filter(ledger_id, start_date, end_date)
+    with get_conn(ledger_path(ledger_id)) as conn:
+        rows = conn.execute(f"SELECT type_code, SUM(amount_cents), SUM(count) FROM {table} WHERE {where} "
+                            f"GROUP BY type_code", params).fetchall()
+    totals = {'Income': 0, 'Expense': 0, 'count': 0}
+    for code, cents, count in rows:
+        totals[TYPE_NAMES[code]] = cents or 0
+        totals['count'] += count
+    return totals
+
+
+def get_totals_by_type(ledger_id, start_date=None, end_date=None):
+    totals = get_totals_cents(ledger_id, start_date, end_date)
+    return {'Income': from_cents(totals['Income']), 'Expense': from_cents(totals['Expense']),
+            'count': totals['count']}
+
+
+@cached_query
+def get_sum_by_category(ledger_id, start_date=None, end_date=None, type=None, by_type=False):
+    table, where, params = _rollup_filter(ledger_id, start_date, end_date)
+    if type is not None:
+        where += " AND type_code = ?"
+        params.append(type_code(type))
+    keys = "category_id, type_code" if by_type else "category_id"
+    query = f"SELECT {keys}, SUM(amount_cents) / 100.0 AS amount FROM {table} WHERE {where} GROUP BY {keys}"
+    with get_conn(ledger_path(ledger_id)) as conn:
+        df = pd.read_sql_query(query, conn, params=params)
+    df = _label_rollup(df, ledger_id)
+    return df[['category', 'type', 'amount'] if by_type else ['category', 'amount']]
+
+
+@cached_query
+def get_daily_net(ledger_id, start_date=None, end_date=None):
+    where, params = _ledger_filter(ledger_id, start_date, end_date)
+    query = f"""SELECT date,
+                       SUM(CASE WHEN type_code = 1 THEN amount_cents ELSE 0 END) / 100.0 AS income,
+                       SUM(CASE WHEN type_code = 1 THEN 0 ELSE amount_cents END) / 100.0 AS expense,
+                       SUM(CASE WHEN type_code = 1 THEN amount_cents ELSE -amount_cents END) / 100.0 AS net
+                FROM daily_totals WHERE {where} GROUP BY date ORDER BY date"""
+    with get_conn(ledger_path(ledger_id)) as conn:
+        return pd.read_sql_query(query, conn, params=params)
+
+
+@cached_query
+def get_balance_series(ledger_id, start_date=None, end_date=None, opening=None):
+    # 每日收入/支出/净额，以及累计收入、累计支出和余额，全部用窗口函数在 SQLite 里算。
+    # opening 为空时，start_date 之前的净额结转为期初余额；给了 opening 就以它为 start_date 当天的期初
+    where, params = _ledger_filter(ledger_id, start_date, end_date)
+    if opening is not None:
+        opening_sql, opening_params = "?", [to_cents(opening)]
+    elif start_date is not None:
+        opening_sql = """COALESCE((SELECT SUM(CASE WHEN type_code = 1 THEN amount_cents ELSE -amount_cents END)
+                                   FROM daily_totals WHERE ledger_id = ? AND date < ?), 0)"""
+        opening_params = [ledger_id, str(start_date)]
+    else:
+        opening_sql, opening_params = "0", []
+    query = f"""SELECT date, income_cents / 100.0 AS income, expense_cents / 100.0 AS expense,
+                       (income_cents - expense_cents) / 100.0 AS net,
+                       SUM(income_cents) OVER w / 100.0 AS cum_income,
+                       SUM(expense_cents) OVER w / 100.0 AS cum_expense,
+                       ({opening_sql} + SUM(income_cents - expense_cents) OVER w) / 100.0 AS balance
+                FROM (SELECT date,
+                             SUM(CASE WHEN type_code = 1 THEN amount_cents ELSE 0 END) AS income_cents,
+                             SUM(CASE WHEN type_code = 1 THEN 0 ELSE amount_cents END) AS expense_cents
+                      FROM daily_totals WHERE {where} GROUP BY date)
+                WINDOW w AS (ORDER BY date ROWS UNBOUNDED PRECEDING)
+                ORDER BY date"""
+    with get_conn(ledger_path(ledger_id), readonly=True) as conn:
+        return pd.read_sql_query(query, conn, params=opening_params + params)
+
+
+@cached_query
+def get_monthly_by_type(ledger_id, start_date=None, end_date=None):
+    table, where, params = _rollup_filter(ledger_id, start_date, end_date)
+    period = 'month' if table == 'monthly_totals' else 'substr(date, 1, 7)'
+    query = f"""SELECT {period} AS month, type_code, SUM(amount_cents) / 100.0 AS amount
+                FROM {table} WHERE {where} GROUP BY 1, 2 ORDER BY 1, 2"""
+    with get_conn(ledger_path(ledger_id)) as conn:
+        df = pd.read_sql_query(query, conn, params=params)
+    return _label_rollup(df, ledger_id)[['month', 'type', 'amount']]
+
+
+@cached_query
+def get_monthly_by_category(ledger_id, start_month, end_month):
+    # 月份 'YYYY-MM' 闭区间内每月、每个 (类型, 分类) 的合计，整数分，不做标签转换
+    query = """SELECT month, type_code, category_id, amount_cents
+               FROM monthly_totals WHERE ledger_id = ? AND month BETWEEN ? AND ?
+               ORDER BY month, type_code, category_id"""
+    with get_conn(ledger_path(ledger_id), readonly=True) as conn:
+        return pd.read_sql_query(query, conn, params=(ledger_id, str(start_month), str(end_month)))
+
+
+# === 汇总表 (daily_totals / monthly_totals)，由 records 上的触发器在同一事务内增量维护 ===
+ROLLUP_TABLES = (('daily_totals', 'date', "COALESCE({r}.date, '')"),
+                 ('monthly_totals', 'month', "substr(COALESCE({r}.date, ''), 1, 7)"))
+
+
+def _rollup_key(r):
+    # 未分类的记录 (category_id 为 NULL) 归到 0
+    return f"{r}.type_code", f"COALESCE({r}.category_id, 0)"
+
+
+def _rollup_add_sql(table, period, period_expr):
+    type_expr, cat_expr = _rollup_key('NEW')
+    return f"""INSERT INTO {table} (ledger_id, {period}, type_code, category_id, amount_cents, count)
+               VALUES (NEW.ledger_id, {period_expr.format(r='NEW')}, {type_expr}, {cat_expr}, NEW.amount_cents, 1)
+               ON CONFLICT (ledger_id, {period}, type_code, category_id)
+                   DO UPDATE SET amount_cents = amount_cents + excluded.amount_cents, count = count + 1;"""
+
+
+def _rollup_remove_sql(table, period, period_expr):
+    type_expr, cat_expr = _rollup_key('OLD')
+    match = (f"ledger_id = OLD.ledger_id AND {period} = {period_expr.format(r='OLD')} "
+             f"AND type_code = {type_expr} AND category_id = {cat_expr}")
+    return f"""UPDATE {table} SET amount_cents = amount_cents - OLD.amount_cents, count = count - 1 WHERE {match};
+               DELETE FROM {table} WHERE {match} AND count <= 0;"""
+
+
+def _create_rollup_triggers(c):
+    add = "\n".join(_rollup_add_sql(*t) for t in ROLLUP_TABLES)
+    remove = "\n".join(_rollup_remove_sql(*t) for t in ROLLUP_TABLES)
+    c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_records_rollup_insert AFTER INSERT ON records
+                  WHEN (SELECT deferred FROM rollup_state) IS NOT 1
+                  BEGIN {add} END""")
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS trg_records_rollup_delete AFTER DELETE ON records BEGIN {remove} END")
+    c.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_records_rollup_update
+                  AFTER UPDATE OF ledger_id, date, type_code, category_id, amount_cents ON records
+                  BEGIN {remove} {add} END""")
+
+
+def _add_to_rollups(c, where="1", params=()):
+    type_expr, cat_expr = _rollup_key('records')
+    for table, period, period_expr in ROLLUP_TABLES:
+        c.execute(f"""INSERT INTO {table} (ledger_id, {period}, type_code, category_id, amount_cents, count)
+                      SELECT ledger_id, {period_expr.format(r='records')}, {type_expr}, {cat_expr},
+                             SUM(amount_cents), COUNT(*)
+                      FROM records WHERE {where} GROUP BY 1, 2, 3, 4
+                      ON CONFLICT (ledger_id, {period}, type_code, category_id)
+                          DO UPDATE SET amount_cents = amount_cents + excluded.amount_cents,
+                                        count = count + excluded.count""",
+                  params)
+
+
+def _rebuild_rollups(c, ledger_id=None):
+    for table, _, _ in ROLLUP_TABLES:
+        if ledger_id is None:
+            c.execute(f"DELETE FROM {table}")
+        else:
+            c.execute(f"DELETE FROM {table} WHERE ledger_id = ?", (ledger_id,))
+    if ledger_id is None:
+        _add_to_rollups(c)
+    else:
+        _add_to_rollups(c, "records.ledger_id = ?", (ledger_id,))
+
+
+def _install_rollups(c):
+    for trigger in ('insert', 'delete', 'update'):
+        c.execute(f"DROP TRIGGER IF EXISTS trg_records_rollup_{trigger}")
+    for table, period, _ in ROLLUP_TABLES:
+        c.execute(f"DROP TABLE IF EXISTS {table}")
+        c.execute(f'''
+                  CREATE TABLE {table}
+                  (
+                      ledger_id    INTEGER,
+                      {period:<12} TEXT,
+                      type_code    INTEGER,
+                      category_id  INTEGER,
+                      amount_cents INTEGER NOT NULL DEFAULT 0,
+                      count        INTEGER NOT NULL DEFAULT 0,
+                      PRIMARY KEY (ledger_id, {period}, type_code, category_id)
+                  ) WITHOUT ROWID
+                  ''')
+    # 批量导入时暂停逐行触发器，改为整批聚合后一次写入汇总表
+    c.execute('''
+              CREATE TABLE IF NOT EXISTS rollup_state
+              (
+                  id       INTEGER PRIMARY KEY CHECK (id = 1),
+                  deferred INTEGER NOT NULL DEFAULT 0
+              )
+              ''')
+    c.execute("INSERT OR IGNORE INTO rollup_state (id, deferred) VALUES (1, 0)")
+    _create_rollup_triggers(c)
+    _rebuild_rollups(c)
+
+
+def rebuild_rollups(ledger_id=None):
+    for path in ledger_paths(ledger_id):
+        with get_conn(path) as conn:
+            _rebuild_rollups(conn.cursor(), ledger_id)
+    if ledger_id is None:
+        clear_cache()
+    else:
+        invalidate(ledger_id)
+
+
+def check_rollups(ledger_id=None):
+    type_expr, cat_expr = _rollup_key('records')
+    where = "" if ledger_id is None else "WHERE ledger_id = ?"
+    mismatches = []
+    for path in ledger_paths(ledger_id):
+        with get_conn(path) as conn:
+            mismatches.extend(_check_rollups_conn(conn, where, type_expr, cat_expr, ledger_id))
+    return mismatches
+
+
+def _check_rollups_conn(conn, where, type_expr, cat_expr, ledger_id):
+    mismatches = []
+    for table, period, period_expr in ROLLUP_TABLES:
+        query = f"""SELECT ledger_id, k, t, cat, SUM(cents) AS diff_cents, SUM(n) AS count_diff
+                    FROM (SELECT ledger_id, {period_expr.format(r='records')} AS k, {type_expr} AS t,
+                                 {cat_expr} AS cat, amount_cents AS cents, 1 AS n
+                          FROM records {where}
+                          UNION ALL
+                          SELECT ledger_id, {period}, type_code, category_id, -amount_cents, -count
+                          FROM {table} {where})
+                    GROUP BY 1, 2, 3, 4
+                    HAVING SUM(cents) != 0 OR SUM(n) != 0"""
+        params = [] if ledger_id is None else [ledger_id, ledger_id]
+        for row in conn.execute(query, params):
+            mismatches.append((table,) + tuple(row))
+    return mismatches
+
+
+# === 全文搜索 (FTS5 trigram，外部内容表指向 records，由触发器同步) ===
+# trigram 至少要 3 个字符；更短的词 (中文常见的两字词) 退回 LIKE
+SEARCH_MIN_TERM = 3
+
+
+def _install_search(c):
+    for trigger in ('insert', 'delete', 'update'):
+        c.execute(f"DROP TRIGGER IF EXISTS trg_records_fts_{trigger}")
+    c.execute("DROP TABLE IF EXISTS records_fts")
+    try:
+        c.execute("CREATE VIRTUAL TABLE records_fts USING fts5(note, content='records', content_rowid='id', "
+                  "tokenize='trigram')")
+    except sqlite3.OperationalError:
+        # 编译时没带 FTS5 / trigram 的 SQLite：不建索引，搜索全部走 LIKE
+        return
+    c.execute('''
+              CREATE TRIGGER trg_records_fts_insert
+                  AFTER INSERT ON records
+              BEGIN
+                  INSERT INTO records_fts (rowid, note) VALUES (NEW.id, NEW.note);
+              END
+              ''')
+    c.execute('''
+              CREATE TRIGGER trg_records_fts_delete
+                  AFTER DELETE ON records
+              BEGIN
+                  INSERT INTO records_fts (records_fts, rowid, note) VALUES ('delete', OLD.id, OLD.note);
+              END
+              ''')
+    c.execute('''
+              CREATE TRIGGER trg_records_fts_update
+                  AFTER UPDATE OF note ON records
+              BEGIN
+                  INSERT INTO records_fts (records_fts, rowid, note) VALUES ('delete', OLD.id, OLD.note);
+                  INSERT INTO records_fts (rowid, note) VALUES (NEW.id, NEW.note);
+              END
+              ''')
+    c.execute("INSERT INTO records_fts (records_fts) VALUES ('rebuild')")
+
+
+def _has_fts(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'records_fts'").fetchone() is not None
+
+
+def _like_pattern(text):
+    return '%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+@cached_query
+def search_records(ledger_id, query, start_date=None, end_date=None, limit=50, offset=0,
+                   categories=None, type=None):
+    # 备注按 bm25 排序；只命中分类名的记录排在后面，同分按日期倒序。
+    # 账本和筛选条件在各自的子查询里就用上 (FTS 命中按 rowid 连回 records)，每路只取前 offset + limit 条
+    # 再合并：常见词在目录库里能命中所有账本几十万行，不能全部排序后才截断
+    terms = (query or '').split()
+    if not terms:
+        return pd.DataFrame(columns=['id', 'ledger_id', 'date', 'type', 'category', 'amount', 'note', 'rank'])
+
+    with get_conn(ledger_path(ledger_id)) as conn:
+        where, params = _ledger_filter(ledger_id, start_date, end_date)
+        if categories:
+            wanted = set(categories)
+            ids = [cid for cid, name in get_category_names(ledger_id).items() if name in wanted]
+            where += f" AND category_id IN ({', '.join('?' * len(ids))})" if ids else " AND 0"
+            params.extend(ids)
+        if type is not None:
+            where += " AND type_code = ?"
+            params.append(type_code(type))
+        depth = offset + limit
+
+        if _has_fts(conn) and min(len(t) for t in terms) >= SEARCH_MIN_TERM:
+            note_hits = f"""SELECT records.id, records_fts.rank FROM records_fts
+                            JOIN records ON records.id = records_fts.rowid
+                            WHERE records_fts MATCH ? AND {where}
+                            ORDER BY records_fts.rank, date DESC, records.id DESC LIMIT ?"""
+            hit_params = [" ".join('"' + t.replace('"', '""') + '"' for t in terms)] + params + [depth]
+        else:
+            note_hits = (f"SELECT id, NULL FROM records WHERE {where} AND "
+                         + " AND ".join("note LIKE ? ESCAPE '\\'" for _ in terms)
+                         + " ORDER BY date DESC, id DESC LIMIT ?")
+            hit_params = params + [_like_pattern(t) for t in terms] + [depth]
+
+        # 分类名先查出来：一个都没命中时 (最常见) 不用再按日期扫一遍整个账本
+        matched = [row[0] for row in conn.execute(
+            "SELECT id FROM categories WHERE ledger_id = ? AND name LIKE ? ESCAPE '\\'",
+            (ledger_id, _like_pattern(query.strip())))]
+        category_hits = "SELECT NULL, NULL WHERE 0"
+        if matched:
+            category_hits = f"""SELECT id, NULL FROM records
+                                WHERE {where} AND category_id IN ({', '.join('?' * len(matched))})
+                                ORDER BY date DESC, id DESC LIMIT ?"""
+            hit_params += params + matched + [depth]
+
+        sql = f"""WITH note_hits (id, rank) AS ({note_hits}),
+                       category_hits (id, rank) AS ({category_hits}),
+                       hits AS (SELECT * FROM note_hits UNION ALL SELECT * FROM category_hits)
+                  SELECT {RECORD_COLUMNS}, MIN(hits.rank) AS rank
+                  FROM records JOIN hits USING (id)
+                  GROUP BY id
+                  ORDER BY MIN(hits.rank) IS NULL, MIN(hits.rank), date DESC, id DESC
+                  LIMIT ? OFFSET ?"""
+        df = pd.read_sql_query(sql, conn, params=hit_params + [limit, offset])
+    return df
+
+
+DERIVED_OBJECTS = [
+    # (名称, 定义版本, 安装函数)
+    ('rollups', 3, _install_rollups),
+    ('search', 1, _install_search),
+]
+
+
+# === 明细分页 (keyset：游标为上一页最后一行的 (date, id)) ===
+
+
+@cached_query
+def get_records_page(ledger_id, cursor=None, page_size=50, categories=None, type=None, text=None,
+                     start_date=None, end_date=None):
+    where, params = _ledger_filter(ledger_id, start_date, end_date)
+    if categories:
+        wanted = set(categories)
+        ids = [cid for cid, name in get_category_names(ledger_id).items() if name in wanted]
+        where += f" AND category_id IN ({', '.join('?' * len(ids))})" if ids else " AND 0"
+        params.extend(ids)
+    if type is not None:
+        where += " AND type_code = ?"
+        params.append(type_code(type))
+    if text:
+        pattern = _like_pattern(text)
+        where += (" AND (note LIKE ? ESCAPE '\\' OR category_id IN "
+                  "(SELECT id FROM categories WHERE ledger_id = ? AND name LIKE ? ESCAPE '\\'))")
+        params.extend([pattern, ledger_id, pattern])
+    if cursor is not None:
+        cur_date, cur_id = cursor
+        where += " AND (date < ? OR (date = ? AND id < ?))"
+        params.extend([cur_date, cur_date, cur_id])
+
+    query = f"SELECT {RECORD_COLUMNS} FROM records WHERE {where} ORDER BY date DESC, id DESC LIMIT ?"
+    params.append(page_size + 1)
+    with get_conn(ledger_path(ledger_id)) as conn:
+        df = pd.read_sql_query(query, conn, params=params)
+
+    next_cursor = None
+    if len(df) > page_size:
+        df = df.iloc[:page_size]
+        last = df.iloc[-1]
+        next_cursor = (last['date'], int(last['id']))
+    return df, next_cursor
+
+
 def to_excel(df):
     output = io.BytesIO()
     with pd.ExcelWriter(output, engine='openpyxl') as writer:
@@ -162,27 +1408,131 @@ def to_excel(df):
     return output.getvalue()
 
 
+# === 财务报告导出 (游标逐行流式写出，收支分列和平衡行都在 SQL 里算) ===
+EXPORT_FORMATS = ['xlsx', 'csv'] + (['parquet'] if importlib.util.find_spec('pyarrow') else [])
+EXPORT_MIME = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+EXPORT_BATCH_ROWS = 10000
+
+
+def _report_rows(conn, ledger_id, start_date, end_date, category_label=None):
+    where, params = _ledger_filter(ledger_id, start_date, end_date)
+    names = get_category_names(ledger_id)
+    labels = {cid: name if category_label is None else category_label(name) for cid, name in names.items()}
+    labels[None] = '' if category_label is None else category_label('')
+    cur = conn.execute(f"""SELECT date, category_id,
+                                  CASE WHEN type_code = 1 THEN amount_cents / 100.0 END,
+                                  CASE WHEN type_code = 1 THEN NULL ELSE amount_cents / 100.0 END,
+                                  note
+                           FROM records WHERE {where} ORDER BY date DESC, id DESC""", params)
+    for row in cur:
+        yield (row[0], labels[row[1]]) + row[2:]
+
+
+def balancing_rows(inc_cents, exp_cents):
+    # 用整数分比较和相减，哪边少就在哪边补平，最后的 TOTAL 两边严格相等
+    rows = []
+    if inc_cents > exp_cents:
+        rows.append((None, "c.c", None, from_cents(inc_cents - exp_cents), "Balancing Figure"))
+    elif exp_cents > inc_cents:
+        rows.append((None, "c.c", from_cents(exp_cents - inc_cents), None, "Balancing Figure"))
+    final_total = from_cents(max(inc_cents, exp_cents))
+    rows.append(("TOTAL", "", final_total, final_total, "Balanced"))
+    return rows
+
+
+def iter_report(ledger_id, start_date, end_date, category_label=None):
+    totals = get_totals_cents(ledger_id, start_date, end_date)
+    with get_conn(ledger_path(ledger_id)) as conn:
+        yield from _report_rows(conn, ledger_id, start_date, end_date, category_label)
+    yield from balancing_rows(totals['Income'], totals['Expense'])
+
+
+def _write_xlsx(rows, headers, output):
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Sheet1')
+    ws.append(headers)
+    for row in rows:
+        ws.append(row)
+    wb.save(output)
+
+
+def _write_csv(rows, headers, output):
+    text = io.TextIOWrapper(output, encoding='utf-8-sig', newline='')
+    writer = csv.writer(text)
+    writer.writerow(headers)
+    writer.writerows(rows)
+    text.flush()
+    text.detach()
+
+
+def _write_parquet(rows, headers, output):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = pa.schema([(headers[0], pa.string()), (headers[1], pa.string()), (headers[2], pa.float64()),
+                        (headers[3], pa.float64()), (headers[4], pa.string())])
+    with pq.ParquetWriter(output, schema) as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= EXPORT_BATCH_ROWS:
+                writer.write_table(pa.Table.from_pylist([dict(zip(headers, r)) for r in batch], schema))
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist([dict(zip(headers, r)) for r in batch], schema))
+
+
+def export_report(ledger_id, start_date, end_date, headers, fmt='xlsx', category_label=None, output=None):
+    writer = {'xlsx': _write_xlsx, 'csv': _write_csv, 'parquet': _write_parquet}[fmt]
+    target = output if output is not None else io.BytesIO()
+    writer(iter_report(ledger_id, start_date, end_date, category_label), list(headers), target)
+    return target.getvalue() if output is None else None
+
+
 def delete_ledger(ledger_id):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+    with get_conn() as conn:
+        c = conn.cursor()
 
-    c.execute("SELECT count(*) FROM ledgers")
-    count = c.fetchone()[0]
-    if count <= 1:
-        conn.close()
-        return False, "❌ 无法删除：系统中必须至少保留一个账本！"
+        c.execute("SELECT count(*) FROM ledgers")
+        count = c.fetchone()[0]
+        if count <= 1:
+            return False, "❌ 无法删除：系统中必须至少保留一个账本！"
 
-    try:
-        c.execute("DELETE FROM records WHERE ledger_id=?", (ledger_id,))
-        c.execute("DELETE FROM categories WHERE ledger_id=?", (ledger_id,))
-        c.execute("DELETE FROM ledgers WHERE id=?", (ledger_id,))
+        try:
+            sharded = storage_mode() == 'sharded'
+            if not sharded:
+                # 先清汇总表，之后删 records 时触发器就无行可更新
+                c.execute("DELETE FROM daily_totals WHERE ledger_id=?", (ledger_id,))
+                c.execute("DELETE FROM monthly_totals WHERE ledger_id=?", (ledger_id,))
+                c.execute("DELETE FROM records WHERE ledger_id=?", (ledger_id,))
+                c.execute("DELETE FROM budgets WHERE ledger_id=?", (ledger_id,))
+                c.execute("DELETE FROM recurring_rules WHERE ledger_id=?", (ledger_id,))
+                c.execute("DELETE FROM categories WHERE ledger_id=?", (ledger_id,))
+            c.execute("DELETE FROM ledgers WHERE id=?", (ledger_id,))
 
-        conn.commit()
-        success = True
-        msg = "✅ 账本及所有数据已删除"
-    except Exception as e:
-        success = False
-        msg = f"❌ 删除失败: {str(e)}"
-
-    conn.close()
-    return success, msg
\ No newline at end of file
+            conn.commit()
+            if sharded:
+                # 分库模式：目录里删掉后直接删文件，不碰其他账本
+                _drop_shard(ledger_id)
+            success = True
+            msg = "✅ 账本及所有数据已删除"
+            invalidate(ledger_id)
+            invalidate()
+        except Exception as e:
+            conn.rollback()
+            success = False
+            msg = f"❌ 删除失败: {str(e)}"
+
+    return success, msg
+
+
+# === 计时 ===
+# 公开函数统一套上 perf.timed (耗时、返回行数、执行的 SQL)；连接/缓存管道和逐行调用的小工具除外
+perf.instrument(globals(), skip={'get_pool', 'close_pools', 'get_conn', 'data_version', 'invalidate', 'clear_cache',
+                                 'refresh_if_changed', 'cache_stats', 'cached_query', 'to_cents', 'from_cents',
+                                 'type_code', 'budget_crossed', 'balancing_rows', 'deferred_rollups', 'storage_mode',
+                                 'shard_file', 'ledger_path', 'ledger_paths'})
@@ -0,0 +1,67 @@
+"""Retired implementations kept as the "before" side of benchmark comparisons; the app does not use them."""
+import pandas as pd
+
+import backend
+import lang_pack
+
+
+# 逐行 replace 的旧版本地化 (已被 lang_pack.localize_typed_records 取代)
+def localize_records(df, lang_code):
+    # 0. 清洗数据
+    df['category'] = df['category'].astype(str).str.strip()
+
+    if lang_code == 'EN':
+        # 1. Type 翻译 (使用 Mapping 更稳健)
+        type_map_en = {'收入': 'Income', '支出': 'Expense', 'Income': 'Income', 'Expense': 'Expense'}
+        df['type'] = df['type'].map(type_map_en).fillna(df['type'])
+
+        # 2. Category 翻译
+        df['category'] = df['category'].replace(lang_pack.CAT_TRANS)
+
+    else:
+
+        type_map_cn = {'Income': '收入', 'Expense': '支出', '收入': '收入', '支出': '支出'}
+        df['type'] = df['type'].map(type_map_cn).fillna(df['type'])
+
+        df['category'] = df['category'].replace(lang_pack.CAT_TRANS_REV)
+        df['category'] = df['category'].replace(lang_pack.CAT_CN_EMOJI)
+    return df
+
+
+# 旧版搜索：FTS MATCH 跨所有账本全部命中、排序之后才按账本和筛选条件过滤
+def search_records(ledger_id, query, start_date=None, end_date=None, limit=50, offset=0,
+                   categories=None, type=None):
+    terms = (query or '').split()
+    with backend.get_conn(backend.ledger_path(ledger_id)) as conn:
+        if backend._has_fts(conn) and min(len(t) for t in terms) >= backend.SEARCH_MIN_TERM:
+            note_hits = "SELECT rowid AS id, rank FROM records_fts WHERE records_fts MATCH ?"
+            hit_params = [" ".join('"' + t.replace('"', '""') + '"' for t in terms)]
+        else:
+            note_hits = ("SELECT id, NULL AS rank FROM records WHERE ledger_id = ? AND "
+                         + " AND ".join("note LIKE ? ESCAPE '\\'" for _ in terms))
+            hit_params = [ledger_id] + [backend._like_pattern(t) for t in terms]
+
+        where, params = backend._ledger_filter(ledger_id, start_date, end_date)
+        if categories:
+            wanted = set(categories)
+            ids = [cid for cid, name in backend.get_category_names(ledger_id).items() if name in wanted]
+            where += f" AND category_id IN ({', '.join('?' * len(ids))})" if ids else " AND 0"
+            params.extend(ids)
+        if type is not None:
+            where += " AND type_code = ?"
+            params.append(backend.type_code(type))
+
+        sql = f"""WITH hits (id, rank) AS ({note_hits}
+                                         UNION ALL
+                                         SELECT id, NULL FROM records
+                                         WHERE ledger_id = ? AND category_id IN
+                                             (SELECT id FROM categories WHERE ledger_id = ? AND name LIKE ? ESCAPE '\\'))
+                  SELECT {backend.RECORD_COLUMNS}, MIN(hits.rank) AS rank
+                  FROM records JOIN hits USING (id)
+                  WHERE {where}
+                  GROUP BY id
+                  ORDER BY MIN(hits.rank) IS NULL, MIN(hits.rank), date DESC, id DESC
+                  LIMIT ? OFFSET ?"""
+        return pd.read_sql_query(sql, conn, params=hit_params + [ledger_id, ledger_id,
+                                                                 backend._like_pattern(query.strip())]
+                                 + params + [limit, offset])
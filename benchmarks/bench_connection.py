@@ -0,0 +1,89 @@
+"""Per-rerun backend time: connect-per-call vs. the pooled connection layer.
+
+    python -m benchmarks.bench_connection --records 20000 --reruns 200
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import pandas as pd
+
+import backend
+
+
+def rerun(connect, ledger_id):
+    # app.py 每次 rerun 的查询：账本列表、侧边栏分类、记账分类、全部记录 (两种连接方式跑完全相同的 SQL)
+    with connect() as conn:
+        conn.execute("SELECT id, name FROM ledgers").fetchall()
+    for _ in range(2):
+        with connect() as conn:
+            conn.execute("SELECT name FROM categories WHERE ledger_id = ? AND deleted = 0 ORDER BY id",
+                         (ledger_id,)).fetchall()
+    with connect() as conn:
+        pd.read_sql_query(f"SELECT {backend.RECORD_COLUMNS} FROM records WHERE ledger_id = ? ORDER BY date DESC",
+                          conn, params=(ledger_id,))
+
+
+@contextmanager
+def connect_per_call():
+    conn = sqlite3.connect(backend.DB_FILE)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def legacy_rerun(ledger_id):
+    rerun(connect_per_call, ledger_id)
+
+
+def pooled_rerun(ledger_id):
+    rerun(backend.get_conn, ledger_id)
+
+
+def seed(n_records):
+    rng = random.Random(42)
+    cats = ["餐饮", "交通", "购物", "居住", "工资", "娱乐"]
+    start = date.today() - timedelta(days=730)
+    rows = []
+    for _ in range(n_records):
+        cat = rng.choice(cats)
+        rows.append((str(start + timedelta(days=rng.randrange(730))),
+                     "Income" if cat == "工资" else "Expense", cat, rng.randrange(100, 50000), ""))
+    backend.bulk_insert_records(1, rows)
+
+
+def measure(fn, reruns):
+    fn(1)
+    samples = []
+    for _ in range(reruns):
+        t0 = time.perf_counter()
+        fn(1)
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples), statistics.quantiles(samples, n=20)[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--reruns", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backend.DB_FILE = os.path.join(tmp, "bench.db")
+        backend.init_db()
+        seed(args.records)
+        for name, fn in (("connect-per-call", legacy_rerun), ("pooled", pooled_rerun)):
+            p50, p95 = measure(fn, args.reruns)
+            print(f"{name:<18} p50 {p50:8.2f} ms   p95 {p95:8.2f} ms")
+        backend.close_pools()
+
+
+if __name__ == "__main__":
+    main()
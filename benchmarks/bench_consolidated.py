@@ -0,0 +1,46 @@
+"""Consolidated multi-ledger report: wall time vs. worker count.
+
+    python -m benchmarks.bench_consolidated --ledgers 24 --records 50000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import date
+
+import backend
+import consolidated
+from benchmarks import synth
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ledgers", type=int, default=24)
+    parser.add_argument("--records", type=int, default=50000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backend.DB_FILE = os.path.join(tmp, "bench.db")
+        synth.generate(args.ledgers, args.records)
+        start, end = date(2022, 1, 1), date(2024, 12, 31)
+        print(f"{args.ledgers} ledgers x {args.records:,} records, {os.cpu_count()} CPUs")
+
+        baseline = None
+        for workers in args.workers:
+            consolidated.consolidated_report(start, end, workers=workers)
+            samples = []
+            for _ in range(args.repeats):
+                t0 = time.perf_counter()
+                consolidated.consolidated_report(start, end, workers=workers)
+                samples.append((time.perf_counter() - t0) * 1000)
+            p50 = statistics.median(samples)
+            baseline = baseline or p50
+            print(f"workers {workers:<3} p50 {p50:9.2f} ms   speedup {baseline / p50:5.2f}x")
+        backend.close_pools()
+
+
+if __name__ == "__main__":
+    main()
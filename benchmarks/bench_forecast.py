@@ -0,0 +1,69 @@
+"""Month-end forecast: one batched array pass over all series vs. forecasting each series on its own.
+
+    python -m benchmarks.bench_forecast --series 10 100 1000 --months 36
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import date
+
+import numpy as np
+
+import backend
+import forecast
+from benchmarks import synth
+
+
+def per_series(matrix, elapsed):
+    # 对照：每条序列单独跑一遍同样的模型
+    parts = [forecast.forecast_matrix(matrix[i:i + 1], elapsed) for i in range(len(matrix))]
+    return tuple(np.concatenate(p) for p in zip(*parts))
+
+
+def _p50(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--series", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--months", type=int, default=forecast.HISTORY_MONTHS)
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for n in args.series:
+        # 对数正态的月度金额，带 12 个月的季节性
+        season = 1 + 0.3 * np.sin(np.arange(args.months + 1) * 2 * np.pi / 12)
+        matrix = np.round(rng.lognormal(10, 0.5, (n, 1)) * season * rng.lognormal(0, 0.2, (n, args.months + 1)))
+        batched, looped = forecast.forecast_matrix(matrix, 0.5), per_series(matrix, 0.5)
+        assert np.allclose(batched[0], looped[0]) and np.allclose(batched[1], looped[1])
+        assert np.array_equal(batched[2], looped[2])
+        t_batch = _p50(lambda: forecast.forecast_matrix(matrix, 0.5), args.repeats)
+        t_loop = _p50(lambda: per_series(matrix, 0.5), args.repeats)
+        print(f"series {n:<6} batched {t_batch:8.2f} ms   per-series {t_loop:9.2f} ms   {t_loop / t_batch:6.1f}x")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backend.DB_FILE = os.path.join(tmp, "bench.db")
+        ledger_id = synth.generate(1, args.records)[0]
+        today = date(2024, 12, 15)
+
+        def cold():
+            backend.clear_cache()
+            forecast.month_end_forecast(ledger_id, today)
+
+        print(f"month_end_forecast {args.records:,} records   cold {_p50(cold, args.repeats):7.2f} ms   "
+              f"cached {_p50(lambda: forecast.month_end_forecast(ledger_id, today), args.repeats):6.3f} ms")
+        backend.close_pools()
+
+
+if __name__ == "__main__":
+    main()
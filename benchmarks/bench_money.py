@@ -0,0 +1,59 @@
+"""Float (REAL) vs. integer-cents money storage: aggregate speed (exactness is covered by tests/test_money.py).
+
+    python -m benchmarks.bench_money --records 500000 --repeats 5
+"""
+import argparse
+import sqlite3
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import synth
+
+
+def build(conn, rows):
+    conn.execute("CREATE TABLE money_real (category TEXT, amount REAL)")
+    conn.execute("CREATE TABLE money_cents (category TEXT, amount_cents INTEGER)")
+    conn.executemany("INSERT INTO money_real VALUES (?, ?)", [(r[2], r[3] / 100) for r in rows])
+    conn.executemany("INSERT INTO money_cents VALUES (?, ?)", [(r[2], r[3]) for r in rows])
+    conn.commit()
+
+
+def timed(fn, repeats):
+    fn()
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=500000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = synth.generate_rows(args.records, seed=7)
+    conn = sqlite3.connect(":memory:")
+    build(conn, rows)
+
+    amounts = pd.Series(np.array([r[3] for r in rows], dtype=np.int64))
+    floats = amounts / 100
+    cases = (
+        ("sql SUM REAL", lambda: conn.execute("SELECT category, SUM(amount) FROM money_real GROUP BY 1").fetchall()),
+        ("sql SUM cents", lambda: conn.execute("SELECT category, SUM(amount_cents) FROM money_cents "
+                                               "GROUP BY 1").fetchall()),
+        ("pandas sum float64", floats.sum),
+        ("pandas sum int64", amounts.sum),
+    )
+    for name, fn in cases:
+        print(f"{name:<20} {timed(fn, args.repeats):10.2f} ms")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Note search over a large catalog: unscoped FTS match (baseline) vs. per-ledger ranked subqueries.
+
+    python -m benchmarks.bench_search --ledgers 5 --records 200000
+"""
+import argparse
+import inspect
+import os
+import statistics
+import tempfile
+import time
+
+import backend
+from benchmarks import baselines, synth
+
+# (名称, 查询, 额外参数)；refund / taxi 在合成数据里约占 1/12 的行，奶茶只有两个字走 LIKE
+CASES = [
+    ("fts.common", "refund", {}),
+    ("fts.page3", "taxi", {'offset': 100}),
+    ("fts.filtered", "refund", {'type': 'Expense', 'start_date': '2023-01-01'}),
+    ("like.short", "奶茶", {}),
+    ("category", "餐饮", {}),
+]
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ledgers", type=int, default=5)
+    parser.add_argument("--records", type=int, default=200000, help="records per ledger")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backend.DB_FILE = os.path.join(tmp, "bench.db")
+        backend.STORAGE_MODE = "single"
+        t0 = time.perf_counter()
+        ledger_id = synth.generate(args.ledgers, args.records)[-1]
+        print(f"{args.ledgers * args.records:,} records in {args.ledgers} ledgers "
+              f"({time.perf_counter() - t0:.0f}s to generate), searching ledger {ledger_id}")
+
+        # 绕过结果缓存和计时包装：只比 SQL 本身
+        search = inspect.unwrap(backend.search_records)
+        for name, query, kwargs in CASES:
+            before, old = timed(lambda: baselines.search_records(ledger_id, query, **kwargs), args.repeat)
+            after, new = timed(lambda: search(ledger_id, query, **kwargs), args.repeat)
+            same = old.equals(new)
+            print(f"{name:<14} unscoped {before:8.1f} ms   scoped {after:8.1f} ms   "
+                  f"x{before / after:5.1f}   {len(new)} rows   {'same' if same else 'DIFFERENT'}")
+        backend.close_pools()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Single-file vs. per-ledger storage: concurrent writers on different ledgers and delete_ledger.
+
+    python -m benchmarks.bench_sharding --ledgers 4 --records 50000 --writes 300
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+import backend
+import writer
+from benchmarks import synth
+
+
+def concurrent_writes(ledger_ids, n_writes):
+    # 每个账本一个线程，各自直接写 (不经过写队列)，看锁竞争
+    latencies = []
+    lock = threading.Lock()
+
+    def session(ledger_id):
+        for i in range(n_writes):
+            t0 = time.perf_counter()
+            backend.save_record(ledger_id, "2024-01-01", "Expense", "餐饮", 12.5, f"w{i}")
+            with lock:
+                latencies.append((time.perf_counter() - t0) * 1000)
+
+    threads = [threading.Thread(target=session, args=(lid,)) for lid in ledger_ids]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    return len(latencies) / elapsed, statistics.median(latencies), statistics.quantiles(latencies, n=20)[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ledgers", type=int, default=4)
+    parser.add_argument("--records", type=int, default=50000)
+    parser.add_argument("--writes", type=int, default=300)
+    args = parser.parse_args()
+
+    for mode in ("single", "sharded"):
+        with tempfile.TemporaryDirectory() as tmp:
+            backend.DB_FILE = os.path.join(tmp, "bench.db")
+            backend.STORAGE_MODE = mode
+            synth.generate(args.ledgers, args.records)
+            ledger_ids = [lid for lid, _ in backend.get_ledgers()][-args.ledgers:]
+
+            rate, p50, p95 = concurrent_writes(ledger_ids, args.writes)
+            t0 = time.perf_counter()
+            backend.delete_ledger(ledger_ids[0])
+            delete_ms = (time.perf_counter() - t0) * 1000
+            print(f"{mode:<8} {rate:8.0f} writes/s   p50 {p50:6.2f} ms   p95 {p95:6.2f} ms   "
+                  f"delete_ledger {delete_ms:8.1f} ms   check_rollups {len(backend.check_rollups())}")
+            writer.close_writers()
+            backend.close_pools()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Concurrent transaction entry: direct save_record per thread vs. the background write queue.
+
+    python -m benchmarks.bench_writer --threads 8 --writes 200
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+import backend
+import writer
+
+
+def direct_save(*args):
+    backend.save_record(*args)
+
+
+def queued_save(*args):
+    writer.save_record(*args).result(timeout=writer.WRITE_TIMEOUT)
+
+
+def run(save, n_threads, n_writes):
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def session(k):
+        for i in range(n_writes):
+            t0 = time.perf_counter()
+            try:
+                save(1, "2024-01-01", "Expense", "餐饮", 12.5, f"{k}-{i}")
+            except sqlite3.OperationalError as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            with lock:
+                latencies.append((time.perf_counter() - t0) * 1000)
+
+    threads = [threading.Thread(target=session, args=(k,)) for k in range(n_threads)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    return len(latencies) / elapsed, statistics.median(latencies), statistics.quantiles(latencies, n=20)[-1], errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backend.DB_FILE = os.path.join(tmp, "bench.db")
+        backend.init_db()
+        for name, fn in (("direct", direct_save), ("write-queue", queued_save)):
+            rate, p50, p95, errors = run(fn, args.threads, args.writes)
+            print(f"{name:<12} {rate:9.0f} writes/s   p50 {p50:7.2f} ms   p95 {p95:7.2f} ms   "
+                  f"locked {len(errors)}")
+        stats = writer.stats()
+        print(f"write-queue batches {stats['batches']}, max batch {stats['max_batch']}, "
+              f"mean commit {stats['commit_ms_mean']:.2f} ms")
+        writer.close_writers()
+        backend.close_pools()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Headless benchmarks for backend queries and the app's data-prep paths.
+
+    python -m benchmarks.run --sizes 1000 100000 1000000 --out bench_results.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+import backend
+import calendar_view
+import charts
+import lang_pack
+from benchmarks import baselines, synth
+
+DEFAULT_SIZES = [1000, 100000, 1000000]
+
+
+def timeit(fn, repeats):
+    samples = []
+    result = None
+    for _ in range(repeats):
+        backend.clear_cache()
+        t0 = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return samples, result
+
+
+def bench_cases(ledger_id):
+    year = 2023
+    start, end = date(year, 1, 1), date(year, 12, 31)
+    headers = ["Date", "Category", "Debit", "Credit", "Note"]
+    records = backend.get_all_records(ledger_id)
+    localized = baselines.localize_records(records.copy(), 'EN')
+    typed = backend.get_records_typed(ledger_id)
+    balance = backend.get_balance_series(ledger_id)
+    backend.set_budget(ledger_id, "餐饮", 1000)
+
+    def budget_resum():
+        # 对照：不用汇总表，直接对当月明细求和
+        with backend.get_conn(backend.ledger_path(ledger_id)) as conn:
+            return conn.execute("""SELECT SUM(r.amount_cents) FROM records r JOIN categories c ON c.id = r.category_id
+                                   WHERE r.ledger_id = ? AND c.name = ? AND r.type_code = ?
+                                     AND r.date BETWEEN ? AND ?""",
+                                (ledger_id, "餐饮", backend.TYPE_EXPENSE, f"{year}-06-01", f"{year}-06-31")).fetchone()
+
+    def balance_pandas(df):
+        # 对照：明细在 pandas 里按日求和再累加
+        signed = df['amount'].where(df['type'] == "Income", -df['amount'])
+        return signed.groupby(df['date']).sum().cumsum()
+
+    return [
+        ("get_all_records", lambda: backend.get_all_records(ledger_id)),
+        ("get_records_by_date_range.year", lambda: backend.get_records_by_date_range(ledger_id, start, end)),
+        ("get_summary", lambda: backend.get_summary(localized)),
+        ("get_totals_by_type", lambda: backend.get_totals_by_type(ledger_id)),
+        ("get_records_page", lambda: backend.get_records_page(ledger_id)),
+        ("get_records_page.like", lambda: backend.get_records_page(ledger_id, text="refund")),
+        ("search_records.fts", lambda: backend.search_records(ledger_id, "refund")),
+        ("search_records.short", lambda: backend.search_records(ledger_id, "奶茶")),
+        ("budget_status", lambda: backend.budget_status(ledger_id, "餐饮", f"{year}-06")),
+        ("budget_status.resum", budget_resum),
+        ("localize_records.EN", lambda: baselines.localize_records(records.copy(), 'EN')),
+        ("localize_records.CN", lambda: baselines.localize_records(records.copy(), 'CN')),
+        ("get_records_typed", lambda: backend.get_records_typed(ledger_id)),
+        ("localize_typed_records.EN", lambda: lang_pack.localize_typed_records(typed, 'EN')),
+        ("localize_typed_records.CN", lambda: lang_pack.localize_typed_records(typed, 'CN')),
+        ("render_calendar.month.pandas",
+         lambda: calendar_view.render_month_html(year, 6, calendar_view.daily_net_from_records(localized))),
+        ("render_calendar.month.sql",
+         lambda: calendar_view.render_month_html(year, 6, backend.get_daily_net(ledger_id, *calendar_view.month_range(year, 6)))),
+        ("render_calendar.year.sql",
+         lambda: calendar_view.render_year_heatmap_html(year, backend.get_daily_net(ledger_id, start, end))),
+        ("get_balance_series", lambda: backend.get_balance_series(ledger_id)),
+        ("get_balance_series.pandas", lambda: balance_pandas(records)),
+        ("get_balance_series.range", lambda: backend.get_balance_series(ledger_id, start, end)),
+        ("charts.balance_line.full", lambda: charts.balance_line(balance, max_points=len(balance) + 1)),
+        ("charts.balance_line.lttb", lambda: charts.balance_line(balance)),
+        ("charts.cached_figure.hit",
+         lambda: charts.cached_figure('balance', ledger_id, 0, 'EN', (), lambda: charts.balance_line(balance))),
+        ("export_report.year.xlsx", lambda: backend.export_report(ledger_id, start, end, headers, fmt='xlsx')),
+        ("export_report.year.csv", lambda: backend.export_report(ledger_id, start, end, headers, fmt='csv')),
+    ]
+
+
+def memory_cases(ledger_id):
+    # 单个会话持有的明细 DataFrame 大小 (deep，含字符串)
+    legacy = baselines.localize_records(backend.get_all_records(ledger_id), 'EN')
+    typed = lang_pack.localize_typed_records(backend.get_records_typed(ledger_id), 'EN')
+    return [("memory.records.legacy", int(legacy.memory_usage(deep=True).sum())),
+            ("memory.records.typed", int(typed.memory_usage(deep=True).sum()))]
+
+
+def _git_rev():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, repeats, workdir, only=None):
+    results = []
+    for size in sizes:
+        backend.close_pools()
+        backend.clear_cache()
+        backend.DB_FILE = os.path.join(workdir, f"bench_{size}.db")
+        if os.path.exists(backend.DB_FILE):
+            os.remove(backend.DB_FILE)
+        t0 = time.perf_counter()
+        ledger_id = synth.generate(1, size, seed=0)[0]
+        gen_ms = (time.perf_counter() - t0) * 1000
+        print(f"[{size:,} rows] generated in {gen_ms / 1000:.1f}s")
+        results.append({"name": "synth.generate", "rows": size, "repeats": 1, "median_ms": gen_ms,
+                        "min_ms": gen_ms, "max_ms": gen_ms})
+
+        for name, fn in bench_cases(ledger_id):
+            if only and not any(name.startswith(o) for o in only):
+                continue
+            samples, _ = timeit(fn, repeats)
+            row = {"name": name, "rows": size, "repeats": repeats, "median_ms": statistics.median(samples),
+                   "min_ms": min(samples), "max_ms": max(samples)}
+            results.append(row)
+            print(f"  {name:<34} {row['median_ms']:10.2f} ms")
+
+        for name, size_bytes in memory_cases(ledger_id):
+            if only and not any(name.startswith(o) for o in only):
+                continue
+            results.append({"name": name, "rows": size, "bytes": size_bytes})
+            print(f"  {name:<34} {size_bytes / 1e6:10.2f} MB")
+    backend.close_pools()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--only", nargs="*", help="only run benchmarks whose name starts with one of these")
+    parser.add_argument("--workdir", help="where to keep the generated databases (default: temp dir)")
+    parser.add_argument("--out", default="bench_results.json")
+    args = parser.parse_args()
+
+    meta = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_rev": _git_rev(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "sqlite": backend.sqlite3.sqlite_version,
+    }
+    if args.workdir:
+        os.makedirs(args.workdir, exist_ok=True)
+        results = run(args.sizes, args.repeats, args.workdir, args.only)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            results = run(args.sizes, args.repeats, tmp, args.only)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2)
+    print(f"→ {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Deterministic synthetic ledger generator.
+
+    python -m benchmarks.synth --ledgers 3 --records 100000 --db account.db
+"""
+import argparse
+import time
+from datetime import date
+
+import numpy as np
+
+import backend
+
+# (分类, 类型, 权重, 对数正态金额的 mu / sigma)
+CATEGORY_PROFILE = [
+    ("餐饮", "Expense", 0.34, 2.8, 0.6),
+    ("交通", "Expense", 0.18, 2.3, 0.7),
+    ("购物", "Expense", 0.14, 4.0, 0.9),
+    ("娱乐", "Expense", 0.10, 3.5, 0.8),
+    ("居住", "Expense", 0.06, 6.8, 0.3),
+    ("医疗", "Expense", 0.04, 4.2, 1.0),
+    ("其他", "Expense", 0.06, 3.0, 1.1),
+    ("工资", "Income", 0.05, 8.3, 0.2),
+    ("其他", "Income", 0.03, 4.5, 1.0),
+]
+NOTES = np.array(["", "", "", "lunch", "grab", "午饭", "超市", "电影", "refund", "奶茶", "taxi", "rent"])
+# 周末消费更多
+WEEKDAY_WEIGHT = np.array([1.0, 1.0, 1.0, 1.05, 1.2, 1.5, 1.4])
+BATCH_ROWS = 100000
+
+
+def generate_rows(n_records, seed=0, start=date(2022, 1, 1), days=1096):
+    rng = np.random.default_rng(seed)
+    weights = np.array([p[2] for p in CATEGORY_PROFILE])
+    idx = rng.choice(len(CATEGORY_PROFILE), size=n_records, p=weights / weights.sum())
+
+    day_w = WEEKDAY_WEIGHT[(np.arange(days) + start.weekday()) % 7]
+    offsets = rng.choice(days, size=n_records, p=day_w / day_w.sum())
+    dates = (np.datetime64(start) + offsets.astype('timedelta64[D]')).astype(str)
+
+    mu = np.array([p[3] for p in CATEGORY_PROFILE])[idx]
+    sigma = np.array([p[4] for p in CATEGORY_PROFILE])[idx]
+    cents = np.round(rng.lognormal(mu, sigma) * 100).astype(np.int64)
+
+    cats = np.array([p[0] for p in CATEGORY_PROFILE])[idx]
+    types = np.array([p[1] for p in CATEGORY_PROFILE])[idx]
+    notes = NOTES[rng.integers(0, len(NOTES), size=n_records)]
+    return list(zip(dates.tolist(), types.tolist(), cats.tolist(), cents.tolist(), notes.tolist()))
+
+
+def generate(n_ledgers, n_records, seed=0, prefix="synthetic"):
+    backend.init_db()
+    ledger_ids = []
+    for i in range(n_ledgers):
+        name = f"{prefix}-{seed}-{i + 1}"
+        backend.add_ledger(name)
+        ledger_id = dict((n, lid) for lid, n in backend.get_ledgers())[name]
+        for done in range(0, n_records, BATCH_ROWS):
+            rows = generate_rows(min(BATCH_ROWS, n_records - done), seed=(seed, i, done))
+            backend.bulk_insert_records(ledger_id, rows)
+        ledger_ids.append(ledger_id)
+    return ledger_ids
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default=backend.DB_FILE)
+    parser.add_argument("--ledgers", type=int, default=1)
+    parser.add_argument("--records", type=int, default=10000, help="records per ledger")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    backend.DB_FILE = args.db
+    t0 = time.perf_counter()
+    ids = generate(args.ledgers, args.records, args.seed)
+    print(f"ledgers {ids}: {args.ledgers * args.records:,} records in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import calendar
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+WEEK_DAYS = ["Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat"]
+INCOME_TYPES = ('收入', 'Income')
+HEATMAP_LEVELS = 4
+MEMO_MAX_ENTRIES = 128
+
+_cal = calendar.Calendar(firstweekday=6)
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+# === 数据准备 ===
+def daily_net_from_records(df):
+    # pandas 回退路径：按类型列向量化取符号，不再逐行 apply
+    if df.empty:
+        return pd.DataFrame({'date': [], 'net': []})
+    sign = np.where(df['type'].isin(INCOME_TYPES), 1.0, -1.0)
+    net = pd.Series(df['amount'].to_numpy(dtype=float) * sign, index=df.index)
+    return net.groupby(df['date']).sum().rename('net').reset_index()
+
+
+def _day_values(daily, start, length):
+    # daily: 含 date / net 两列；返回从 start 开始 length 天的数组，无记录的日期为 0
+    values = np.zeros(length)
+    if daily is None or len(daily) == 0:
+        return values
+    offsets = (pd.to_datetime(daily['date']).to_numpy() - np.datetime64(start)) // np.timedelta64(1, 'D')
+    offsets = np.asarray(offsets, dtype=np.int64)
+    keep = (offsets >= 0) & (offsets < length)
+    np.add.at(values, offsets[keep], daily['net'].to_numpy(dtype=float)[keep])
+    return values
+
+
+def month_range(year, month):
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def year_range(year):
+    return date(year, 1, 1), date(year, 12, 31)
+
+
+# === 渲染 ===
+def _card_class(val, is_today):
+    cls = "cal-card"
+    if val > 0:
+        cls += " pos"
+    elif val < 0:
+        cls += " neg"
+    if is_today:
+        cls += " today"
+    return cls
+
+
+def render_month_html(year, month, daily, mode='Month', selected_date=None, today=None):
+    today = today or date.today()
+    first, last = month_range(year, month)
+    net = _day_values(daily, first, last.day)
+
+    month_days = _cal.monthdayscalendar(year, month)
+    if mode == 'Week' and selected_date is not None:
+        sel_day = pd.to_datetime(selected_date).day
+        target_week = next((week for week in month_days if sel_day in week), None)
+        if target_week:
+            month_days = [target_week]
+
+    parts = ['<div class="calendar-container"><table class="cal-table"><thead><tr>']
+    parts.extend(f'<th class="cal-th">{w}</th>' for w in WEEK_DAYS)
+    parts.append('</tr></thead><tbody class="week-view" >' if mode == 'Week' else '</tr></thead><tbody>')
+    for week in month_days:
+        parts.append('<tr>')
+        for day in week:
+            if day == 0:
+                parts.append('<td class="cal-td"></td>')
+                continue
+            val = net[day - 1]
+            is_today = (year, month, day) == (today.year, today.month, today.day)
+            val_display = ""
+            if val != 0:
+                prefix = "+" if val > 0 else ""
+                val_display = f'<span class="cal-val">{prefix}{val:,.0f}</span>'
+            parts.append(f'<td class="cal-td"><div class="{_card_class(val, is_today)}">'
+                         f'<span class="cal-day-num">{day}</span>{val_display}</div></td>')
+        parts.append('</tr>')
+    parts.append('</tbody></table></div>')
+    return "".join(parts)
+
+
+def render_year_heatmap_html(year, daily, today=None):
+    today = today or date.today()
+    first, last = year_range(year)
+    n_days = (last - first).days + 1
+    net = _day_values(daily, first, n_days)
+
+    # 按 |净额| 的分位数分成 4 档颜色深浅，全部向量化计算
+    magnitude = np.abs(net)
+    nonzero = magnitude[magnitude > 0]
+    levels = np.zeros(n_days, dtype=int)
+    if nonzero.size:
+        thresholds = np.quantile(nonzero, np.linspace(0, 1, HEATMAP_LEVELS + 1)[1:-1])
+        levels = np.where(magnitude > 0, 1 + np.searchsorted(thresholds, magnitude, side='left'), 0)
+    signs = np.where(net > 0, 'pos', np.where(net < 0, 'neg', 'zero'))
+
+    lead = (first.weekday() + 1) % 7  # 周日为第一行
+    parts = ['<div class="heatmap-container"><div class="heatmap">']
+    parts.extend('<div class="hm-cell hm-blank"></div>' for _ in range(lead))
+    for i in range(n_days):
+        d = first + timedelta(days=i)
+        cls = f"hm-cell hm-{signs[i]}-{levels[i]}" + (" today" if d == today else "")
+        title = f"{d}: {net[i]:+,.2f}" if net[i] else str(d)
+        parts.append(f'<div class="{cls}" title="{title}"></div>')
+    parts.append('</div></div>')
+    return "".join(parts)
+
+
+# === 按 (账本, 视图, 数据版本) 缓存渲染结果 ===
+def _memoize(key, build):
+    with _memo_lock:
+        html = _memo.get(key)
+        if html is not None:
+            _memo.move_to_end(key)
+            return html
+    html = build()
+    with _memo_lock:
+        _memo[key] = html
+        while len(_memo) > MEMO_MAX_ENTRIES:
+            _memo.popitem(last=False)
+    return html
+
+
+def month_html(ledger_id, version, year, month, load_daily, mode='Month', selected_date=None):
+    # load_daily(start, end) 只在未命中缓存时才会被调用
+    today = date.today()
+    week_key = pd.to_datetime(selected_date).day if mode == 'Week' and selected_date is not None else None
+    if week_key is not None:
+        week_key = next((i for i, w in enumerate(_cal.monthdayscalendar(year, month)) if week_key in w), None)
+    key = ('month', ledger_id, version, year, month, mode, week_key, today)
+    return _memoize(key, lambda: render_month_html(year, month, load_daily(*month_range(year, month)),
+                                                   mode=mode, selected_date=selected_date, today=today))
+
+
+def year_heatmap_html(ledger_id, version, year, load_daily):
+    today = date.today()
+    key = ('year', ledger_id, version, year, today)
+    return _memoize(key, lambda: render_year_heatmap_html(year, load_daily(*year_range(year)), today=today))
@@ -0,0 +1,90 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+# 构建好的 Figure 按 (图表, 账本, 数据版本, 语言, 视图参数) 缓存；数据没变时 rerun 不再分组、不再走 px
+FIGURE_CACHE_MAX = 128
+# 余额走势超过这么多点时用 LTTB 降采样，保留峰谷形状
+TREND_MAX_POINTS = 500
+TRANSPARENT_LAYOUT = dict(
+    paper_bgcolor="rgba(0,0,0,0)",  # 画布背景透明
+    plot_bgcolor="rgba(0,0,0,0)",  # 图表区域背景透明
+    font=dict(color="gray"),  # 字体颜色微调（可选）
+    margin=dict(t=10, l=10, r=10, b=10)  # 减少留白
+)
+
+_figures = OrderedDict()
+_figures_lock = threading.Lock()
+
+
+def cached_figure(kind, ledger_id, version, lang_code, params, build):
+    # build() 只在未命中时调用；返回的 Figure 在会话间共享，调用方不要再修改它
+    key = (kind, ledger_id, version, lang_code, params)
+    with _figures_lock:
+        fig = _figures.get(key)
+        if fig is not None:
+            _figures.move_to_end(key)
+            return fig
+    fig = build()
+    with _figures_lock:
+        _figures[key] = fig
+        while len(_figures) > FIGURE_CACHE_MAX:
+            _figures.popitem(last=False)
+    return fig
+
+
+def clear_figures():
+    with _figures_lock:
+        _figures.clear()
+
+
+def lttb_indices(x, y, threshold):
+    # Largest-Triangle-Three-Buckets：首尾保留，中间每个桶取与前一选中点、下一桶均值围成面积最大的点
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    every = (n - 2) / (threshold - 2)
+    picked = np.empty(threshold, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        picked[i + 1] = a
+    return picked
+
+
+def downsample(df, x, y, max_points=TREND_MAX_POINTS):
+    if len(df) <= max_points:
+        return df
+    df = df.sort_values(x)
+    xs = pd.to_datetime(df[x]).to_numpy(dtype='datetime64[D]').astype(np.int64)
+    return df.iloc[lttb_indices(xs, df[y].to_numpy(dtype=float), max_points)]
+
+
+def category_pie(df):
+    return px.pie(df, values='amount', names='category', hole=0.5)
+
+
+def balance_line(df, max_points=TREND_MAX_POINTS):
+    # 按余额降采样，最高点、最低点都会留下来
+    fig = px.line(downsample(df, 'date', 'balance', max_points), x='date', y='balance')
+    fig.update_traces(fill='tozeroy')
+    fig.add_hline(y=0, line_width=1, line_dash='dot', line_color='gray')
+    return fig
+
+
+def monthly_bar(df, color_map):
+    fig = px.bar(df, x='month', y='amount', color='type', barmode='group', color_discrete_map=color_map)
+    fig.update_layout(**TRANSPARENT_LAYOUT)
+    return fig
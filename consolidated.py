@@ -0,0 +1,123 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+import backend
+
+# 多账本合并报表：每个账本在各自的只读连接上读日汇总表，线程池并行，最后在内存里合并
+DEFAULT_WORKERS = 4
+# 分库模式下按批 ATTACH 账本库，一批一条查询；SQLite 默认最多同时 ATTACH 10 个库
+ATTACH_BATCH = 10
+AGG_COLUMNS = ['ledger_id', 'category', 'type', 'amount_cents', 'count']
+
+
+def ledger_aggregate(ledger_id, start_date, end_date, path=None):
+    with backend.get_conn(backend.ledger_path(ledger_id, path), readonly=True) as conn:
+        rows = conn.execute("""SELECT category_id, type_code, SUM(amount_cents), SUM(count)
+                               FROM daily_totals WHERE ledger_id = ? AND date >= ? AND date <= ?
+                               GROUP BY category_id, type_code""",
+                            (ledger_id, str(start_date), str(end_date))).fetchall()
+        names = dict(conn.execute("SELECT id, name FROM categories WHERE ledger_id = ?", (ledger_id,)).fetchall())
+    return pd.DataFrame([(ledger_id, names.get(cid, ''), backend.TYPE_NAMES[code], cents, count)
+                         for cid, code, cents, count in rows], columns=AGG_COLUMNS)
+
+
+def attached_aggregate(ledger_ids, start_date, end_date, path=None):
+    # 把这一批账本库以只读方式挂到目录库的连接上，UNION ALL 一次查完
+    files = {lid: Path(backend.ledger_path(lid, path)).resolve().as_uri() + "?mode=ro" for lid in ledger_ids}
+    query = " UNION ALL ".join(
+        f"""SELECT {lid}, COALESCE(c.name, ''), d.type_code, SUM(d.amount_cents), SUM(d.count)
+            FROM l{lid}.daily_totals d LEFT JOIN l{lid}.categories c ON c.id = d.category_id
+            WHERE d.ledger_id = {lid} AND d.date >= :start AND d.date <= :end
+            GROUP BY d.category_id, d.type_code""" for lid in files)
+    with backend.get_conn(path, readonly=True) as conn:
+        attached = []
+        try:
+            for lid, uri in files.items():
+                conn.execute(f"ATTACH DATABASE ? AS l{lid}", (uri,))
+                attached.append(lid)
+            rows = conn.execute(query, {'start': str(start_date), 'end': str(end_date)}).fetchall()
+        finally:
+            for lid in attached:
+                conn.execute(f"DETACH DATABASE l{lid}")
+    return pd.DataFrame([(lid, name, backend.TYPE_NAMES[code], cents, count)
+                         for lid, name, code, cents, count in rows], columns=AGG_COLUMNS)
+
+
+def consolidated_report(start_date, end_date, ledger_ids=None, workers=DEFAULT_WORKERS, path=None):
+    with backend.get_conn(path, readonly=True) as conn:
+        ledgers = dict(conn.execute("SELECT id, name FROM ledgers").fetchall())
+    if ledger_ids is not None:
+        wanted = set(ledger_ids)
+        ledgers = {lid: name for lid, name in ledgers.items() if lid in wanted}
+
+    ids = list(ledgers)
+    if backend.storage_mode(path) == 'sharded':
+        units = [ids[i:i + ATTACH_BATCH] for i in range(0, len(ids), ATTACH_BATCH)]
+        job = lambda batch: attached_aggregate(batch, start_date, end_date, path)
+    else:
+        units = ids
+        job = lambda lid: ledger_aggregate(lid, start_date, end_date, path)
+    if workers <= 1:
+        parts = [job(unit) for unit in units]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(job, units))
+    detail = pd.concat([pd.DataFrame(columns=AGG_COLUMNS)] + [p for p in parts if not p.empty], ignore_index=True)
+    detail = detail.astype({'amount_cents': 'int64', 'count': 'int64'})
+
+    # 每个账本一行 (没有数据的账本也列出来)
+    signed = detail.assign(income=detail['amount_cents'].where(detail['type'] == 'Income', 0),
+                           expense=detail['amount_cents'].where(detail['type'] == 'Expense', 0))
+    per_ledger = (signed.groupby('ledger_id')[['income', 'expense', 'count']].sum()
+                  .reindex(list(ledgers), fill_value=0).reset_index())
+    per_ledger.insert(1, 'ledger', per_ledger['ledger_id'].map(ledgers))
+    per_ledger['balance'] = per_ledger['income'] - per_ledger['expense']
+
+    by_category = (detail.groupby(['category', 'type'], as_index=False)['amount_cents'].sum()
+                   .sort_values('amount_cents', ascending=False, ignore_index=True))
+    totals = {'Income': int(per_ledger['income'].sum()), 'Expense': int(per_ledger['expense'].sum()),
+              'count': int(per_ledger['count'].sum())}
+    return {'start': start_date, 'end': end_date, 'ledgers': per_ledger, 'categories': by_category,
+            'detail': detail.assign(ledger=detail['ledger_id'].map(ledgers)), 'totals': totals}
+
+
+def iter_consolidated(report, category_label=None):
+    # 与单账本报表相同的五列：日期 / 分类 / 入账 / 出账 / 备注；日期列为期间，备注列为账本名
+    period = f"{report['start']} ~ {report['end']}"
+    detail = report['detail'].sort_values(['ledger', 'type', 'amount_cents'], ascending=[True, False, False])
+    labels = {}
+    for ledger, cat, type, cents in detail[['ledger', 'category', 'type', 'amount_cents']].itertuples(index=False):
+        if cat not in labels:
+            labels[cat] = cat if category_label is None else category_label(cat)
+        amount = backend.from_cents(cents)
+        if type == 'Income':
+            yield period, labels[cat], amount, None, ledger
+        else:
+            yield period, labels[cat], None, amount, ledger
+    yield from backend.balancing_rows(report['totals']['Income'], report['totals']['Expense'])
+
+
+def export_consolidated_xlsx(report, headers, ledger_headers, category_label=None, output=None):
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Sheet1')
+    ws.append(list(headers))
+    for row in iter_consolidated(report, category_label):
+        ws.append(row)
+
+    # 第二页：每个账本的收入 / 支出 / 结余 / 笔数
+    ws = wb.create_sheet('Ledgers')
+    ws.append(list(ledger_headers))
+    for r in report['ledgers'].itertuples(index=False):
+        ws.append([r.ledger, backend.from_cents(r.income), backend.from_cents(r.expense),
+                   backend.from_cents(r.balance), int(r.count)])
+    totals = report['totals']
+    ws.append(["TOTAL", backend.from_cents(totals['Income']), backend.from_cents(totals['Expense']),
+               backend.from_cents(totals['Income'] - totals['Expense']), totals['count']])
+
+    target = output if output is not None else io.BytesIO()
+    wb.save(target)
+    return target.getvalue() if output is None else None
@@ -0,0 +1,99 @@
+import calendar
+
+import numpy as np
+import pandas as pd
+
+import backend
+
+# 月末预测：最近 HISTORY_MONTHS 个月的月汇总按 (类型, 分类) 排成一个 序列 × 月份 的矩阵，
+# 季节朴素和简单指数平滑在整个矩阵上一起算，每条序列取回测误差更小的那个模型
+HISTORY_MONTHS = 36
+SEASON = 12
+SES_ALPHAS = np.linspace(0.1, 0.9, 9)
+
+
+def _months(today, n):
+    # today 所在月以及之前 n 个月，'YYYY-MM'，从旧到新
+    k = today.year * 12 + today.month - 1
+    return [f"{m // 12:04d}-{m % 12 + 1:02d}" for m in range(k - n, k + 1)]
+
+
+def monthly_matrix(ledger_id, today, history=HISTORY_MONTHS):
+    # 返回 (keys, matrix)：keys 每行一个 (type_code, category_id)，matrix 单位为分，最后一列是本月至今；
+    # 账本第一笔数据之前的空月份去掉
+    months = _months(today, history)
+    rows = backend.get_monthly_by_category(ledger_id, months[0], months[-1])
+    if rows.empty:
+        return np.empty((0, 2), dtype=np.int64), np.zeros((0, 1))
+    keys, series = np.unique(rows[['type_code', 'category_id']].to_numpy(), axis=0, return_inverse=True)
+    matrix = np.zeros((len(keys), len(months)))
+    matrix[series.reshape(-1), pd.Index(months).get_indexer(rows['month'])] = rows['amount_cents'].to_numpy()
+    first = int(matrix.any(axis=0).argmax())
+    return keys, matrix[:, min(first, len(months) - 1):]
+
+
+def seasonal_naive(history, season=SEASON):
+    # 下一期 = 一个季节前的同期；不足一个季节时退化为上一期。返回 (预测, 回测平均绝对误差)
+    lag = season if history.shape[1] > season else 1
+    errors = np.abs(history[:, lag:] - history[:, :-lag])
+    mae = errors.mean(axis=1) if errors.shape[1] else np.full(len(history), np.inf)
+    return history[:, -lag], mae
+
+
+def exponential_smoothing(history, alphas=SES_ALPHAS):
+    # 所有 alpha × 所有序列一起递推 (只在时间维上循环)，每条序列取一步预测误差最小的 alpha。
+    # 返回 (预测, 平均绝对误差)
+    level = np.tile(history[:, 0], (len(alphas), 1))
+    abs_err = np.zeros_like(level)
+    rate = alphas[:, None]
+    for t in range(1, history.shape[1]):
+        err = history[:, t] - level
+        abs_err += np.abs(err)
+        level += rate * err
+    best = abs_err.argmin(axis=0)
+    cols = np.arange(len(history))
+    return level[best, cols], abs_err[best, cols] / max(history.shape[1] - 1, 1)
+
+
+def forecast_matrix(matrix, elapsed):
+    # matrix 最后一列是本月至今，elapsed 为本月已过去的比例 (0, 1]；
+    # 返回 (整月预测, 月末预计, 模型名 'pace' / 'seasonal' / 'ses')
+    history, mtd = matrix[:, :-1], matrix[:, -1]
+    if history.shape[1] == 0:
+        # 新账本没有完整月份，只能按本月的速度外推
+        pace = mtd / elapsed
+        return pace, pace, np.full(len(matrix), 'pace')
+    seasonal, seasonal_mae = seasonal_naive(history)
+    smoothed, smoothed_mae = exponential_smoothing(history)
+    use_seasonal = seasonal_mae < smoothed_mae
+    predicted = np.maximum(np.where(use_seasonal, seasonal, smoothed), 0)
+    # 月预测是整月合计；房租之类月初一次付清的分类，本月至今已经超过预测时以实际为准
+    return predicted, np.maximum(predicted, mtd), np.where(use_seasonal, 'seasonal', 'ses')
+
+
+@backend.cached_query
+def month_end_forecast(ledger_id, today):
+    # 按 (数据版本, today) 缓存：返回 (每个分类的预测表, {'month', 'balance', 'projected_balance'})
+    keys, matrix = monthly_matrix(ledger_id, today)
+    days = calendar.monthrange(today.year, today.month)[1]
+    elapsed = today.day / days
+    predicted, projected, model = forecast_matrix(matrix, elapsed)
+
+    codes = keys[:, 0]
+    df = pd.DataFrame({
+        'type': pd.Series(codes).map(backend.TYPE_NAMES),
+        'category': pd.Series(keys[:, 1]).map(backend.get_category_names(ledger_id)).fillna(''),
+        'spent': matrix[:, -1] / 100,
+        'forecast': np.round(predicted) / 100,
+        'projected': np.round(projected) / 100,
+        'model': model,
+    })
+    df = df.sort_values(['type', 'projected'], ascending=[True, False], ignore_index=True)
+
+    month_end = today.replace(day=days)
+    totals = backend.get_totals_cents(ledger_id, None, month_end)
+    balance = totals['Income'] - totals['Expense']
+    sign = np.where(codes == backend.TYPE_INCOME, 1, -1)
+    still_to_come = int(np.round((sign * (projected - matrix[:, -1])).sum()))
+    return df, {'month': today.strftime('%Y-%m'), 'balance': backend.from_cents(balance),
+                'projected_balance': backend.from_cents(balance + still_to_come)}
@@ -0,0 +1,132 @@
+import time
+
+import pandas as pd
+
+import backend
+
+CHUNK_ROWS = 50000
+FIELDS = ('date', 'type', 'category', 'amount', 'note')
+ROW_FIELDS = ('date', 'type', 'category', 'amount_cents', 'note')
+DEFAULT_CATEGORY = "其他"
+
+# 常见银行流水表头 -> 字段
+COLUMN_ALIASES = {
+    'date': ['date', '日期', 'transaction date', 'posting date', 'value date', '交易日期', '记账日期'],
+    'type': ['type', '类型', '收支', 'dr/cr', 'debit/credit'],
+    'category': ['category', '分类', '类别'],
+    'amount': ['amount', '金额', 'transaction amount', '交易金额'],
+    'note': ['note', '备注', 'description', 'memo', 'details', '摘要', '说明'],
+}
+INCOME_WORDS = {'income', '收入', 'cr', 'credit', '入账', '+'}
+
+
+def _is_excel(filename):
+    return filename.lower().endswith(('.xlsx', '.xlsm'))
+
+
+def read_header(file, filename):
+    if _is_excel(filename):
+        header = next(_iter_excel_rows(file), ())
+    else:
+        header = pd.read_csv(file, nrows=0).columns
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    return [str(h).strip() for h in header if h is not None]
+
+
+def guess_mapping(columns):
+    mapping = {}
+    lowered = {c.lower(): c for c in columns}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in lowered:
+                mapping[field] = lowered[alias]
+                break
+    return mapping
+
+
+def _iter_excel_rows(file):
+    from openpyxl import load_workbook
+    wb = load_workbook(file, read_only=True, data_only=True)
+    try:
+        yield from wb.active.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def read_chunks(file, filename, chunk_rows=CHUNK_ROWS):
+    if not _is_excel(filename):
+        yield from pd.read_csv(file, chunksize=chunk_rows, dtype=str, keep_default_na=False)
+        return
+
+    rows = _iter_excel_rows(file)
+    header = [str(h).strip() if h is not None else f"col{i}" for i, h in enumerate(next(rows, ()))]
+    buf = []
+    for row in rows:
+        buf.append(row)
+        if len(buf) >= chunk_rows:
+            yield pd.DataFrame(buf, columns=header)
+            buf = []
+    if buf:
+        yield pd.DataFrame(buf, columns=header)
+
+
+def _clean_amounts(raw):
+    # 会计写法 "(12.50)" 和末尾负号 "12.50-" 都是负数；货币符号、千分位之类的字符在判断符号之后再去掉
+    text = raw.fillna('').astype(str).str.strip()
+    negative = (text.str.startswith('(') & text.str.endswith(')')) | text.str.endswith('-')
+    negative |= text.str.match(r'[^\d.]*-')
+    digits = text.str.replace(r'[^\d.]', '', regex=True)
+    return digits.where(~negative, '-' + digits)
+
+
+def normalize_chunk(df, mapping):
+    df.columns = [str(c).strip() for c in df.columns]
+    n = len(df)
+
+    dates = pd.to_datetime(df[mapping['date']], errors='coerce', format='mixed')
+    raw_amount = df[mapping['amount']]
+    if not pd.api.types.is_numeric_dtype(raw_amount):
+        raw_amount = _clean_amounts(raw_amount)
+    amount = pd.to_numeric(raw_amount, errors='coerce')
+
+    if mapping.get('type'):
+        is_income = df[mapping['type']].astype(str).str.strip().str.lower().isin(INCOME_WORDS)
+    else:
+        # 没有类型列时按金额正负判断 (银行流水常见)
+        is_income = amount > 0
+    types = is_income.map({True: 'Income', False: 'Expense'})
+
+    if mapping.get('category'):
+        category = df[mapping['category']].fillna('').astype(str).str.strip().replace('', DEFAULT_CATEGORY)
+    else:
+        category = pd.Series([DEFAULT_CATEGORY] * n, index=df.index)
+    note = df[mapping['note']].fillna('').astype(str) if mapping.get('note') else pd.Series([''] * n, index=df.index)
+
+    valid = dates.notna() & amount.notna() & (amount != 0)
+    out = pd.DataFrame({
+        'date': dates[valid].dt.strftime('%Y-%m-%d'),
+        'type': types[valid],
+        'category': category[valid],
+        # 从文本直接换算成整数分，和手动记账的 to_cents 同一套十进制四舍五入 (不经过浮点乘 100)
+        'amount_cents': raw_amount[valid].map(lambda a: abs(backend.to_cents(a))).astype('int64'),
+        'note': note[valid],
+    })
+    return out, n - int(valid.sum())
+
+
+def import_statement(ledger_id, file, filename, mapping, chunk_rows=CHUNK_ROWS):
+    # 逐块读取、逐块提交，每块 yield 一次进度
+    t0 = time.perf_counter()
+    imported = skipped = 0
+    for chunk in read_chunks(file, filename, chunk_rows):
+        rows, bad = normalize_chunk(chunk, mapping)
+        imported += backend.bulk_insert_records(ledger_id, zip(*(rows[f].tolist() for f in ROW_FIELDS)))
+        skipped += bad
+        elapsed = time.perf_counter() - t0
+        yield {
+            'imported': imported,
+            'skipped': skipped,
+            'elapsed': elapsed,
+            'rows_per_sec': imported / elapsed if elapsed > 0 else 0.0,
+        }
@@ -1,3 +1,5 @@
+import numpy as np
+import pandas as pd
 import streamlit as st
 
 TRANS = {
@@ -23,6 +25,7 @@ TRANS = {
     "tab_report": {"CN": "📑 财务报告", "EN": "📑 Reports"},
 
     "filter_label": {"CN": "🔍 筛选与搜索", "EN": "🔍 Filter & Search"},
+    "search_hint": {"CN": "搜索备注或类别…", "EN": "Search notes or categories…"},
     "filter_cat": {"CN": "按分类", "EN": "By Category"},
     "filter_type": {"CN": "按类型", "EN": "By Type"},
     "all": {"CN": "全部", "EN": "All"},
@@ -32,11 +35,48 @@ TRANS = {
     "manage_cats": {"CN": "分类管理", "EN": "Categories"},
     "tab_add_cat":{"CN":"➕ 添加类别","EN":"➕ Add Category"},
     "tab_del_cat":{"CN":"➖ 删除类别","EN":"➖ Delete Category"},
+    "tab_rename_cat":{"CN":"✏️ 重命名","EN":"✏️ Rename"},
+    "tab_budget": {"CN": "🎯 预算", "EN": "🎯 Budget"},
+    "budget_limit": {"CN": "每月上限 (0 = 取消)", "EN": "Monthly limit (0 = none)"},
+    "budget_title": {"CN": "本月预算 {month}", "EN": "Budgets {month}"},
+    "budget_alert": {"CN": "{cat} 本月已超预算：{spent:,.2f} / {limit:,.2f}",
+                     "EN": "{cat} is over budget this month: {spent:,.2f} / {limit:,.2f}"},
+    "recurring_title": {"CN": "🔁 周期记账", "EN": "🔁 Recurring"},
+    "rule_freq": {"CN": "频率", "EN": "Repeats"},
+    "freq_daily": {"CN": "每天", "EN": "Daily"},
+    "freq_weekly": {"CN": "每周", "EN": "Weekly"},
+    "freq_monthly": {"CN": "每月", "EN": "Monthly"},
+    "freq_yearly": {"CN": "每年", "EN": "Yearly"},
+    "rule_start": {"CN": "开始日期", "EN": "Starts"},
+    "rule_end": {"CN": "结束日期", "EN": "Ends"},
+    "rule_last_posted": {"CN": "已记到", "EN": "Posted until"},
+    "rule_add": {"CN": "添加规则", "EN": "Add Rule"},
+    "rule_added": {"CN": "规则已添加，补记 {n} 笔", "EN": "Rule added, {n} entries posted"},
+    "col_budget": {"CN": "预算", "EN": "Budget"},
+    "col_spent": {"CN": "已花费", "EN": "Spent"},
+    "col_remaining": {"CN": "剩余", "EN": "Remaining"},
+    "col_used": {"CN": "使用比例", "EN": "Used"},
+    "forecast_title": {"CN": "月末预测 {month}", "EN": "Month-end forecast {month}"},
+    "forecast_balance": {"CN": "预计月末余额", "EN": "Projected balance"},
+    "forecast_expense": {"CN": "预计本月支出", "EN": "Projected spending"},
+    "col_forecast": {"CN": "模型预测", "EN": "Model"},
+    "col_projected": {"CN": "预计月末", "EN": "Projected"},
+    "col_model": {"CN": "预测方法", "EN": "Method"},
+    "model_pace": {"CN": "按本月速度外推", "EN": "Month-to-date pace"},
+    "model_seasonal": {"CN": "去年同月", "EN": "Same month last year"},
+    "model_ses": {"CN": "指数平滑", "EN": "Exponential smoothing"},
+    "writer_stats": {"CN": "写队列 {depth} · 已提交 {batches} 批 · 平均 {mean:.1f} ms · 最长 {max:.1f} ms",
+                     "EN": "Write queue {depth} · {batches} batches · mean {mean:.1f} ms · max {max:.1f} ms"},
+    "perf_title": {"CN": "⚙️ 性能", "EN": "⚙️ Performance"},
+    "perf_last_rerun": {"CN": "上一次运行 #{rerun}", "EN": "Last rerun #{rerun}"},
+    "perf_summary": {"CN": "全部记录 (p50 / p95)", "EN": "All records (p50 / p95)"},
+    "perf_clear": {"CN": "清空", "EN": "Clear"},
     "welcome": {"CN": "欢迎回来！", "EN": "Welcome Back!"},
     "empty": {"CN": "暂无数据，快去记一笔吧！", "EN": "No records yet. Add one now!"},
     "cal_view": {"CN": "视图模式", "EN": "View Mode"},
     "view_month": {"CN": "月视图", "EN": "Month"},
     "view_week": {"CN": "周视图", "EN": "Week"},
+    "view_year": {"CN": "年热力图", "EN": "Year"},
     "cal_date": {"CN": "选择日期", "EN": "Select Date"},
     "tab_del": {"CN": "删除记录", "EN": "Delete Record"},
 
@@ -44,6 +84,7 @@ TRANS = {
     "rep_weekly": {"CN": "周报 (Weekly)", "EN": "Weekly"},
     "rep_monthly": {"CN": "月报 (Monthly)", "EN": "Monthly"},
     "rep_yearly": {"CN": "年报 (Yearly)", "EN": "Yearly"},
+    "rep_all_ledgers": {"CN": "全部账本合并", "EN": "All ledgers (consolidated)"},
     "sel_week": {"CN": "选择周 (点击该周任意一天)", "EN": "Select Week (Pick any day)"},
     "sel_month": {"CN": "选择月份 (点击该月任意一天)", "EN": "Select Month"},
     "sel_year": {"CN": "选择年份", "EN": "Select Year"},
@@ -52,12 +93,19 @@ TRANS = {
     "cat_breakdown": {"CN": "分类详情", "EN": "Category Breakdown"},
     "download_excel": {"CN": "📥 导出 Excel 财务报告", "EN": "📥 Download Excel Financial Report"},
 
+    "import_title": {"CN": "📤 导入账单 (CSV / Excel)", "EN": "📤 Import Statement (CSV / Excel)"},
+    "import_map": {"CN": "列对应关系", "EN": "Column Mapping"},
+    "import_btn": {"CN": "开始导入", "EN": "Start Import"},
+    "import_none": {"CN": "(无)", "EN": "(none)"},
+
     # Excel 表头
     "col_date": {"CN": "日期", "EN": "Date"},
     "col_cat": {"CN": "分类", "EN": "Category"},
     "col_inc": {"CN": "入账", "EN": "Debit"},
     "col_exp": {"CN": "出账", "EN": "Credit"},
-    "col_note": {"CN": "备注", "EN": "Note"}
+    "col_note": {"CN": "备注", "EN": "Note"},
+    "col_ledger": {"CN": "账本", "EN": "Ledger"},
+    "col_count": {"CN": "笔数", "EN": "Count"}
 }
 
 # 1. 中文(纯文本) -> 英文(Emoji)
@@ -93,9 +141,48 @@ def T(key):
     return TRANS.get(key, {}).get(lang, key)
 
 
-def get_cat_display(cat_name):
-    lang = st.session_state.get('language_code', 'CN')
+# 类型：英文(库内归一值) -> 中文
+TYPE_CN = {"Income": "收入", "Expense": "支出"}
+TYPE_CN_REV = {v: k for k, v in TYPE_CN.items()}
+
+
+def type_label(type_name, lang):
+    type_name = TYPE_CN_REV.get(type_name, type_name)
+    if lang == 'EN':
+        return type_name
+    return TYPE_CN.get(type_name, type_name)
+
+
+def cat_label(cat_name, lang):
+    cat_name = CAT_TRANS_REV.get(cat_name, cat_name)
     if lang == 'EN':
         return CAT_TRANS.get(cat_name, cat_name)
     else:
-        return CAT_CN_EMOJI.get(cat_name, cat_name)
\ No newline at end of file
+        return CAT_CN_EMOJI.get(cat_name, cat_name)
+
+
+def get_type_display(type_name):
+    return type_label(type_name, st.session_state.get('language_code', 'CN'))
+
+
+def get_cat_display(cat_name):
+    return cat_label(cat_name, st.session_state.get('language_code', 'CN'))
+
+
+def relabel_categorical(series, mapper):
+    # 只翻译分类表 (几十个)，不逐行 replace；翻译后重名的分类合并为同一个 code
+    cats = series.cat.categories
+    labels = [mapper(c) for c in cats]
+    unique_labels = list(dict.fromkeys(labels))
+    if len(unique_labels) == len(labels):
+        return series.cat.rename_categories(labels)
+    pos = {label: i for i, label in enumerate(unique_labels)}
+    code_map = np.array([pos[label] for label in labels] + [-1])
+    codes = code_map[series.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical.from_codes(codes, categories=unique_labels), index=series.index, name=series.name)
+
+
+def localize_typed_records(df, lang_code):
+    # 配合 backend.get_records_typed：type / category 为 Categorical
+    return df.assign(type=relabel_categorical(df['type'], lambda t: type_label(t, lang_code)),
+                     category=relabel_categorical(df['category'], lambda c: cat_label(c, lang_code)))
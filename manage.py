@@ -0,0 +1,74 @@
+import argparse
+import sqlite3
+import sys
+from datetime import date
+
+import backend
+import recurring
+
+
+def cmd_rebuild_rollups(args):
+    backend.rebuild_rollups(args.ledger)
+    print("✅ rollups rebuilt")
+
+
+def cmd_check_rollups(args):
+    mismatches = backend.check_rollups(args.ledger)
+    for row in mismatches:
+        print(*row, sep="\t")
+    print(f"{len(mismatches)} mismatched rollup rows")
+    return 1 if mismatches else 0
+
+
+def cmd_split_ledgers(args):
+    if backend.storage_mode() == 'sharded':
+        print("already sharded")
+        return 0
+    try:
+        moved = backend.split_ledgers(prune=args.prune)
+    except sqlite3.OperationalError as e:
+        # 拿不到目录库的写锁：应用或别的进程还在写
+        print(f"❌ catalog is busy ({e}); stop the app before running split-ledgers", file=sys.stderr)
+        return 1
+    for ledger_id, name, count, path in moved:
+        print(ledger_id, name, f"{count} records", path, sep="\t")
+    print("✅ storage mode: sharded" + (" (catalog pruned)" if args.prune else ""))
+
+
+def cmd_post_recurring(args):
+    today = date.fromisoformat(args.today) if args.today else None
+    posted = recurring.post_due(today)
+    for ledger_id, count in sorted(posted.items()):
+        print(ledger_id, f"{count} records", sep="\t")
+    print(f"✅ {sum(posted.values())} recurring records posted")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sky Ledger maintenance commands")
+    parser.add_argument("--db", default=backend.DB_FILE, help="SQLite database file")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("rebuild-rollups", help="recompute daily/monthly totals from records")
+    p.add_argument("--ledger", type=int, help="only this ledger id")
+    p.set_defaults(func=cmd_rebuild_rollups)
+
+    p = sub.add_parser("check-rollups", help="verify daily/monthly totals against records")
+    p.add_argument("--ledger", type=int, help="only this ledger id")
+    p.set_defaults(func=cmd_check_rollups)
+
+    p = sub.add_parser("split-ledgers", help="move each ledger into its own SQLite file (sharded storage)")
+    p.add_argument("--prune", action="store_true", help="delete the copied rows from the catalog and VACUUM")
+    p.set_defaults(func=cmd_split_ledgers)
+
+    p = sub.add_parser("post-recurring", help="post all due recurring transactions (safe to run repeatedly)")
+    p.add_argument("--today", help="post occurrences up to this date (YYYY-MM-DD), default today")
+    p.set_defaults(func=cmd_post_recurring)
+
+    args = parser.parse_args(argv)
+    backend.DB_FILE = args.db
+    backend.init_db()
+    return args.func(args) or 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,164 @@
+import cProfile
+import functools
+import inspect
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+# 轻量计时：每个 backend 函数 / app 区块一条记录，放进固定长度的环形缓冲区
+RING_SIZE = 5000
+SQL_PER_SPAN = 5
+SQL_MAX_CHARS = 300
+# LEDGER_PROFILE=<目录> 时每次 rerun 写一份 cProfile 输出 (=1 时写到 ./profiles)
+PROFILE_DIR = os.environ.get("LEDGER_PROFILE") or None
+if PROFILE_DIR == "1":
+    PROFILE_DIR = "profiles"
+
+_ring = deque(maxlen=RING_SIZE)
+_ring_lock = threading.Lock()
+_rerun_ids = itertools.count(1)
+_local = threading.local()
+
+
+def _rows(result):
+    if isinstance(result, (pd.DataFrame, pd.Series, list)):
+        return len(result)
+    if isinstance(result, tuple) and result and isinstance(result[0], (pd.DataFrame, list)):
+        return len(result[0])
+    return None
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def trace_sql(statement):
+    # sqlite3 的 trace 回调：SQL 记到当前线程最内层的区块上
+    stack = getattr(_local, 'stack', None)
+    if stack:
+        span = stack[-1]
+        span['sql_count'] += 1
+        if len(span['sql']) < SQL_PER_SPAN:
+            span['sql'].append(" ".join(statement.split())[:SQL_MAX_CHARS])
+
+
+@contextmanager
+def untraced(conn):
+    # executemany 每行都会触发一次回调；批量写入时临时关掉
+    conn.set_trace_callback(None)
+    try:
+        yield conn
+    finally:
+        conn.set_trace_callback(trace_sql)
+
+
+@contextmanager
+def span(name, kind='section'):
+    stack = _stack()
+    rec = {'name': name, 'kind': kind, 'rerun': getattr(_local, 'rerun', None), 'depth': len(stack),
+           'start': time.time(), 'ms': None, 'rows': None, 'sql': [], 'sql_count': 0, 'error': None}
+    stack.append(rec)
+    t0 = time.perf_counter()
+    try:
+        yield rec
+    except BaseException as e:
+        rec['error'] = type(e).__name__
+        raise
+    finally:
+        rec['ms'] = (time.perf_counter() - t0) * 1000
+        stack.pop()
+        with _ring_lock:
+            _ring.append(rec)
+
+
+def timed(fn, name=None):
+    name = name or f"{fn.__module__}.{fn.__name__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with span(name, kind='call') as rec:
+            result = fn(*args, **kwargs)
+            rec['rows'] = _rows(result)
+            return result
+
+    wrapper.__perf__ = True
+    return wrapper
+
+
+def instrument(namespace, skip=()):
+    # 给模块里所有公开函数套上 timed；生成器、装饰器之类的管道函数由调用方放进 skip
+    module = namespace['__name__']
+    for name, obj in list(namespace.items()):
+        if (name.startswith('_') or name in skip or not inspect.isfunction(obj) or obj.__module__ != module
+                or inspect.isgeneratorfunction(obj) or getattr(obj, '__perf__', False)):
+            continue
+        namespace[name] = timed(obj, f"{module}.{name}")
+
+
+def begin_rerun():
+    # 每次脚本执行开始时调用，返回本次 rerun 的编号；同一线程上一次没收尾的在这里收尾
+    end_rerun()
+    _local.rerun = next(_rerun_ids)
+    _local.stack = []
+    if PROFILE_DIR:
+        _local.profiler = cProfile.Profile()
+        _local.profiler.enable()
+    return _local.rerun
+
+
+def end_rerun():
+    profiler = getattr(_local, 'profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profiler.dump_stats(os.path.join(PROFILE_DIR, f"rerun-{int(time.time())}-{_local.rerun}.prof"))
+        _local.profiler = None
+    _local.rerun = None
+
+
+def records(rerun=None):
+    with _ring_lock:
+        recs = list(_ring)
+    if rerun is not None:
+        recs = [r for r in recs if r['rerun'] == rerun]
+    return pd.DataFrame(recs, columns=['name', 'kind', 'rerun', 'depth', 'start', 'ms', 'rows', 'sql',
+                                       'sql_count', 'error'])
+
+
+def summary():
+    df = records()
+    if df.empty:
+        return pd.DataFrame(columns=['name', 'kind', 'calls', 'p50_ms', 'p95_ms', 'max_ms', 'rows', 'sql'])
+    g = df.groupby(['name', 'kind'])
+    out = pd.DataFrame({
+        'calls': g.size(),
+        'p50_ms': g['ms'].median(),
+        'p95_ms': g['ms'].quantile(0.95),
+        'max_ms': g['ms'].max(),
+        'rows': g['rows'].max(),
+        'sql': g['sql_count'].sum(),
+    }).reset_index()
+    return out.sort_values('p95_ms', ascending=False, ignore_index=True)
+
+
+def rerun_breakdown(rerun):
+    # 某一次 rerun 的区块 (depth 0) 和其中的 backend 调用
+    df = records(rerun)
+    if df.empty:
+        return df
+    df = df.sort_values('start', ignore_index=True)
+    df['sql'] = df['sql'].map(lambda s: "\n".join(s))
+    return df[['depth', 'kind', 'name', 'ms', 'rows', 'sql_count', 'sql', 'error']]
+
+
+def clear():
+    with _ring_lock:
+        _ring.clear()
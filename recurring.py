@@ -0,0 +1,116 @@
+import calendar
+import sqlite3
+import threading
+from datetime import date, timedelta
+
+import backend
+
+# 周期记账：启动时和后台定时器把到期的规则展开成 records。
+# 每个库文件一个事务批量写入；规则的 last_posted 与记录同一事务推进，
+# 再加上 (rule_id, date) 唯一索引，重启或重复执行都不会重复入账
+TICK_SECONDS = 15 * 60
+
+_stop = threading.Event()
+_ticker = None
+_ticker_lock = threading.Lock()
+
+
+def _shift(freq, start, n):
+    if freq == 'daily':
+        return start + timedelta(days=n)
+    if freq == 'weekly':
+        return start + timedelta(weeks=n)
+    months = n if freq == 'monthly' else 12 * n
+    year, month = divmod(start.month - 1 + months, 12)
+    year += start.year
+    # 31 号 / 2 月 29 号之类的日期落到当月最后一天
+    return date(year, month + 1, min(start.day, calendar.monthrange(year, month + 1)[1]))
+
+
+def occurrences(freq, start, interval=1, after=None, until=None, end=None):
+    # start 起每 interval 个周期一次；只返回 (after, min(until, end)] 范围内的日期
+    last = min(d for d in (until, end) if d is not None)
+    dates = []
+    n = 0
+    if after is not None and freq in ('daily', 'weekly'):
+        step = interval * (1 if freq == 'daily' else 7)
+        n = max(0, (after - start).days // step) * interval
+    while True:
+        d = _shift(freq, start, n)
+        if d > last:
+            return dates
+        if after is None or d > after:
+            dates.append(d)
+        n += interval
+
+
+def post_due_conn(conn, today):
+    # 在调用方的事务里补记所有到期的记录；返回 {ledger_id: 新增笔数}，
+    # 推进了 last_posted 但没有新记录的账本也在里面 (笔数为 0)
+    rules = conn.execute("""SELECT id, ledger_id, type_code, category_id, amount_cents, note, freq, interval,
+                                   start_date, end_date, last_posted
+                            FROM recurring_rules
+                            WHERE start_date <= :today AND (last_posted IS NULL OR last_posted < :today)
+                              AND (end_date IS NULL OR last_posted IS NULL OR last_posted < end_date)""",
+                         {'today': str(today)}).fetchall()
+    rows, marks = [], []
+    for (rule_id, ledger_id, code, category_id, cents, note, freq, interval,
+         start, end, last_posted) in rules:
+        start = date.fromisoformat(start)
+        end = date.fromisoformat(end) if end else None
+        after = date.fromisoformat(last_posted) if last_posted else None
+        for d in occurrences(freq, start, interval, after=after, until=today, end=end):
+            rows.append((ledger_id, str(d), code, category_id, cents, note, rule_id))
+        marks.append((str(min(today, end) if end else today), rule_id))
+
+    by_ledger = {}
+    for row in rows:
+        by_ledger.setdefault(row[0], []).append(row)
+    posted = {rule[1]: 0 for rule in rules}
+    with backend.deferred_rollups(conn):
+        for ledger_id, ledger_rows in by_ledger.items():
+            # 已存在的 (rule_id, date) 被唯一索引忽略，rowcount 只算真正插入的
+            inserted = conn.executemany("INSERT OR IGNORE INTO records (ledger_id, date, type_code, category_id, "
+                                        "amount_cents, note, rule_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                        ledger_rows).rowcount
+            posted[ledger_id] = max(inserted, 0)
+    conn.executemany("UPDATE recurring_rules SET last_posted = ? WHERE id = ?", marks)
+    return posted
+
+
+def post_due(today=None, catalog=None):
+    today = today or date.today()
+    posted = {}
+    for path in backend.ledger_paths(catalog=catalog):
+        with backend.get_conn(path) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            counts = post_due_conn(conn, today)
+        for ledger_id, n in counts.items():
+            # 只推进了 last_posted 的账本也要失效，规则列表里的"已记到"才会更新
+            backend.invalidate(ledger_id)
+            if n:
+                posted[ledger_id] = posted.get(ledger_id, 0) + n
+    return posted
+
+
+def _tick(interval, catalog):
+    while not _stop.wait(interval):
+        try:
+            post_due(catalog=catalog)
+        except sqlite3.Error:
+            # 库忙或正在迁移，下一轮再补
+            pass
+
+
+def start_scheduler(interval=TICK_SECONDS, catalog=None):
+    global _ticker
+    with _ticker_lock:
+        if _ticker is None or not _ticker.is_alive():
+            _stop.clear()
+            _ticker = threading.Thread(target=_tick, args=(interval, catalog), name="ledger-recurring", daemon=True)
+            _ticker.start()
+    return _ticker
+
+
+def stop_scheduler():
+    _stop.set()
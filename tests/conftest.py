@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backend  # noqa: E402
+import writer  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    # 每个测试一个全新的库文件，单文件模式
+    monkeypatch.setattr(backend, 'DB_FILE', str(tmp_path / 'test.db'))
+    monkeypatch.setattr(backend, 'STORAGE_MODE', 'single')
+    backend.clear_cache()
+    backend.init_db()
+    yield backend.DB_FILE
+    writer.close_writers()
+    backend.close_pools()
+    backend.clear_cache()
+
+
+@pytest.fixture
+def new_ledger(db):
+    def make(name, categories):
+        assert backend.add_ledger(name, categories)
+        return {n: i for i, n in backend.get_ledgers()}[name]
+    return make
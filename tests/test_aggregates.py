@@ -0,0 +1,60 @@
+import pytest
+
+import backend
+from benchmarks import synth
+
+
+@pytest.fixture
+def ledger(new_ledger):
+    ledger_id = new_ledger("Aggregates", ["餐饮"])
+    backend.bulk_insert_records(ledger_id, synth.generate_rows(2000, seed=1, days=120))
+    records = backend.get_all_records(ledger_id)
+    records['cents'] = (records['amount'] * 100).round().astype('int64')
+    return ledger_id, records
+
+
+RANGES = [(None, None), ("2022-02-01", None), (None, "2022-03-15"), ("2022-01-10", "2022-02-20")]
+
+
+def _between(records, start, end):
+    keep = records['date'].notna()
+    if start is not None:
+        keep &= records['date'] >= start
+    if end is not None:
+        keep &= records['date'] <= end
+    return records[keep]
+
+
+@pytest.mark.parametrize("start, end", RANGES)
+def test_totals_match_records(ledger, start, end):
+    ledger_id, records = ledger
+    rows = _between(records, start, end)
+    totals = backend.get_totals_cents(ledger_id, start, end)
+    assert totals['Income'] == rows.loc[rows['type'] == 'Income', 'cents'].sum()
+    assert totals['Expense'] == rows.loc[rows['type'] == 'Expense', 'cents'].sum()
+    assert totals['count'] == len(rows)
+
+
+@pytest.mark.parametrize("start, end", RANGES)
+def test_category_sums_match_records(ledger, start, end):
+    ledger_id, records = ledger
+    rows = _between(records, start, end)
+    got = backend.get_sum_by_category(ledger_id, start, end, type="Expense")
+    expected = rows[rows['type'] == 'Expense'].groupby('category')['cents'].sum()
+    assert dict(zip(got['category'], (got['amount'] * 100).round().astype('int64'))) == expected.to_dict()
+
+
+def test_daily_and_monthly_series_match_records(ledger):
+    ledger_id, records = ledger
+    signed = records['cents'].where(records['type'] == 'Income', -records['cents'])
+
+    daily = backend.get_daily_net(ledger_id, "2022-01-15", "2022-03-31")
+    rows = _between(records.assign(signed=signed), "2022-01-15", "2022-03-31")
+    expected = rows.groupby('date')['signed'].sum()
+    assert daily['date'].tolist() == expected.index.tolist()
+    assert (daily['net'] * 100).round().astype('int64').tolist() == expected.tolist()
+
+    monthly = backend.get_monthly_by_type(ledger_id)
+    expected = records.groupby([records['date'].str[:7], 'type'])['cents'].sum()
+    got = monthly.set_index(['month', 'type'])['amount'].mul(100).round().astype('int64')
+    assert got.to_dict() == expected.to_dict()
@@ -0,0 +1,51 @@
+import backend
+
+
+def _spend(ledger_id, amount):
+    backend.save_record(ledger_id, "2024-03-10", "Expense", "餐饮", amount, "")
+    return backend.budget_crossed(backend.budget_status(ledger_id, "餐饮", "2024-03"), amount)
+
+
+def test_alert_only_when_save_crosses_the_limit(new_ledger):
+    ledger_id = new_ledger("Budget", ["餐饮"])
+    backend.set_budget(ledger_id, "餐饮", 100)
+
+    assert not _spend(ledger_id, 60)       # 60 / 100
+    assert not _spend(ledger_id, 40)       # 正好用完，不算超
+    assert _spend(ledger_id, 0.01)         # 100.01：这一笔越过上限
+    assert not _spend(ledger_id, 25)       # 已经超支，不再提醒
+
+
+def test_single_save_jumping_past_the_limit(new_ledger):
+    ledger_id = new_ledger("Budget", ["餐饮"])
+    backend.set_budget(ledger_id, "餐饮", 100)
+    assert _spend(ledger_id, 250)
+    assert not backend.budget_crossed(None, 10)
+
+
+def test_status_counts_only_this_months_expenses(new_ledger):
+    ledger_id = new_ledger("Budget", ["餐饮", "工资"])
+    assert backend.budget_status(ledger_id, "餐饮", "2024-03") is None
+    backend.set_budget(ledger_id, "餐饮", 100)
+    assert backend.budget_status(ledger_id, "餐饮", "2024-03") == (0, 10000)
+
+    backend.save_record(ledger_id, "2024-03-01", "Expense", "餐饮", 30, "")
+    backend.save_record(ledger_id, "2024-03-31", "Expense", "餐饮", 12.34, "")
+    backend.save_record(ledger_id, "2024-02-29", "Expense", "餐饮", 500, "")   # 上个月
+    backend.save_record(ledger_id, "2024-03-15", "Income", "餐饮", 80, "")     # 收入不算花费
+    assert backend.budget_status(ledger_id, " 餐饮 ", "2024-03") == (4234, 10000)
+    assert backend.budget_status(ledger_id, "工资", "2024-03") is None
+
+
+def test_status_follows_deletes_and_limit_changes(new_ledger):
+    ledger_id = new_ledger("Budget", ["餐饮"])
+    backend.set_budget(ledger_id, "餐饮", 100)
+    record_id = backend.save_record(ledger_id, "2024-03-10", "Expense", "餐饮", 60, "")
+    backend.save_record(ledger_id, "2024-03-11", "Expense", "餐饮", 15, "")
+    backend.delete_record(record_id, ledger_id)
+    assert backend.budget_status(ledger_id, "餐饮", "2024-03") == (1500, 10000)
+
+    backend.set_budget(ledger_id, "餐饮", 10)
+    assert backend.budget_status(ledger_id, "餐饮", "2024-03") == (1500, 1000)
+    backend.set_budget(ledger_id, "餐饮", 0)
+    assert backend.budget_status(ledger_id, "餐饮", "2024-03") is None
@@ -0,0 +1,54 @@
+import sqlite3
+
+import backend
+
+
+def _hits():
+    return backend.cache_stats()['hits']
+
+
+def test_repeat_query_is_served_from_cache(new_ledger):
+    ledger_id = new_ledger("Cache", ["餐饮"])
+    backend.save_record(ledger_id, "2024-01-01", "Expense", "餐饮", 10, "")
+    first = backend.get_totals_cents(ledger_id)
+    hits = _hits()
+    assert backend.get_totals_cents(ledger_id) == first
+    assert _hits() == hits + 1
+
+
+def test_writes_invalidate_cached_results(new_ledger):
+    ledger_id = new_ledger("Cache", ["餐饮"])
+    record_id = backend.save_record(ledger_id, "2024-01-01", "Expense", "餐饮", 10, "")
+    assert backend.get_totals_cents(ledger_id)['Expense'] == 1000
+    assert len(backend.get_all_records(ledger_id)) == 1
+
+    backend.save_record(ledger_id, "2024-01-02", "Expense", "餐饮", 2.5, "")
+    assert backend.get_totals_cents(ledger_id)['Expense'] == 1250
+    assert len(backend.get_all_records(ledger_id)) == 2
+
+    backend.delete_record(record_id, ledger_id)
+    assert backend.get_totals_cents(ledger_id)['Expense'] == 250
+
+    backend.rename_category(ledger_id, "餐饮", "吃饭")
+    assert backend.get_categories(ledger_id) == ["吃饭"]
+    assert set(backend.get_all_records(ledger_id)['category']) == {"吃饭"}
+
+
+def test_commit_from_another_connection_is_seen(db, new_ledger):
+    # 模拟另一个进程：不经过 backend，直接在库文件上写
+    ledger_id = new_ledger("Cache", ["餐饮"])
+    assert backend.get_totals_cents(ledger_id)['Income'] == 0
+    other = sqlite3.connect(db)
+    with other:
+        other.execute("INSERT INTO records (ledger_id, date, type_code, category_id, amount_cents, note) "
+                      "VALUES (?, '2024-01-01', ?, NULL, 500, '')", (ledger_id, backend.TYPE_INCOME))
+    other.close()
+    assert backend.get_totals_cents(ledger_id)['Income'] == 500
+
+
+def test_callers_cannot_mutate_cached_frames(new_ledger):
+    ledger_id = new_ledger("Cache", ["餐饮"])
+    backend.save_record(ledger_id, "2024-01-01", "Expense", "餐饮", 10, "")
+    df = backend.get_all_records(ledger_id)
+    df.loc[:, 'amount'] = 0
+    assert backend.get_all_records(ledger_id)['amount'].tolist() == [10.0]
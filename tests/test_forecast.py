@@ -0,0 +1,16 @@
+import numpy as np
+
+import forecast
+
+
+def test_model_labels():
+    # 没有完整月份时按本月速度外推，不能标成平滑模型
+    predicted, projected, model = forecast.forecast_matrix(np.array([[300.0], [0.0]]), 0.5)
+    assert list(model) == ['pace', 'pace']
+    assert list(projected) == [600.0, 0.0]
+
+    # 强季节性的序列选季节朴素，平稳序列选指数平滑
+    season = np.tile([100.0, 100, 100, 100, 100, 100, 100, 100, 100, 100, 100, 1000], 3)
+    flat = np.full(37, 200.0)
+    _, _, model = forecast.forecast_matrix(np.vstack([np.append(season, 0), flat]), 0.5)
+    assert list(model) == ['seasonal', 'ses']
@@ -0,0 +1,62 @@
+import io
+
+import backend
+import importer
+
+MAPPING = {'date': 'Date', 'amount': 'Amount', 'note': 'Memo'}
+
+
+def _normalize(csv, mapping=MAPPING):
+    chunk = next(importer.read_chunks(io.StringIO(csv), "statement.csv"))
+    return importer.normalize_chunk(chunk, mapping)
+
+
+def test_half_cent_amounts_round_like_to_cents():
+    rows, bad = _normalize("Date,Amount,Memo\n2024-01-01,1.005,a\n2024-01-02,-1234.565,b\n2024-01-03,2.675,c\n")
+    assert bad == 0
+    assert rows['amount_cents'].tolist() == [101, 123457, 268]
+    assert rows['amount_cents'].tolist() == [abs(backend.to_cents(a)) for a in ("1.005", "-1234.565", "2.675")]
+
+
+def test_accounting_negatives_are_expenses():
+    csv = ('Date,Amount,Memo\n2024-01-01,(12.50),paren\n2024-01-02,"-RM 1,234.50",symbol\n'
+           '2024-01-03,RM -3.00,inner\n2024-01-04,7.25-,trailing\n2024-01-05,"$1,000.00",salary\n')
+    rows, bad = _normalize(csv)
+    assert bad == 0
+    assert rows['type'].tolist() == ['Expense', 'Expense', 'Expense', 'Expense', 'Income']
+    assert rows['amount_cents'].tolist() == [1250, 123450, 300, 725, 100000]
+
+
+def test_unparseable_rows_are_counted_not_imported():
+    csv = ("Date,Amount,Memo\n2024-01-01,10,ok\nnot a date,5,bad date\n2024-01-03,,no amount\n"
+           "2024-01-04,0,zero\n2024-01-05,abc,text\n")
+    rows, bad = _normalize(csv)
+    assert bad == 4
+    assert rows['note'].tolist() == ["ok"]
+
+
+def test_type_and_category_columns():
+    mapping = dict(MAPPING, type='Dr/Cr', category='Category')
+    csv = ("Date,Amount,Memo,Dr/Cr,Category\n01/02/2024,12.30,a,CR,工资\n"
+           "2024-01-03,-4,b,DR, \n2024-01-04 09:15,5,c,Debit,交通\n")
+    rows, bad = _normalize(csv, mapping)
+    assert bad == 0
+    assert rows['date'].tolist() == ["2024-01-02", "2024-01-03", "2024-01-04"]
+    assert rows['type'].tolist() == ['Income', 'Expense', 'Expense']
+    # 空分类归到默认分类；有类型列时金额一律取绝对值
+    assert rows['category'].tolist() == ["工资", importer.DEFAULT_CATEGORY, "交通"]
+    assert rows['amount_cents'].tolist() == [1230, 400, 500]
+
+
+def test_import_in_chunks_matches_totals(new_ledger):
+    ledger_id = new_ledger("Import", ["餐饮"])
+    lines = [f"2024-01-{i % 28 + 1:02d},{'-' if i % 3 else ''}{i}.25,n{i}" for i in range(1, 101)]
+    csv = "Date,Amount,Memo\n" + "\n".join(lines + ["bad,1,x"]) + "\n"
+    progress = list(importer.import_statement(ledger_id, io.StringIO(csv), "s.csv", MAPPING, chunk_rows=30))
+
+    assert len(progress) == 4
+    assert progress[-1]['imported'] == 100 and progress[-1]['skipped'] == 1
+    income = sum(i * 100 + 25 for i in range(1, 101) if i % 3 == 0)
+    expense = sum(i * 100 + 25 for i in range(1, 101) if i % 3)
+    assert backend.get_totals_cents(ledger_id) == {'Income': income, 'Expense': expense, 'count': 100}
+    assert backend.check_rollups(ledger_id) == []
@@ -0,0 +1,88 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+import backend
+
+# 迁移前 (金额为 REAL) 的表结构
+BASELINE_SCHEMA = """
+CREATE TABLE ledgers (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE);
+CREATE TABLE records (id INTEGER PRIMARY KEY AUTOINCREMENT, ledger_id INTEGER, date TEXT, type TEXT,
+                      category TEXT, amount REAL, note TEXT, FOREIGN KEY (ledger_id) REFERENCES ledgers (id));
+CREATE TABLE categories (id INTEGER PRIMARY KEY AUTOINCREMENT, ledger_id INTEGER, name TEXT,
+                         UNIQUE (ledger_id, name));
+"""
+TYPES = ['收入', '支出', 'Income', 'Expense']
+CATEGORIES = ['餐饮', '交通', '工资', '购物', '']
+
+
+@pytest.fixture
+def baseline(tmp_path, monkeypatch):
+    # 写一个旧版库，返回建库函数；init_db 之后就是迁移后的库
+    path = str(tmp_path / 'baseline.db')
+    monkeypatch.setattr(backend, 'DB_FILE', path)
+    monkeypatch.setattr(backend, 'STORAGE_MODE', 'single')
+    backend.clear_cache()
+
+    def make(rows):
+        conn = sqlite3.connect(path)
+        conn.executescript(BASELINE_SCHEMA)
+        conn.executemany("INSERT INTO ledgers (name) VALUES (?)", [("A",), ("B",)])
+        conn.executemany("INSERT INTO categories (ledger_id, name) VALUES (?, ?)",
+                         [(lid, cat) for lid in (1, 2) for cat in CATEGORIES if cat])
+        conn.executemany("INSERT INTO records (ledger_id, date, type, category, amount, note) "
+                         "VALUES (?, ?, ?, ?, ?, '')", rows)
+        conn.commit()
+        return conn
+
+    yield make
+    backend.close_pools()
+    backend.clear_cache()
+
+
+def _random_rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    amounts = np.round(rng.lognormal(3, 1.5, n), 2) * np.where(rng.random(n) < 0.05, -1, 1)
+    days = rng.integers(0, 730, n)
+    return [(int(rng.integers(1, 3)), str(np.datetime64('2023-01-01') + int(d)), TYPES[rng.integers(0, 4)],
+             CATEGORIES[rng.integers(0, len(CATEGORIES))], float(a)) for d, a in zip(days, amounts)]
+
+
+def _old_totals(conn, keys):
+    # 旧版的做法：REAL 列直接 SUM，再四舍五入到分
+    kind = "CASE WHEN type IN ('收入', 'Income') THEN 'Income' ELSE 'Expense' END"
+    select = ", ".join({'ledger': "ledger_id", 'type': kind, 'category': "TRIM(category)"}[k] for k in keys)
+    rows = conn.execute(f"SELECT {select}, SUM(amount) FROM records GROUP BY {select}").fetchall()
+    return {row[:-1]: round(row[-1] * 100) for row in rows}
+
+
+def test_migrated_totals_match_float_sums(baseline):
+    conn = baseline(_random_rows(5000))
+    per_ledger = _old_totals(conn, ['ledger'])
+    per_type = _old_totals(conn, ['ledger', 'type'])
+    per_category = _old_totals(conn, ['ledger', 'type', 'category'])
+    conn.close()
+
+    backend.init_db()
+    for ledger_id in (1, 2):
+        totals = backend.get_totals_cents(ledger_id)
+        for kind in ('Income', 'Expense'):
+            assert totals[kind] == per_type.get((ledger_id, kind), 0)
+        assert totals['Income'] + totals['Expense'] == per_ledger[(ledger_id,)]
+
+        by_category = backend.get_sum_by_category(ledger_id, by_type=True)
+        got = {(ledger_id, row.type, row.category): round(row.amount * 100) for row in by_category.itertuples()}
+        assert got == {k: v for k, v in per_category.items() if k[0] == ledger_id}
+
+
+@pytest.mark.parametrize("amount, cents", [
+    (0.005, 1), (1.005, 101), (2.675, 268), (10.125, 1013), (0.015, 2), (19.99, 1999),
+    (-0.005, -1), (-1.005, -101), (-2.675, -268), (-0.015, -2), (None, 0),
+])
+def test_migration_rounds_half_cents_like_to_cents(baseline, amount, cents):
+    baseline([(1, '2024-01-01', '支出', '餐饮', amount)]).close()
+    backend.init_db()
+    with backend.get_conn() as conn:
+        (stored,), = conn.execute("SELECT amount_cents FROM records").fetchall()
+    assert stored == cents == backend.to_cents(amount)
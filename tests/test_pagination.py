@@ -0,0 +1,52 @@
+import backend
+
+
+def _walk(ledger_id, page_size, **filters):
+    pages, cursor = [], None
+    while True:
+        df, cursor = backend.get_records_page(ledger_id, cursor, page_size, **filters)
+        pages.append(df)
+        if cursor is None:
+            return pages
+
+
+def _fill(ledger_id, n):
+    # 每天三笔：同一天的记录靠 id 排序，翻页边界经常落在同一天中间
+    backend.bulk_insert_records(ledger_id, [(f"2024-01-{i // 3 + 1:02d}", "Expense" if i % 4 else "Income",
+                                             "餐饮" if i % 2 else "交通", 100 + i, f"n{i}") for i in range(n)])
+
+
+def test_pages_cover_every_record_once_in_order(new_ledger):
+    ledger_id = new_ledger("Pages", ["餐饮", "交通"])
+    _fill(ledger_id, 50)
+    pages = _walk(ledger_id, 7)
+    ids = [i for p in pages for i in p['id']]
+
+    expected = backend.get_all_records(ledger_id).sort_values(['date', 'id'], ascending=False)['id'].tolist()
+    assert ids == expected
+    assert [len(p) for p in pages] == [7] * 7 + [1]
+
+
+def test_exact_multiple_has_no_empty_last_page(new_ledger):
+    ledger_id = new_ledger("Pages", ["餐饮", "交通"])
+    _fill(ledger_id, 21)
+    assert [len(p) for p in _walk(ledger_id, 7)] == [7, 7, 7]
+    df, cursor = backend.get_records_page(ledger_id, None, 21)
+    assert len(df) == 21 and cursor is None
+
+
+def test_filtered_pages(new_ledger):
+    ledger_id = new_ledger("Pages", ["餐饮", "交通"])
+    _fill(ledger_id, 60)
+    pages = _walk(ledger_id, 4, categories=["餐饮"], type="Expense", start_date="2024-01-05")
+    rows = [r for p in pages for r in p.itertuples()]
+    assert rows and all(r.category == "餐饮" and r.type == "Expense" and r.date >= "2024-01-05" for r in rows)
+    everything = backend.get_all_records(ledger_id)
+    assert len(rows) == ((everything['category'] == "餐饮") & (everything['type'] == "Expense")
+                         & (everything['date'] >= "2024-01-05")).sum()
+
+
+def test_empty_ledger(new_ledger):
+    ledger_id = new_ledger("Pages", ["餐饮"])
+    df, cursor = backend.get_records_page(ledger_id)
+    assert df.empty and cursor is None
@@ -0,0 +1,26 @@
+import threading
+
+import backend
+
+
+def test_typed_categories_come_from_one_snapshot(new_ledger, monkeypatch):
+    ledger_id = new_ledger("Typed", ["餐饮"])
+    backend.save_record(ledger_id, "2024-01-01", "Expense", "餐饮", 10, "")
+
+    # 在读分类全集之后、读明细之前插入一笔新分类的记录
+    read_chunks = backend.pd.read_sql_query
+
+    def racing_read(*args, **kwargs):
+        writer = threading.Thread(target=backend.save_record,
+                                  args=(ledger_id, "2024-01-02", "Expense", "新分类", 5, ""))
+        writer.start()
+        writer.join()
+        return read_chunks(*args, **kwargs)
+
+    with monkeypatch.context() as m:
+        m.setattr(backend.pd, 'read_sql_query', racing_read)
+        df = backend.get_records_typed(ledger_id)
+
+    assert df['category'].isna().sum() == 0
+    assert list(df['category']) == ["餐饮"]
+    assert len(backend.get_records_typed(ledger_id)) == 2
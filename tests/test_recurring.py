@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+from datetime import date
+
+import backend
+import recurring
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_merge_category_moves_rules(new_ledger):
+    ledger_id = new_ledger("Home", ["Rent", "Housing"])
+    rule_id = backend.add_recurring_rule(ledger_id, "Expense", "Rent", 1500, "", "monthly", date(2024, 1, 1))
+    assert recurring.post_due(date(2024, 2, 15)) == {ledger_id: 2}
+
+    assert backend.rename_category(ledger_id, "Rent", "Housing")
+    rules = backend.get_recurring_rules(ledger_id)
+    assert rules.loc[rules['id'] == rule_id, 'category'].tolist() == ["Housing"]
+
+    assert recurring.post_due(date(2024, 3, 15)) == {ledger_id: 1}
+    records = backend.get_all_records(ledger_id)
+    assert set(records['category']) == {"Housing"}
+    assert len(records) == 3
+
+
+def test_posting_refreshes_rules_even_without_new_records(new_ledger):
+    ledger_id = new_ledger("Home", ["Rent"])
+    backend.add_recurring_rule(ledger_id, "Expense", "Rent", 1500, "", "monthly", date(2024, 1, 1))
+    recurring.post_due(date(2024, 1, 15))
+    assert backend.get_recurring_rules(ledger_id)['last_posted'].tolist() == ["2024-01-15"]
+
+    # 没有新的到期日，只推进 last_posted
+    assert recurring.post_due(date(2024, 1, 20)) == {}
+    assert backend.get_recurring_rules(ledger_id)['last_posted'].tolist() == ["2024-01-20"]
+
+
+def test_posting_from_another_process_invalidates_cache(new_ledger, db):
+    ledger_id = new_ledger("Home", ["Rent"])
+    backend.add_recurring_rule(ledger_id, "Expense", "Rent", 1500, "", "monthly", date(2024, 1, 1))
+    assert backend.get_totals_cents(ledger_id)['Expense'] == 0
+    version = backend.data_version(ledger_id)
+
+    # 模拟 cron：另一个进程里补记
+    subprocess.run([sys.executable, os.path.join(REPO, "manage.py"), "--db", db, "post-recurring",
+                    "--today", "2024-03-01"], check=True, capture_output=True)
+    assert backend.data_version(ledger_id) != version
+    assert backend.get_totals_cents(ledger_id)['Expense'] == 3 * 150000
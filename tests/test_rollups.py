@@ -0,0 +1,56 @@
+import sqlite3
+
+import backend
+
+
+def _seed(ledger_id):
+    return [backend.save_record(ledger_id, f"2024-0{m}-1{d}", t, c, 10 * m + d, "")
+            for m in (1, 2) for d in (1, 2) for t, c in (("Expense", "餐饮"), ("Expense", "交通"), ("Income", "工资"))]
+
+
+def test_triggers_follow_updates(db, new_ledger):
+    ledger_id = new_ledger("Rollups", ["餐饮", "交通", "工资"])
+    ids = _seed(ledger_id)
+    # 直接改行，只靠触发器维护汇总表：换月份、换类型、改金额、清空分类
+    with sqlite3.connect(db) as conn:
+        conn.execute("UPDATE records SET date = '2024-03-05' WHERE id = ?", (ids[0],))
+        conn.execute("UPDATE records SET type_code = ? WHERE id = ?", (backend.TYPE_INCOME, ids[1]))
+        conn.execute("UPDATE records SET amount_cents = amount_cents + 1 WHERE id = ?", (ids[2],))
+        conn.execute("UPDATE records SET category_id = NULL WHERE id = ?", (ids[3],))
+    conn.close()
+    assert backend.check_rollups() == []
+
+
+def test_triggers_follow_deletes_and_merges(new_ledger):
+    ledger_id = new_ledger("Rollups", ["餐饮", "交通", "工资"])
+    ids = _seed(ledger_id)
+    backend.delete_record(ids[0], ledger_id)
+    backend.delete_record(ids[3], ledger_id)
+    # 合并分类会批量改 category_id
+    backend.rename_category(ledger_id, "交通", "餐饮")
+    assert backend.check_rollups(ledger_id) == []
+    assert backend.get_totals_cents(ledger_id)['count'] == len(ids) - 2
+
+
+def test_deleting_last_record_drops_the_rollup_row(db, new_ledger):
+    ledger_id = new_ledger("Rollups", ["餐饮"])
+    record_id = backend.save_record(ledger_id, "2024-01-01", "Expense", "餐饮", 10, "")
+    backend.delete_record(record_id, ledger_id)
+    with sqlite3.connect(db) as conn:
+        assert conn.execute("SELECT count(*) FROM daily_totals").fetchone()[0] == 0
+        assert conn.execute("SELECT count(*) FROM monthly_totals").fetchone()[0] == 0
+    conn.close()
+
+
+def test_check_reports_drift_and_rebuild_fixes_it(db, new_ledger):
+    ledger_id = new_ledger("Rollups", ["餐饮", "交通", "工资"])
+    _seed(ledger_id)
+    with sqlite3.connect(db) as conn:
+        conn.execute("UPDATE monthly_totals SET amount_cents = amount_cents + 7 WHERE month = '2024-02'")
+    conn.close()
+    mismatches = backend.check_rollups(ledger_id)
+    assert mismatches and {m[0] for m in mismatches} == {'monthly_totals'}
+    assert all(m[5] == -7 for m in mismatches)
+
+    backend.rebuild_rollups(ledger_id)
+    assert backend.check_rollups(ledger_id) == []
@@ -0,0 +1,51 @@
+import backend
+
+
+def _fill(ledger_id, n, note, category="餐饮", type="Expense"):
+    backend.bulk_insert_records(ledger_id, [(f"2024-01-{i % 28 + 1:02d}", type, category, 100 + i, f"{note} {i}")
+                                            for i in range(n)])
+
+
+def test_search_stays_in_its_ledger(new_ledger):
+    mine = new_ledger("Mine", ["餐饮"])
+    other = new_ledger("Other", ["餐饮"])
+    _fill(other, 200, "refund")
+    _fill(mine, 3, "refund")
+
+    df = backend.search_records(mine, "refund")
+    assert len(df) == 3
+    assert set(df['ledger_id']) == {mine}
+
+
+def test_filters_apply_before_the_page_is_cut(new_ledger):
+    # 收入只有 5 笔，排在 100 笔更相关的支出后面；先截断再筛选会一笔都拿不到
+    ledger_id = new_ledger("Filter", ["餐饮", "工资"])
+    _fill(ledger_id, 100, "refund")
+    backend.save_record(ledger_id, "2024-02-01", "Income", "工资", 1, "a long note that also mentions a refund")
+    df = backend.search_records(ledger_id, "refund", type="Income", limit=10)
+    assert len(df) == 1
+    assert list(df['type']) == ["Income"]
+
+
+def test_pages_match_one_big_page(new_ledger):
+    ledger_id = new_ledger("Pages", ["餐饮", "refunds"])
+    _fill(ledger_id, 60, "taxi refund")
+    _fill(ledger_id, 30, "bus", category="refunds")
+    full = backend.search_records(ledger_id, "refund", limit=200)
+    assert len(full) == 90
+    # 备注命中在前，只命中分类名的排在后面
+    assert full['rank'].notna().sum() == 60 and full['rank'].iloc[60:].isna().all()
+
+    pages = [backend.search_records(ledger_id, "refund", limit=25, offset=k) for k in range(0, 90, 25)]
+    assert sum((list(p['id']) for p in pages), []) == list(full['id'])
+
+
+def test_short_terms_fall_back_to_like(new_ledger):
+    ledger_id = new_ledger("Short", ["餐饮"])
+    other = new_ledger("Other", ["餐饮"])
+    _fill(ledger_id, 5, "奶茶")
+    _fill(other, 5, "奶茶")
+    df = backend.search_records(ledger_id, "奶茶", limit=3)
+    assert len(df) == 3
+    assert list(df['date']) == sorted(df['date'], reverse=True)
+    assert set(df['ledger_id']) == {ledger_id}
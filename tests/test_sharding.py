@@ -0,0 +1,80 @@
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import backend
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_split_failure_keeps_original_error(new_ledger, monkeypatch):
+    ledger_id = new_ledger("Split", ["餐饮"])
+    backend.save_record(ledger_id, "2024-01-01", "Expense", "餐饮", 10, "")
+
+    add_to_rollups = backend._add_to_rollups
+
+    def broken(c):
+        # 只在已经从源库读过数据的账本上失败，这时事务仍持有源库的锁
+        if c.execute("SELECT count(*) FROM records").fetchone()[0]:
+            raise ValueError("copy failed")
+        add_to_rollups(c)
+
+    monkeypatch.setattr(backend, '_add_to_rollups', broken)
+    with pytest.raises(ValueError, match="copy failed"):
+        backend.split_ledgers()
+    assert backend.storage_mode() == 'single'
+
+
+def test_split_copies_every_ledger(new_ledger):
+    ledger_id = new_ledger("Split", ["餐饮"])
+    backend.save_record(ledger_id, "2024-01-01", "Expense", "餐饮", 10, "")
+    moved = {lid: n for lid, _, n, _ in backend.split_ledgers()}
+    assert moved[ledger_id] == 1
+    assert backend.storage_mode() == 'sharded'
+    assert backend.get_totals_cents(ledger_id)['Expense'] == 1000
+    assert backend.check_rollups() == []
+
+
+def test_split_refuses_while_catalog_is_being_written(db, new_ledger, monkeypatch):
+    ledger_id = new_ledger("Split", ["餐饮"])
+    backend.save_record(ledger_id, "2024-01-01", "Expense", "餐饮", 10, "")
+    monkeypatch.setattr(backend, 'BUSY_TIMEOUT', 0.1)
+    backend.close_pools()
+    other = sqlite3.connect(db)
+    try:
+        other.execute("BEGIN IMMEDIATE")
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            backend.split_ledgers()
+    finally:
+        other.rollback()
+        other.close()
+    assert backend.storage_mode() == 'single'
+    # 拿锁在拷贝之前：一个分库文件都没有生成
+    assert not Path(backend.shard_file(ledger_id)).exists()
+
+
+def test_split_from_another_process_switches_this_one(db, new_ledger):
+    ledger_id = new_ledger("Split", ["餐饮"])
+    backend.save_record(ledger_id, "2024-01-01", "Expense", "餐饮", 10, "")
+    assert backend.get_totals_cents(ledger_id)['Expense'] == 1000
+    subprocess.run([sys.executable, str(ROOT / "manage.py"), "--db", str(db), "split-ledgers"],
+                   check=True, capture_output=True)
+
+    assert backend.get_totals_cents(ledger_id)['Expense'] == 1000
+    assert backend.storage_mode() == 'sharded'
+    assert backend.ledger_path(ledger_id) == backend.shard_file(ledger_id)
+
+
+def test_catalog_rejects_ledger_rows_after_split(db, new_ledger):
+    ledger_id = new_ledger("Split", ["餐饮"])
+    backend.split_ledgers()
+    catalog = sqlite3.connect(db)
+    try:
+        with pytest.raises(sqlite3.IntegrityError, match="sharded"):
+            catalog.execute("INSERT INTO records (ledger_id, date, type_code, category_id, amount_cents, note) "
+                            "VALUES (?, '2024-01-01', 0, 1, 100, '')", (ledger_id,))
+    finally:
+        catalog.close()
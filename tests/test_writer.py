@@ -0,0 +1,49 @@
+import pytest
+
+import backend
+import writer
+
+
+@pytest.fixture
+def queue(db, monkeypatch):
+    # 每批多等一会儿，让连续提交的写操作落进同一批
+    monkeypatch.setattr(writer, 'GROUP_COMMIT_MS', 200)
+    return writer.get_writer()
+
+
+def test_batch_commits_in_submit_order(new_ledger, queue):
+    ledger_id = new_ledger("Queue", ["餐饮"])
+    futures = [queue.submit('insert', ledger_id, "2024-01-01", "Expense", "餐饮", i + 1, f"n{i}") for i in range(20)]
+    ids = [f.result(timeout=writer.WRITE_TIMEOUT) for f in futures]
+
+    assert ids == sorted(ids)
+    stats = queue.stats()
+    assert stats['committed'] == 20 and stats['batches'] < 20
+    notes = backend.get_all_records(ledger_id).sort_values('id')['note'].tolist()
+    assert notes == [f"n{i}" for i in range(20)]
+
+
+def test_failed_op_rolls_back_only_itself(new_ledger, queue):
+    ledger_id = new_ledger("Queue", ["餐饮"])
+    good = queue.submit('insert', ledger_id, "2024-01-01", "Expense", "餐饮", 10, "")
+    # 金额解析失败之前已经建了新分类；savepoint 回滚要把它一起撤掉
+    bad = queue.submit('insert', ledger_id, "2024-01-01", "Expense", "坏分类", "abc", "")
+    also_good = queue.submit('insert', ledger_id, "2024-01-02", "Expense", "餐饮", 5, "")
+
+    good.result(timeout=writer.WRITE_TIMEOUT)
+    also_good.result(timeout=writer.WRITE_TIMEOUT)
+    with pytest.raises(Exception):
+        bad.result(timeout=writer.WRITE_TIMEOUT)
+
+    assert queue.stats()['failed'] == 1
+    assert backend.get_totals_cents(ledger_id)['Expense'] == 1500
+    assert "坏分类" not in backend.get_categories(ledger_id)
+
+
+def test_result_is_visible_once_the_future_resolves(new_ledger, queue):
+    ledger_id = new_ledger("Queue", ["餐饮"])
+    assert backend.get_totals_cents(ledger_id)['Expense'] == 0
+    record_id = writer.save_record(ledger_id, "2024-01-01", "Expense", "餐饮", 3, "").result(writer.WRITE_TIMEOUT)
+    assert backend.get_totals_cents(ledger_id)['Expense'] == 300
+    assert writer.delete_record(record_id, ledger_id).result(writer.WRITE_TIMEOUT) is True
+    assert backend.get_totals_cents(ledger_id)['Expense'] == 0
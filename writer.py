@@ -0,0 +1,174 @@
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import backend
+
+# 单写线程：页面线程只把写操作放进队列，拿到 Future；写线程把排队中的操作一起提交。
+# 上一批提交期间到达的写操作自然组成下一批；GROUP_COMMIT_MS > 0 时每批再多等这么久
+GROUP_COMMIT_MS = 0
+MAX_BATCH = 500
+WRITE_TIMEOUT = 10.0
+_STOP = object()
+
+
+def _op_insert(conn, ledger_id, date, type, category, amount, note):
+    return ledger_id, backend.insert_record_conn(conn, ledger_id, date, type, category, amount, note)
+
+
+def _op_delete(conn, record_id):
+    return backend.delete_record_conn(conn, record_id)
+
+
+OPS = {
+    'insert': _op_insert,
+    'delete': _op_delete,
+}
+
+
+class WriteQueue:
+    def __init__(self, path):
+        self.path = path
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stats = {'submitted': 0, 'committed': 0, 'failed': 0, 'batches': 0, 'max_batch': 0,
+                       'commit_ms_total': 0.0, 'commit_ms_max': 0.0, 'commit_ms_last': 0.0}
+        self._thread = threading.Thread(target=self._run, name="ledger-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, op, *args):
+        fut = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("write queue is closed")
+            self._stats['submitted'] += 1
+            self._queue.put((op, args, fut))
+        return fut
+
+    def close(self, timeout=None):
+        # 关闭前先把已排队的写操作全部提交
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['commit_ms_mean'] = stats['commit_ms_total'] / stats['batches'] if stats['batches'] else 0.0
+        return stats
+
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.perf_counter() + GROUP_COMMIT_MS / 1000
+            while len(batch) < MAX_BATCH:
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+
+    def _commit(self, batch):
+        t0 = time.perf_counter()
+        results = []
+        touched = set()
+        try:
+            with backend.get_conn(self.path) as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                for op, args, fut in batch:
+                    if not fut.set_running_or_notify_cancel():
+                        continue
+                    # 每个操作一个 savepoint，单条失败不影响同批其他写入
+                    conn.execute("SAVEPOINT write_op")
+                    try:
+                        ledger_id, value = OPS[op](conn, *args)
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO write_op")
+                        conn.execute("RELEASE write_op")
+                        results.append((fut, None, e))
+                        continue
+                    conn.execute("RELEASE write_op")
+                    if ledger_id is not None:
+                        touched.add(ledger_id)
+                    results.append((fut, value, None))
+        except Exception as e:
+            # 整批提交失败：事务已回滚，所有操作都算失败
+            for _, _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            with self._lock:
+                self._stats['failed'] += len(batch)
+            return
+
+        elapsed = (time.perf_counter() - t0) * 1000
+        for ledger_id in touched:
+            backend.invalidate(ledger_id)
+        with self._lock:
+            s = self._stats
+            s['batches'] += 1
+            s['max_batch'] = max(s['max_batch'], len(batch))
+            s['committed'] += sum(1 for _, _, e in results if e is None)
+            s['failed'] += sum(1 for _, _, e in results if e is not None)
+            s['commit_ms_total'] += elapsed
+            s['commit_ms_max'] = max(s['commit_ms_max'], elapsed)
+            s['commit_ms_last'] = elapsed
+        # 提交并失效缓存之后再通知调用方，页面 rerun 时一定能读到新数据
+        for fut, value, exc in results:
+            if exc is None:
+                fut.set_result(value)
+            else:
+                fut.set_exception(exc)
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(path=None):
+    path = path or backend.DB_FILE
+    with _writers_lock:
+        writer = _writers.get(path)
+        if writer is None or writer._closed:
+            writer = _writers[path] = WriteQueue(path)
+    return writer
+
+
+# 写队列按库文件分：分库模式下每个账本一个写线程，不同账本的提交互不排队
+def save_record(ledger_id, date, type, category, amount, note, path=None):
+    return get_writer(path or backend.ledger_path(ledger_id)).submit('insert', ledger_id, date, type, category,
+                                                                     amount, note)
+
+
+def delete_record(record_id, ledger_id=None, path=None):
+    return get_writer(path or backend.ledger_path(ledger_id)).submit('delete', record_id)
+
+
+def stats(path=None):
+    return get_writer(path).stats()
+
+
+def close_writers(timeout=WRITE_TIMEOUT):
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close(timeout)
+
+
+atexit.register(close_writers)